@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, MetaData
+from sqlalchemy import create_engine, MetaData, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .settings import settings
@@ -24,4 +24,13 @@ def get_db():
 
 def get_redis():
     """Redis dependency"""
-    return redis_client
\ No newline at end of file
+    return redis_client
+
+def check_database() -> bool:
+    """Return True if the database accepts connections"""
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
@@ -0,0 +1,33 @@
+from sqlalchemy import Table, Column, BigInteger, Integer, SmallInteger, String, Float, DateTime, ForeignKey, UniqueConstraint, Index
+from ..config.database import Base
+from ..services.netcdf_processor import SUPPORTED_PARAMETERS
+
+# Measured parameters stored as level columns; pressure is the level coordinate itself
+LEVEL_PARAMETERS = [param for param in SUPPORTED_PARAMETERS if param != 'PRES']
+
+# One row per profile (float cycle); re-ingesting a cycle updates it in place
+profiles_table = Table(
+    "argo_profiles",
+    Base.metadata,
+    Column("id", BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True),
+    Column("platform_number", String(16), nullable=False, index=True),
+    Column("cycle_number", Integer, nullable=False),
+    Column("date", DateTime, index=True),
+    Column("latitude", Float),
+    Column("longitude", Float),
+    Column("n_levels", Integer, nullable=False),
+    UniqueConstraint("platform_number", "cycle_number", name="uq_argo_profiles_platform_cycle"),
+    # Region filters from the query planner select on a lat/lon box
+    Index("ix_argo_profiles_lat_lon", "latitude", "longitude"),
+)
+
+# One row per (profile, level) with a value and QC flag column per parameter, e.g. ``temp`` and ``temp_qc``
+levels_table = Table(
+    "argo_levels",
+    Base.metadata,
+    Column("profile_id", BigInteger, ForeignKey("argo_profiles.id", ondelete="CASCADE"), primary_key=True),
+    Column("level", SmallInteger, primary_key=True),
+    Column("pressure", Float),
+    *[Column(param.lower(), Float) for param in LEVEL_PARAMETERS],
+    *[Column(f"{param.lower()}_qc", String(1)) for param in LEVEL_PARAMETERS],
+)
@@ -0,0 +1,206 @@
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED, ALL_COMPLETED
+from typing import Dict, Any, List, Optional, Callable, Iterator, Tuple
+import fnmatch
+import hashlib
+import json
+import os
+import time
+import logging
+from .netcdf_processor import NetCDFProcessor
+from .profile_table import ProfileTable
+from .segment_store import atomic_write
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Argo GDAC profile files: core (<wmo>_prof.nc) and synthetic BGC (<wmo>_Sprof.nc)
+DEFAULT_PATTERNS = ("*_prof.nc", "*_Sprof.nc")
+
+# Processor used inside worker processes, created once per worker
+_worker_processor: Optional[NetCDFProcessor] = None
+
+
+def file_checksum(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _parse_file(path: str) -> Tuple[str, ProfileTable, str]:
+    """Parse a whole file in a worker process, returning its table and checksum"""
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = NetCDFProcessor()
+    tables = list(_worker_processor.iter_profile_batches(path))
+    return path, ProfileTable.concat(tables), file_checksum(path)
+
+
+class IngestManifest:
+    """Size, mtime and checksum of every file already ingested
+
+    A file is unchanged when its size and mtime match the manifest; if only
+    the mtime differs (e.g. the file was re-downloaded), the checksum decides.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f).get("files", {})
+
+    def is_unchanged(self, path: str) -> bool:
+        entry = self.entries.get(path)
+        if entry is None:
+            return False
+        stat = os.stat(path)
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime == entry["mtime"]:
+            return True
+        if file_checksum(path) == entry["sha256"]:
+            entry["mtime"] = stat.st_mtime
+            return True
+        return False
+
+    def record(self, path: str, checksum: str, profiles: int):
+        stat = os.stat(path)
+        self.entries[path] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sha256": checksum,
+            "profiles": profiles,
+            "ingested_at": time.time()
+        }
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        atomic_write(self.path, lambda f: f.write(json.dumps({"version": 1, "files": self.entries}).encode()))
+
+
+class BulkIngester:
+    """Parallel ingestion of a directory tree of Argo NetCDF files
+
+    Files are parsed by a process pool with a bounded number in flight.
+    Parsed profiles are buffered until ``batch_size`` profiles accumulate and
+    then handed to every sink in one batch. A file is recorded in the
+    manifest only once all of its profiles have reached the sinks, and the
+    manifest is saved periodically, so an interrupted run resumes close to
+    where it stopped.
+    """
+
+    def __init__(
+        self,
+        sinks: Dict[str, Callable[[ProfileTable], int]],
+        manifest: IngestManifest,
+        max_workers: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        report: Optional[Callable[[Dict[str, Any]], None]] = None,
+        report_interval: float = 5.0,
+        save_interval: float = 30.0
+    ):
+        self.sinks = sinks
+        self.manifest = manifest
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_size = batch_size or settings.profile_batch_size
+        self.report = report
+        self.report_interval = report_interval
+        self.save_interval = save_interval
+        self.stats = {
+            "files_found": 0,
+            "files_skipped": 0,
+            "files_ingested": 0,
+            "files_failed": 0,
+            "profiles": 0,
+            **{counter: 0 for counter in sinks}
+        }
+        self._pending_tables: List[ProfileTable] = []
+        self._pending_files: List[Tuple[str, str, int]] = []
+        self._started = time.perf_counter()
+        self._last_report = self._started
+        self._last_save = self._started
+
+    @staticmethod
+    def find_files(root: str, patterns=DEFAULT_PATTERNS) -> Iterator[str]:
+        """Files under ``root`` matching any of the patterns, in sorted order"""
+        for directory, subdirectories, filenames in os.walk(root):
+            subdirectories.sort()
+            for filename in sorted(filenames):
+                if any(fnmatch.fnmatch(filename, pattern) for pattern in patterns):
+                    yield os.path.join(directory, filename)
+
+    def run(self, root: str, patterns=DEFAULT_PATTERNS) -> Dict[str, Any]:
+        """Ingest every new or changed file under ``root`` and return the final statistics"""
+        self._started = time.perf_counter()
+        in_flight: Dict[Future, str] = {}
+        try:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                for path in self.find_files(root, patterns):
+                    self.stats["files_found"] += 1
+                    if self.manifest.is_unchanged(path):
+                        self.stats["files_skipped"] += 1
+                        continue
+
+                    in_flight[executor.submit(_parse_file, path)] = path
+                    if len(in_flight) >= 2 * self.max_workers:
+                        in_flight = self._collect(in_flight, FIRST_COMPLETED)
+
+                self._collect(in_flight, ALL_COMPLETED)
+            self._flush()
+        finally:
+            self.manifest.save()
+        return self.summary()
+
+    def _collect(self, in_flight: Dict[Future, str], return_when) -> Dict[Future, str]:
+        done, _ = wait(in_flight, return_when=return_when)
+        for future in done:
+            path = in_flight.pop(future)
+            try:
+                _, table, checksum = future.result()
+            except Exception as e:
+                self.stats["files_failed"] += 1
+                logger.error(f"Error parsing {path}: {str(e)}")
+                continue
+
+            self._pending_tables.append(table)
+            self._pending_files.append((path, checksum, len(table)))
+            if sum(len(pending) for pending in self._pending_tables) >= self.batch_size:
+                self._flush()
+        self._maybe_report()
+        return in_flight
+
+    def _flush(self):
+        """Send buffered profiles to every sink, then record their files as ingested"""
+        if not self._pending_files:
+            return
+        table = ProfileTable.concat(self._pending_tables)
+        for counter, sink in self.sinks.items():
+            self.stats[counter] += sink(table)
+
+        for path, checksum, profiles in self._pending_files:
+            self.manifest.record(path, checksum, profiles)
+        self.stats["files_ingested"] += len(self._pending_files)
+        self.stats["profiles"] += len(table)
+        self._pending_tables, self._pending_files = [], []
+
+        if time.perf_counter() - self._last_save >= self.save_interval:
+            self.manifest.save()
+            self._last_save = time.perf_counter()
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self._started
+        return {
+            **self.stats,
+            "elapsed_s": round(elapsed, 2),
+            "files_per_s": round(self.stats["files_ingested"] / elapsed, 2) if elapsed else None,
+            "profiles_per_s": round(self.stats["profiles"] / elapsed, 1) if elapsed else None
+        }
+
+    def _maybe_report(self):
+        now = time.perf_counter()
+        if self.report and now - self._last_report >= self.report_interval:
+            self._last_report = now
+            self.report(self.summary())
@@ -1,40 +1,36 @@
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator
+import asyncio
 import uuid
 import logging
 from .rag_service import RAGService
+from .conversation_store import ConversationStore, MemoryConversationStore, utc_now
 
 logger = logging.getLogger(__name__)
 
 class ChatService:
-    """Chat service for handling conversational interactions"""
+    """Chat service for handling conversational interactions
+
+    Store calls may do network I/O (Redis), so the async methods run them in
+    a worker thread rather than on the event loop.
+    """
     
-    def __init__(self):
-        self.rag_service = RAGService()
-        self.conversations = {}  # In production, use persistent storage
+    def __init__(self, rag_service: Optional[RAGService] = None, store: Optional[ConversationStore] = None):
+        self.rag_service = rag_service or RAGService()
+        self.store = store or MemoryConversationStore()
     
     async def process_message(self, message: str, conversation_id: Optional[str] = None) -> Dict[str, Any]:
         """Process a chat message and return response"""
         try:
-            # Create new conversation if needed
+            # Create new conversation if needed; unknown IDs (e.g. expired ones) are recreated by the store
             if not conversation_id:
                 conversation_id = str(uuid.uuid4())
-                self.conversations[conversation_id] = {
-                    "id": conversation_id,
-                    "messages": [],
-                    "created_at": None,
-                    "updated_at": None
-                }
             
-            # Add user message to conversation
             user_message = {
                 "role": "user",
                 "content": message,
-                "timestamp": None  # In production, use proper timestamp
+                "timestamp": utc_now()
             }
             
-            if conversation_id in self.conversations:
-                self.conversations[conversation_id]["messages"].append(user_message)
-            
             # Process query using RAG
             rag_response = await self.rag_service.process_query(message)
             
@@ -42,17 +38,17 @@ class ChatService:
             assistant_message = {
                 "role": "assistant",
                 "content": rag_response["response"],
-                "timestamp": None,
+                "timestamp": utc_now(),
                 "metadata": {
                     "context_documents": rag_response.get("context_documents", []),
                     "sql_query": rag_response.get("sql_query"),
+                    "query_results": rag_response.get("query_results"),
                     "suggestions": rag_response.get("suggestions", [])
                 }
             }
             
-            # Add assistant response to conversation
-            if conversation_id in self.conversations:
-                self.conversations[conversation_id]["messages"].append(assistant_message)
+            # Store the exchange once it is complete, so a failure leaves no unanswered turn
+            await asyncio.to_thread(self.store.append, conversation_id, [user_message, assistant_message])
             
             return {
                 "conversation_id": conversation_id,
@@ -74,17 +70,59 @@ class ChatService:
                 "error": str(e)
             }
     
-    def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
-        """Get conversation by ID"""
-        return self.conversations.get(conversation_id)
+    async def stream_message(self, message: str, conversation_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Process a chat message as a stream of events
+
+        Passes through the RAG service's ``context``, ``token`` and ``error`` events;
+        the final ``done`` event carries the conversation ID and the complete
+        assistant message. The user message and the answer are stored together
+        when the stream ends, with an apology standing in for the answer after
+        an ``error``; a stream the client abandons leaves no trace.
+        """
+        conversation_id = conversation_id or str(uuid.uuid4())
+        user_message = {"role": "user", "content": message, "timestamp": utc_now()}
+        
+        context_docs, query_results, chunks = [], None, []
+        async for event in self.rag_service.stream_query(message):
+            if event["event"] == "context":
+                context_docs = event["data"]["context_documents"]
+                query_results = event["data"].get("query_results")
+                event = {"event": "context", "data": dict(event["data"], conversation_id=conversation_id)}
+            elif event["event"] == "token":
+                chunks.append(event["data"]["text"])
+            elif event["event"] == "done":
+                assistant_message = {
+                    "role": "assistant",
+                    "content": "".join(chunks),
+                    "timestamp": utc_now(),
+                    "metadata": {
+                        "context_documents": context_docs,
+                        "sql_query": event["data"].get("sql_query"),
+                        "query_results": query_results,
+                        "suggestions": event["data"].get("suggestions", [])
+                    }
+                }
+                await asyncio.to_thread(self.store.append, conversation_id, [user_message, assistant_message])
+                event = {"event": "done", "data": dict(event["data"], conversation_id=conversation_id, message=assistant_message)}
+            elif event["event"] == "error":
+                assistant_message = {
+                    "role": "assistant",
+                    "content": "I apologize, but I encountered an error processing your message. Please try again.",
+                    "timestamp": utc_now(),
+                    "metadata": {"error": event["data"].get("error")}
+                }
+                await asyncio.to_thread(self.store.append, conversation_id, [user_message, assistant_message])
+                event = {"event": "error", "data": dict(event["data"], conversation_id=conversation_id)}
+            yield event
+    
+    def get_conversation(self, conversation_id: str, last: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Get conversation by ID, optionally only its ``last`` messages"""
+        return self.store.get(conversation_id, last=last)
     
-    def list_conversations(self, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
-        """List all conversations (filtered by user in production)"""
-        return list(self.conversations.values())
+    def list_conversations(self, user_id: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """List the most recently updated conversations (filtered by user in production)"""
+        return self.store.list(limit)
     
     def delete_conversation(self, conversation_id: str) -> bool:
         """Delete a conversation"""
-        if conversation_id in self.conversations:
-            del self.conversations[conversation_id]
-            return True
-        return False
\ No newline at end of file
+        return self.store.delete(conversation_id)
\ No newline at end of file
@@ -0,0 +1,244 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+import threading
+import json
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class ConversationStore(ABC):
+    """Storage for chat conversations
+
+    A conversation is a dict with ``id``, ``created_at``, ``updated_at`` and
+    ``messages``. Stores keep only the last ``max_messages`` messages of each
+    conversation, so memory and payload size stay bounded however long a
+    conversation runs, and forget conversations idle for ``ttl`` seconds.
+    """
+
+    def __init__(self, max_messages: int = 50, ttl: Optional[int] = None):
+        self.max_messages = max_messages
+        self.ttl = ttl
+
+    @abstractmethod
+    def append(self, conversation_id: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Add messages to a conversation, creating it if needed, and return its metadata"""
+        ...
+
+    @abstractmethod
+    def get(self, conversation_id: str, last: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Conversation with its retained messages (only the ``last`` ones if given)"""
+        ...
+
+    @abstractmethod
+    def list(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Metadata of the most recently updated conversations"""
+        ...
+
+    @abstractmethod
+    def delete(self, conversation_id: str) -> bool:
+        """Remove a conversation, returning whether it existed"""
+
+    @abstractmethod
+    def get_stats(self) -> Dict[str, Any]:
+        """Backend name, conversation count and limits for the metrics endpoint"""
+
+
+class MemoryConversationStore(ConversationStore):
+    """In-process conversation store bounded by count (LRU) and idle time (TTL)
+
+    Conversations are local to the worker process and lost on restart; use
+    the Redis store when several workers serve the same clients.
+    """
+
+    def __init__(self, max_conversations: int = 10000, max_messages: int = 50, ttl: Optional[int] = None):
+        super().__init__(max_messages, ttl)
+        self.max_conversations = max_conversations
+        self._conversations: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._touched: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def append(self, conversation_id: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        now = utc_now()
+        with self._lock:
+            self._expire()
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                conversation = {"id": conversation_id, "messages": [], "created_at": now, "updated_at": now}
+                self._conversations[conversation_id] = conversation
+            conversation["messages"].extend(messages)
+            del conversation["messages"][:-self.max_messages]
+            conversation["updated_at"] = now
+            self._touch(conversation_id)
+            while len(self._conversations) > self.max_conversations:
+                evicted, _ = self._conversations.popitem(last=False)
+                del self._touched[evicted]
+                self.evictions += 1
+            return _metadata(conversation)
+
+    def get(self, conversation_id: str, last: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._expire()
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                return None
+            self._touch(conversation_id)
+            messages = conversation["messages"][-last:] if last else conversation["messages"]
+            return dict(conversation, messages=list(messages))
+
+    def list(self, limit: int = 100) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._expire()
+            conversations = sorted(self._conversations.values(), key=lambda c: c["updated_at"], reverse=True)
+            return [_metadata(conversation) for conversation in conversations[:limit]]
+
+    def delete(self, conversation_id: str) -> bool:
+        with self._lock:
+            if self._conversations.pop(conversation_id, None) is None:
+                return False
+            del self._touched[conversation_id]
+            return True
+
+    def _touch(self, conversation_id: str):
+        self._conversations.move_to_end(conversation_id)
+        self._touched[conversation_id] = time.monotonic()
+
+    def _expire(self):
+        """Drop idle conversations; the LRU order puts the least recently used first"""
+        if not self.ttl:
+            return
+        cutoff = time.monotonic() - self.ttl
+        while self._conversations:
+            conversation_id = next(iter(self._conversations))
+            if self._touched[conversation_id] > cutoff:
+                break
+            del self._conversations[conversation_id]
+            del self._touched[conversation_id]
+            self.expirations += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "conversations": len(self._conversations),
+            "max_conversations": self.max_conversations,
+            "max_messages": self.max_messages,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+class RedisConversationStore(ConversationStore):
+    """Conversation store shared by all workers through Redis
+
+    Each conversation is a hash of its metadata plus a list of JSON-encoded
+    messages that is trimmed to ``max_messages`` on every append; both keys
+    expire after ``ttl`` idle seconds; reading a conversation counts as use
+    and renews its expiry, as in the memory store. A sorted set of
+    conversation IDs by last use backs ``list``. Appends run as one MULTI/EXEC pipeline, so
+    concurrent messages from different workers interleave safely.
+    """
+
+    def __init__(self, redis_client, max_messages: int = 50, ttl: Optional[int] = None, key_prefix: str = "conv:"):
+        super().__init__(max_messages, ttl)
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+        self.index_key = f"{key_prefix}index"
+
+    def _keys(self, conversation_id: str):
+        return f"{self.key_prefix}{conversation_id}", f"{self.key_prefix}{conversation_id}:messages"
+
+    def append(self, conversation_id: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        meta_key, messages_key = self._keys(conversation_id)
+        now = utc_now()
+        pipeline = self.redis.pipeline(transaction=True)
+        pipeline.hsetnx(meta_key, "created_at", now)
+        pipeline.hset(meta_key, mapping={"id": conversation_id, "updated_at": now})
+        if messages:
+            pipeline.rpush(messages_key, *[json.dumps(message, default=str) for message in messages])
+        pipeline.ltrim(messages_key, -self.max_messages, -1)
+        pipeline.zadd(self.index_key, {conversation_id: time.time()})
+        if self.ttl:
+            pipeline.expire(meta_key, self.ttl)
+            pipeline.expire(messages_key, self.ttl)
+        pipeline.hgetall(meta_key)
+        pipeline.llen(messages_key)
+        *_, meta, message_count = pipeline.execute()
+        return dict(_decode_hash(meta), message_count=message_count)
+
+    def get(self, conversation_id: str, last: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        meta_key, messages_key = self._keys(conversation_id)
+        pipeline = self.redis.pipeline(transaction=False)
+        pipeline.hgetall(meta_key)
+        pipeline.lrange(messages_key, -last if last else 0, -1)
+        if self.ttl:
+            pipeline.expire(meta_key, self.ttl)
+            pipeline.expire(messages_key, self.ttl)
+        pipeline.zadd(self.index_key, {conversation_id: time.time()}, xx=True)
+        meta, messages, *_ = pipeline.execute()
+        if not meta:
+            return None
+        conversation = _decode_hash(meta)
+        conversation["messages"] = [json.loads(message) for message in messages]
+        return conversation
+
+    def list(self, limit: int = 100) -> List[Dict[str, Any]]:
+        if self.ttl:
+            self.redis.zremrangebyscore(self.index_key, "-inf", time.time() - self.ttl)
+        conversation_ids = [
+            value.decode() if isinstance(value, bytes) else value
+            for value in self.redis.zrevrange(self.index_key, 0, limit - 1)
+        ]
+        pipeline = self.redis.pipeline(transaction=False)
+        for conversation_id in conversation_ids:
+            pipeline.hgetall(self._keys(conversation_id)[0])
+            pipeline.llen(self._keys(conversation_id)[1])
+        results = pipeline.execute()
+        conversations = []
+        for meta, message_count in zip(results[0::2], results[1::2]):
+            if meta:
+                conversations.append(dict(_decode_hash(meta), message_count=message_count))
+        # The index is ordered by last use; report by last update like the memory store
+        return sorted(conversations, key=lambda c: c["updated_at"], reverse=True)
+
+    def delete(self, conversation_id: str) -> bool:
+        pipeline = self.redis.pipeline(transaction=True)
+        pipeline.delete(*self._keys(conversation_id))
+        pipeline.zrem(self.index_key, conversation_id)
+        return pipeline.execute()[0] > 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        try:
+            conversations = self.redis.zcard(self.index_key)
+        except Exception as e:
+            logger.warning(f"Conversation store Redis lookup failed: {str(e)}")
+            conversations = None
+        return {
+            "backend": "redis",
+            "conversations": conversations,
+            "max_messages": self.max_messages
+        }
+
+
+def _metadata(conversation: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": conversation["id"],
+        "created_at": conversation["created_at"],
+        "updated_at": conversation["updated_at"],
+        "message_count": len(conversation["messages"])
+    }
+
+
+def _decode_hash(values: Dict[Any, Any]) -> Dict[str, Any]:
+    return {
+        (key.decode() if isinstance(key, bytes) else key): (value.decode() if isinstance(value, bytes) else value)
+        for key, value in values.items()
+    }
@@ -0,0 +1,331 @@
+from typing import Dict, Any, List, Optional, Iterable
+import numpy as np
+import pandas as pd
+import threading
+import time
+import json
+import os
+import logging
+from .profile_table import ProfileTable
+from .segment_store import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# Profile keys pack (cycle_number, date) into one int64: the date as seconds since 1900 in the low bits
+_KEY_DATE_BITS = 34
+_KEY_DATE_ORIGIN = np.datetime64("1900-01-01T00:00:00", "s").astype(np.int64)
+_KEY_NO_DATE = (1 << _KEY_DATE_BITS) - 1
+# Stand-in keys for counts loaded from version 1 state, outside the range of real cycle numbers
+_LEGACY_CYCLE = -(1 << 28)
+
+
+class RunningStats:
+    """Count, min, max, mean and variance of a stream of values
+
+    Each batch is summarised with NumPy and folded in with the pairwise
+    (Chan et al.) form of Welford's update, which stays numerically stable
+    without keeping the values.
+    """
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0,
+                 minimum: float = np.inf, maximum: float = -np.inf):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = minimum
+        self.max = maximum
+
+    def update(self, values: np.ndarray):
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        batch_mean = float(values.mean())
+        self.merge(RunningStats(
+            count=len(values),
+            mean=batch_mean,
+            m2=float(((values - batch_mean) ** 2).sum()),
+            minimum=float(values.min()),
+            maximum=float(values.max())
+        ))
+
+    def merge(self, other: "RunningStats"):
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self) -> Optional[float]:
+        return float(np.sqrt(self.m2 / self.count)) if self.count else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "RunningStats":
+        return cls(values["count"], values["mean"], values["m2"], values["min"], values["max"])
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.count:
+            return {"count": 0, "min": None, "max": None, "mean": None, "std": None}
+        return {"count": self.count, "min": self.min, "max": self.max, "mean": self.mean, "std": self.std}
+
+
+class DatasetStatistics:
+    """Dataset-wide aggregates maintained incrementally as profiles are ingested
+
+    Keeps profile counts per float, the date range, lat/lon coverage and
+    streaming statistics of every parameter. The API summary is rebuilt after
+    each update, so reading it costs nothing, and the state is saved as JSON
+    (at most every ``save_interval`` seconds, and on ``flush``) so it
+    survives restarts. ``rebuild`` recomputes everything from a stream of
+    tables and ``verify`` compares two sets of statistics.
+
+    Each profile is counted once: the (cycle, date) keys counted per float
+    are kept, so re-uploading a file or retrying a job adds nothing. A
+    profile re-ingested with corrected values keeps its first contribution
+    until the statistics are rebuilt. Keys are held as a sorted int64 array
+    per float and persisted separately in an append-only log, so a save
+    writes only the keys added since the previous one.
+    """
+
+    def __init__(self, path: Optional[str] = None, save_interval: float = 5.0):
+        self.path = path
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.perf_counter()
+        self.profile_keys: Dict[str, np.ndarray] = {}
+        # Keys not in the log yet, and the log file and length the saved state covers
+        self._unsaved_keys: Dict[str, List[np.ndarray]] = {}
+        self._keys_file: Optional[str] = None
+        self._keys_offset = 0
+        self.dates = RunningStats()
+        self.latitude = RunningStats()
+        self.longitude = RunningStats()
+        self.parameters: Dict[str, RunningStats] = {}
+        if path and os.path.exists(path):
+            self._load(path)
+        self._summary = self._build_summary()
+
+    @property
+    def float_counts(self) -> Dict[str, int]:
+        return {float_id: len(keys) for float_id, keys in self.profile_keys.items()}
+
+    @property
+    def total_profiles(self) -> int:
+        return sum(len(keys) for keys in self.profile_keys.values())
+
+    def add_table(self, table: ProfileTable) -> int:
+        """Fold the profiles of a table not counted before into the statistics and return how many there were"""
+        if len(table) == 0:
+            return 0
+        index = table.index
+        float_ids = index["float_id"].fillna("").astype(str).str.strip().to_numpy()
+        keys = _profile_keys(index["cycle_number"], index["date"])
+
+        with self._lock:
+            new_rows = []
+            for float_id in np.unique(float_ids):
+                rows = np.flatnonzero(float_ids == float_id)
+                # First occurrence of each key in the batch, then only keys not counted before
+                float_keys, first = np.unique(keys[rows], return_index=True)
+                counted = self.profile_keys.get(float_id, float_keys[:0])
+                fresh = ~_contains(counted, float_keys)
+                if not fresh.any():
+                    continue
+                self.profile_keys[float_id] = np.union1d(counted, float_keys[fresh])
+                self._unsaved_keys.setdefault(float_id, []).append(float_keys[fresh])
+                new_rows.extend(rows[first[fresh]])
+            if not new_rows:
+                return 0
+            new_rows.sort()
+            if len(new_rows) < len(table):
+                table, index = table.take(new_rows), index.iloc[new_rows]
+            epochs = pd.to_datetime(index["date"]).dropna().to_numpy(dtype="datetime64[s]").astype(np.int64)
+
+            self.dates.update(epochs.astype(np.float64))
+            self.latitude.update(index["latitude"].to_numpy(dtype=np.float64))
+            self.longitude.update(index["longitude"].to_numpy(dtype=np.float64))
+            for param, values in table.measurements.items():
+                self.parameters.setdefault(param, RunningStats()).update(values.ravel())
+            self._summary = self._build_summary()
+            self._dirty = True
+        if self.path and time.perf_counter() - self._last_save >= self.save_interval:
+            self.save()
+        return len(new_rows)
+
+    def summary(self) -> Dict[str, Any]:
+        """Precomputed summary for the statistics endpoint"""
+        return self._summary
+
+    def _build_summary(self) -> Dict[str, Any]:
+        return {
+            "total_floats": len(self.profile_keys),
+            "total_profiles": self.total_profiles,
+            "date_range": {
+                "start": _format_epoch(self.dates.min) if self.dates.count else None,
+                "end": _format_epoch(self.dates.max) if self.dates.count else None
+            },
+            "geographic_coverage": {
+                "lat_range": [self.latitude.min, self.latitude.max] if self.latitude.count else [-90, 90],
+                "lon_range": [self.longitude.min, self.longitude.max] if self.longitude.count else [-180, 180]
+            },
+            "parameters": {param: stats.summary() for param, stats in sorted(self.parameters.items())}
+        }
+
+    def save(self):
+        """Write the state to ``path``; serialised under the lock, written outside it
+
+        Keys added since the last save are appended to the key log first, and
+        the state records how much of the log it covers, so a crash between
+        the two writes leaves a tail that the next load ignores. Statistics
+        that have never been saved to this path (new, legacy or rebuilt ones)
+        start a fresh log, which the state switches to atomically.
+        """
+        with self._save_lock:
+            with self._lock:
+                unsaved, self._unsaved_keys = self._unsaved_keys, {}
+                summaries = {
+                    "dates": self.dates.to_dict(),
+                    "latitude": self.latitude.to_dict(),
+                    "longitude": self.longitude.to_dict(),
+                    "parameters": {param: stats.to_dict() for param, stats in self.parameters.items()}
+                }
+                self._dirty = False
+                self._last_save = time.perf_counter()
+            try:
+                previous = self._keys_file
+                if previous is None:
+                    self._keys_file, self._keys_offset = f"{os.path.basename(self.path)}.{time.time_ns()}.keys", 0
+                if unsaved or previous is None:
+                    line = json.dumps({float_id: np.concatenate(keys).tolist() for float_id, keys in unsaved.items()})
+                    keys_path = os.path.join(os.path.dirname(os.path.abspath(self.path)), self._keys_file)
+                    with open(keys_path, "r+b" if previous is not None else "wb") as f:
+                        f.seek(self._keys_offset)
+                        f.write(line.encode() + b"\n")
+                        f.truncate()
+                        f.flush()
+                        os.fsync(f.fileno())
+                        self._keys_offset = f.tell()
+                state = json.dumps({"version": 3, "keys_file": self._keys_file, "keys_offset": self._keys_offset, **summaries})
+                atomic_write(self.path, lambda f: f.write(state.encode()))
+            except Exception:
+                # Keep the keys for the next save; the log is rewritten from the last saved offset
+                with self._lock:
+                    for float_id, keys in unsaved.items():
+                        self._unsaved_keys[float_id] = keys + self._unsaved_keys.get(float_id, [])
+                    self._dirty = True
+                if previous is None:
+                    self._keys_file = None
+                raise
+            if previous is None:
+                self._remove_stale_key_logs()
+
+    def flush(self):
+        """Save changes not written yet, e.g. at the end of a job or on shutdown"""
+        if self.path and self._dirty:
+            self.save()
+
+    def _load(self, path: str):
+        with open(path) as f:
+            state = json.load(f)
+        version = state.get("version", 1)
+        if version >= 3:
+            self._keys_file, self._keys_offset = state["keys_file"], state["keys_offset"]
+            keys: Dict[str, List[List[int]]] = {}
+            with open(os.path.join(os.path.dirname(os.path.abspath(path)), self._keys_file), "rb") as f:
+                for line in f.read(self._keys_offset).splitlines():
+                    for float_id, float_keys in json.loads(line).items():
+                        keys.setdefault(float_id, []).append(float_keys)
+            self.profile_keys = {
+                float_id: np.unique(np.concatenate([np.asarray(chunk, dtype=np.int64) for chunk in chunks]))
+                for float_id, chunks in keys.items()
+            }
+        else:
+            if version == 2:
+                self.profile_keys = {float_id: _parse_v2_keys(keys) for float_id, keys in state["profile_keys"].items()}
+            else:
+                # Version 1 kept only counts; stand-in keys keep the counts, and later batches are deduplicated from here on
+                self.profile_keys = {
+                    float_id: (np.int64(_LEGACY_CYCLE) << _KEY_DATE_BITS) + np.arange(count, dtype=np.int64)
+                    for float_id, count in state["float_counts"].items()
+                }
+            # Written to a key log on the next save
+            self._unsaved_keys = {float_id: [keys] for float_id, keys in self.profile_keys.items()}
+            self._dirty = True
+        self.dates = RunningStats.from_dict(state["dates"])
+        self.latitude = RunningStats.from_dict(state["latitude"])
+        self.longitude = RunningStats.from_dict(state["longitude"])
+        self.parameters = {param: RunningStats.from_dict(values) for param, values in state["parameters"].items()}
+
+    @classmethod
+    def rebuild(cls, tables: Iterable[ProfileTable]) -> "DatasetStatistics":
+        """Statistics recomputed from scratch over a stream of tables, without persisting them"""
+        statistics = cls()
+        for table in tables:
+            statistics.add_table(table)
+        return statistics
+
+    def verify(self, other: "DatasetStatistics", rtol: float = 1e-9) -> List[str]:
+        """Differences between two sets of statistics; empty if they agree"""
+        problems = []
+        if self.float_counts != other.float_counts:
+            differing = sorted(set(self.float_counts.items()) ^ set(other.float_counts.items()))
+            problems.append(f"float counts differ for {len({float_id for float_id, _ in differing})} floats")
+
+        pairs = {"dates": (self.dates, other.dates), "latitude": (self.latitude, other.latitude),
+                 "longitude": (self.longitude, other.longitude)}
+        for param in sorted(set(self.parameters) | set(other.parameters)):
+            pairs[param] = (self.parameters.get(param, RunningStats()), other.parameters.get(param, RunningStats()))
+
+        for name, (mine, theirs) in pairs.items():
+            if mine.count != theirs.count:
+                problems.append(f"{name}: count {mine.count} != {theirs.count}")
+                continue
+            for field in ("min", "max", "mean", "std"):
+                a, b = getattr(mine, field), getattr(theirs, field)
+                if a is not None and b is not None and not np.isclose(a, b, rtol=rtol, atol=0):
+                    problems.append(f"{name}: {field} {a} != {b}")
+        return problems
+
+
+    def _remove_stale_key_logs(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        prefix = f"{os.path.basename(self.path)}."
+        for name in os.listdir(directory):
+            if name.startswith(prefix) and name.endswith(".keys") and name != self._keys_file:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError as e:
+                    logger.warning(f"Could not remove old statistics key log {name}: {str(e)}")
+
+
+def _profile_keys(cycles: pd.Series, dates: pd.Series) -> np.ndarray:
+    """One int64 per profile identifying its (cycle_number, date)"""
+    seconds = pd.to_datetime(dates).to_numpy(dtype="datetime64[s]")
+    offsets = seconds.astype(np.int64) - _KEY_DATE_ORIGIN
+    offsets[np.isnat(seconds)] = _KEY_NO_DATE
+    return (cycles.to_numpy(dtype=np.int64) << _KEY_DATE_BITS) | offsets
+
+
+def _contains(counted: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    positions = np.minimum(np.searchsorted(counted, keys), max(len(counted) - 1, 0))
+    return counted[positions] == keys if len(counted) else np.zeros(len(keys), dtype=bool)
+
+
+def _parse_v2_keys(keys: List[str]) -> np.ndarray:
+    """Version 2 stored keys as "cycle@date" strings"""
+    cycles, dates = zip(*(key.split("@", 1) for key in keys)) if keys else ((), ())
+    parsed = _profile_keys(pd.Series(cycles, dtype="int64"), pd.Series(pd.to_datetime(list(dates), errors="coerce")))
+    return np.unique(parsed)
+
+
+def _format_epoch(seconds: float) -> str:
+    return str(pd.Timestamp(int(round(seconds)), unit="s"))
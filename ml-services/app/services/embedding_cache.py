@@ -0,0 +1,130 @@
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Callable
+import numpy as np
+import hashlib
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Content-addressed cache of text embeddings
+
+    Entries are keyed by a hash of the model name and text. Lookups go to an
+    in-process LRU tier bounded by ``max_bytes`` and then, if a Redis client
+    is given, to a shared Redis tier; only texts missing from both are
+    encoded, in a single batch.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        redis_client=None,
+        redis_ttl: Optional[int] = None,
+        key_prefix: str = "emb:"
+    ):
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.redis = redis_client
+        self.redis_ttl = redis_ttl
+        self.key_prefix = key_prefix
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.redis_errors = 0
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha256(f"{self.model_name}\0{text}".encode()).hexdigest()
+        return f"{self.key_prefix}{digest}"
+
+    def encode(self, texts: List[str], encoder: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Embeddings for ``texts``, calling ``encoder`` only for uncached texts"""
+        keys = [self.key(text) for text in texts]
+        found = self._get_local(keys)
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing and self.redis is not None:
+            remote = self._get_redis(missing)
+            self._put_local(remote)
+            found.update(remote)
+            missing = [key for key in missing if key not in remote]
+
+        if missing:
+            texts_by_key = dict(zip(keys, texts))
+            encoded = np.asarray(encoder([texts_by_key[key] for key in missing]), dtype=np.float32)
+            new_entries = dict(zip(missing, encoded))
+            self._put_local(new_entries)
+            self._put_redis(new_entries)
+            found.update(new_entries)
+
+        with self._lock:
+            self.misses += len(missing)
+        return np.stack([found[key] for key in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+
+    def _get_local(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+                    self.hits += 1
+        return found
+
+    def _put_local(self, entries: Dict[str, np.ndarray]):
+        with self._lock:
+            for key, vector in entries.items():
+                if key in self._entries:
+                    continue
+                self._entries[key] = vector
+                self._bytes += vector.nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def _get_redis(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        try:
+            values = self.redis.mget(keys)
+        except Exception as e:
+            self.redis_errors += 1
+            logger.warning(f"Embedding cache Redis lookup failed: {str(e)}")
+            return {}
+        found = {key: np.frombuffer(value, dtype=np.float32) for key, value in zip(keys, values) if value is not None}
+        with self._lock:
+            self.redis_hits += len(found)
+        return found
+
+    def _put_redis(self, entries: Dict[str, np.ndarray]):
+        if self.redis is None:
+            return
+        try:
+            pipeline = self.redis.pipeline(transaction=False)
+            for key, vector in entries.items():
+                pipeline.set(key, vector.tobytes(), ex=self.redis_ttl)
+            pipeline.execute()
+        except Exception as e:
+            self.redis_errors += 1
+            logger.warning(f"Embedding cache Redis write failed: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and memory usage"""
+        lookups = self.hits + self.redis_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "redis_errors": self.redis_errors,
+            "hit_rate": round((self.hits + self.redis_hits) / lookups, 4) if lookups else None
+        }
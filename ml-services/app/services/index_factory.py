@@ -0,0 +1,76 @@
+import faiss
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Index types supported by ``create_index``
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+
+def resolve_index_type(vector_db_type: str) -> str:
+    """Map a ``VECTOR_DB_TYPE`` setting such as ``faiss_ivf_pq`` to an index type"""
+    index_type = vector_db_type.lower().replace("-", "_")
+    if index_type.startswith("faiss"):
+        index_type = index_type[len("faiss"):].lstrip("_") or "flat"
+
+    if index_type not in INDEX_TYPES:
+        logger.warning(f"Unsupported vector index type '{vector_db_type}', using exhaustive flat index")
+        return "flat"
+    return index_type
+
+
+def index_description(index_type: str, nlist: int = 256, pq_m: int = 48, hnsw_m: int = 32) -> str:
+    """FAISS index factory string for an index type"""
+    return {
+        "flat": "Flat",
+        "ivf_flat": f"IVF{nlist},Flat",
+        "ivf_pq": f"IVF{nlist},PQ{pq_m}",
+        "hnsw": f"HNSW{hnsw_m}",
+    }[index_type]
+
+
+def create_index(
+    index_type: str,
+    dimension: int,
+    nlist: int = 256,
+    pq_m: int = 48,
+    hnsw_m: int = 32,
+    ef_construction: int = 200
+) -> faiss.Index:
+    """Create an empty inner-product index (cosine similarity on normalized vectors)"""
+    description = index_description(index_type, nlist=nlist, pq_m=pq_m, hnsw_m=hnsw_m)
+    index = faiss.index_factory(dimension, description, faiss.METRIC_INNER_PRODUCT)
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = ef_construction
+    if index_type == "ivf_pq":
+        # Polysemous codes only serve Hamming-threshold search, which is never enabled; training them dominates train()
+        faiss.downcast_index(index).do_polysemous_training = False
+    return index
+
+
+def configure_search(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """Apply query-time parameters that the index supports"""
+    params = faiss.ParameterSpace()
+    if nprobe is not None and _is_ivf(index):
+        params.set_index_parameter(index, "nprobe", nprobe)
+    if ef_search is not None and _is_hnsw(index):
+        params.set_index_parameter(index, "efSearch", ef_search)
+
+
+def min_training_size(index_type: str, nlist: int = 256) -> int:
+    """Smallest number of vectors worth training an index type on"""
+    if index_type == "ivf_flat":
+        return nlist
+    if index_type == "ivf_pq":
+        # PQ codebooks have 256 centroids per sub-quantizer
+        return max(nlist, 256)
+    return 0
+
+
+def _is_ivf(index: faiss.Index) -> bool:
+    return faiss.try_extract_index_ivf(index) is not None
+
+
+def _is_hnsw(index: faiss.Index) -> bool:
+    return hasattr(faiss.downcast_index(index), "hnsw")
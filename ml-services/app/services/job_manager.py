@@ -0,0 +1,179 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Callable
+import asyncio
+import os
+import uuid
+import logging
+from .netcdf_processor import NetCDFProcessor
+from .profile_table import ProfileTable
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Progress counters reported by every job; registered sinks may add their own
+PROGRESS_COUNTERS = ("profiles_parsed", "rows_written", "vectors_indexed")
+
+# Processor used inside worker processes, created once per worker
+_worker_processor: Optional[NetCDFProcessor] = None
+
+
+def _get_worker_processor() -> NetCDFProcessor:
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = NetCDFProcessor()
+    return _worker_processor
+
+
+def _count_profiles(file_path: str) -> int:
+    return _get_worker_processor().count_profiles(file_path)
+
+
+def _parse_batch(file_path: str, start: int, stop: int) -> ProfileTable:
+    return _get_worker_processor().read_profile_range(file_path, start, stop)
+
+
+class JobManager:
+    """Background ingestion jobs for uploaded NetCDF files
+
+    Parsing runs in a process pool, one batch of profiles at a time, so a
+    large upload never blocks the event loop or a request. Each parsed batch
+    is handed to the registered sinks (database, vector index, ...), and
+    their returned counts feed the job's progress counters. The sinks run on
+    threads of this process rather than in the pool: the vector index, the
+    catalog and the statistics are in-memory state that the API serves
+    from. The next batch is parsed in the pool while they run. Sinks fail
+    independently: a sink that raises is recorded in the job's
+    ``sink_errors`` and skipped for the rest of the file, while the other
+    sinks keep storing every batch.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_finished_jobs: int = 1000):
+        self.max_workers = max_workers or settings.ingest_workers
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.sinks: Dict[str, Callable[[ProfileTable], int]] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def register_sink(self, counter: str, sink: Callable[[ProfileTable], int]):
+        """Register a callable that stores a parsed batch and returns the number of items written"""
+        if counter == "profiles_parsed":
+            raise ValueError("profiles_parsed is counted by the job itself")
+        self.sinks[counter] = sink
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def submit(self, file_path: str, filename: Optional[str] = None, delete_after: bool = True) -> Dict[str, Any]:
+        """Queue a NetCDF file for ingestion and return the new job"""
+        job_id = str(uuid.uuid4())
+        job = {
+            "job_id": job_id,
+            "filename": filename or os.path.basename(file_path),
+            "status": "queued",
+            "progress": 0,
+            "message": "Waiting to be processed",
+            "profiles_total": None,
+            "created_at": _now(),
+            "updated_at": _now(),
+            "error": None,
+            "sink_errors": {}
+        }
+        job.update({counter: 0 for counter in (*PROGRESS_COUNTERS, *self.sinks)})
+        self.jobs[job_id] = job
+        self._prune_jobs()
+
+        task = asyncio.get_running_loop().create_task(self._run(job_id, file_path, delete_after))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        return dict(job)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a snapshot of a job by ID"""
+        job = self.jobs.get(job_id)
+        return dict(job, sink_errors=dict(job["sink_errors"])) if job else None
+
+    async def _run(self, job_id: str, file_path: str, delete_after: bool):
+        job = self.jobs[job_id]
+        loop = asyncio.get_running_loop()
+        parsing: Optional[asyncio.Future] = None
+        try:
+            self._update(job, status="running", message="Reading file")
+            total = await loop.run_in_executor(self.executor, _count_profiles, file_path)
+            self._update(job, profiles_total=total)
+
+            batch_size = settings.profile_batch_size
+
+            def parse(start: int) -> Optional[asyncio.Future]:
+                if start >= total:
+                    return None
+                return loop.run_in_executor(self.executor, _parse_batch, file_path, start, min(start + batch_size, total))
+
+            parsing = parse(0)
+            for start in range(0, total, batch_size):
+                stop = min(start + batch_size, total)
+                table = await parsing
+                parsing = parse(stop)
+                job["profiles_parsed"] += len(table)
+
+                for counter, sink in self.sinks.items():
+                    if counter in job["sink_errors"]:
+                        continue
+                    try:
+                        job[counter] += await asyncio.to_thread(sink, table)
+                    except Exception as e:
+                        logger.error(f"Sink {counter} failed for job {job_id}: {str(e)}")
+                        job["sink_errors"][counter] = str(e)
+
+                self._update(
+                    job,
+                    progress=int(100 * stop / total),
+                    message=f"Processed {stop} of {total} profiles"
+                )
+
+            message = f"Successfully processed {job['profiles_parsed']} profiles"
+            if job["sink_errors"]:
+                message = (
+                    f"Processed {job['profiles_parsed']} profiles; "
+                    f"not stored by {', '.join(job['sink_errors'])}"
+                )
+            self._update(job, status="completed", progress=100, message=message)
+
+        except Exception as e:
+            logger.error(f"Error processing job {job_id}: {str(e)}")
+            self._update(job, status="failed", error=str(e), message="Failed to process NetCDF file")
+
+        finally:
+            # A failed or cancelled job abandons the batch still being parsed; a parse that already
+            # finished has its result (or error) retrieved so it is not reported as unhandled
+            if parsing is not None and not parsing.cancel() and not parsing.cancelled():
+                parsing.exception()
+            if delete_after and os.path.exists(file_path):
+                os.unlink(file_path)
+
+    def _update(self, job: Dict[str, Any], **fields):
+        job.update(fields)
+        job["updated_at"] = _now()
+
+    def _prune_jobs(self):
+        """Drop the oldest finished jobs beyond ``max_finished_jobs``"""
+        finished = [job_id for job_id, job in self.jobs.items() if job["status"] in ("completed", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+    def shutdown(self):
+        """Cancel running jobs and stop the worker pool"""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
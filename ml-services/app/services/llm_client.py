@@ -0,0 +1,431 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
+import numpy as np
+import httpx
+import asyncio
+import random
+import json
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+class LLMError(Exception):
+    """An LLM call failed; ``retryable`` tells whether trying again may help"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retryable: bool = False,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+@dataclass
+class LLMResult:
+    """Text and accounting of one completed LLM call"""
+
+    text: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_ms: float = 0.0
+    attempts: int = 1
+    hedged: bool = False
+
+
+class OpenAIProvider:
+    """Request and response format of the OpenAI chat completions API (and compatible servers)"""
+
+    name = "openai"
+
+    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo", base_url: Optional[str] = None):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = (base_url or "https://api.openai.com/v1").rstrip("/")
+
+    def build_request(self, messages: List[Dict[str, str]], system: Optional[str], max_tokens: int,
+                      temperature: float, stream: bool) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        body = {
+            "model": self.model,
+            "messages": ([{"role": "system", "content": system}] if system else []) + list(messages),
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+        if stream:
+            body.update(stream=True, stream_options={"include_usage": True})
+        return f"{self.base_url}/chat/completions", {"Authorization": f"Bearer {self.api_key}"}, body
+
+    def parse_response(self, payload: Dict[str, Any]) -> Tuple[str, int, int]:
+        usage = payload.get("usage") or {}
+        text = payload["choices"][0]["message"].get("content") or ""
+        return text, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+    def parse_stream_event(self, data: Dict[str, Any]) -> Tuple[str, int, int]:
+        """Text delta and token usage carried by one streamed event"""
+        usage = data.get("usage") or {}
+        choices = data.get("choices") or [{}]
+        text = (choices[0].get("delta") or {}).get("content") or ""
+        return text, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+
+class AnthropicProvider:
+    """Request and response format of the Anthropic messages API"""
+
+    name = "anthropic"
+
+    def __init__(self, api_key: str, model: str = "claude-3-haiku-20240307", base_url: Optional[str] = None):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = (base_url or "https://api.anthropic.com").rstrip("/")
+
+    def build_request(self, messages: List[Dict[str, str]], system: Optional[str], max_tokens: int,
+                      temperature: float, stream: bool) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        body = {
+            "model": self.model,
+            "messages": list(messages),
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+        if system:
+            body["system"] = system
+        if stream:
+            body["stream"] = True
+        headers = {"x-api-key": self.api_key, "anthropic-version": "2023-06-01"}
+        return f"{self.base_url}/v1/messages", headers, body
+
+    def parse_response(self, payload: Dict[str, Any]) -> Tuple[str, int, int]:
+        usage = payload.get("usage") or {}
+        text = "".join(block.get("text", "") for block in payload.get("content", []) if block.get("type") == "text")
+        return text, usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+
+    def parse_stream_event(self, data: Dict[str, Any]) -> Tuple[str, int, int]:
+        if data.get("type") == "content_block_delta":
+            return (data.get("delta") or {}).get("text", ""), 0, 0
+        if data.get("type") == "message_start":
+            return "", ((data.get("message") or {}).get("usage") or {}).get("input_tokens", 0), 0
+        if data.get("type") == "message_delta":
+            return "", 0, (data.get("usage") or {}).get("output_tokens", 0)
+        return "", 0, 0
+
+
+PROVIDERS = {"openai": OpenAIProvider, "anthropic": AnthropicProvider}
+
+
+class LLMClient:
+    """Provider-agnostic async LLM client with pooling, deadlines, retries and hedging
+
+    All calls share one ``httpx.AsyncClient`` connection pool, and at most
+    ``max_concurrency`` requests are in flight at once. Each call has a
+    deadline covering all of its attempts. Timeouts, connection errors and
+    429/5xx responses are retried with full-jitter exponential backoff (or
+    the server's Retry-After). With ``hedge_after`` set, a second request is
+    sent when the first has not answered within that many seconds and the
+    first answer wins. Token usage and latencies are tracked for metrics.
+    """
+
+    def __init__(
+        self,
+        provider,
+        max_concurrency: int = 8,
+        timeout: float = 30.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        hedge_after: Optional[float] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after or None
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+        self._releasing = set()
+        self._latencies = deque(maxlen=1000)
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def _session(self) -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        """Connection pool and concurrency limit, bound to the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            if self._client is not None:
+                self._release(self._client, self._loop)
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency * 2, max_keepalive_connections=self.max_concurrency),
+                transport=self.transport
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._client, self._semaphore
+
+    def _release(self, client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop):
+        """Close a connection pool left behind by another event loop
+
+        Its connections belong to that loop, so they are closed there while
+        the loop is still alive; once it is closed, the pool is shut down
+        from the current loop as far as that is still possible.
+        """
+        if not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            return
+        task = asyncio.get_running_loop().create_task(_close_quietly(client))
+        self._releasing.add(task)
+        task.add_done_callback(self._releasing.discard)
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        system: Optional[str] = None,
+        max_tokens: int = 512,
+        temperature: float = 0.2,
+        deadline: Optional[float] = None
+    ) -> LLMResult:
+        """Complete a conversation, retrying and hedging within ``deadline`` seconds"""
+        url, headers, body = self.provider.build_request(messages, system, max_tokens, temperature, stream=False)
+        started = time.perf_counter()
+        expires = time.monotonic() + (deadline or self.timeout)
+        self.requests += 1
+
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                payload, hedged = await self._hedged(url, headers, body, expires)
+                break
+            except LLMError as e:
+                delay = self._retry_delay(e, attempt, expires)
+                if delay is None:
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                logger.warning(f"LLM request failed ({str(e)}); retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+        text, prompt_tokens, completion_tokens = self.provider.parse_response(payload)
+        result = LLMResult(
+            text=text,
+            model=payload.get("model", self.provider.model),
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            latency_ms=(time.perf_counter() - started) * 1000,
+            attempts=attempt,
+            hedged=hedged
+        )
+        self._account(result.latency_ms, prompt_tokens, completion_tokens)
+        return result
+
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        system: Optional[str] = None,
+        max_tokens: int = 512,
+        temperature: float = 0.2,
+        deadline: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """Stream the completion as text chunks
+
+        Failures before the first chunk are retried like ``complete``; once text
+        has been yielded the stream cannot be replayed, so later errors are raised.
+        Streams are never hedged.
+        """
+        url, headers, body = self.provider.build_request(messages, system, max_tokens, temperature, stream=True)
+        client, semaphore = self._session()
+        started = time.perf_counter()
+        expires = time.monotonic() + (deadline or self.timeout)
+        self.requests += 1
+        prompt_tokens = completion_tokens = 0
+
+        attempt = 0
+        while True:
+            attempt += 1
+            yielded = False
+            try:
+                async with semaphore:
+                    async with client.stream("POST", url, headers=headers, json=body,
+                                             timeout=_remaining(expires)) as response:
+                        if response.status_code >= 400:
+                            await response.aread()
+                            raise _status_error(response)
+                        async for line in response.aiter_lines():
+                            if time.monotonic() > expires:
+                                raise LLMError("LLM stream exceeded its deadline")
+                            data = _sse_data(line)
+                            if data is None:
+                                continue
+                            text, prompt, completion = self.provider.parse_stream_event(data)
+                            prompt_tokens = max(prompt_tokens, prompt)
+                            completion_tokens = max(completion_tokens, completion)
+                            if text:
+                                yielded = True
+                                yield text
+                break
+            except httpx.TimeoutException as e:
+                self.timeouts += 1
+                error = LLMError(f"LLM stream timed out: {type(e).__name__}", retryable=True)
+            except httpx.TransportError as e:
+                error = LLMError(f"LLM connection failed: {type(e).__name__}: {str(e)}", retryable=True)
+            except LLMError as e:
+                error = e
+            delay = None if yielded else self._retry_delay(error, attempt, expires)
+            if delay is None:
+                self.failures += 1
+                raise error
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+        self._account((time.perf_counter() - started) * 1000, prompt_tokens, completion_tokens)
+
+    async def _hedged(self, url: str, headers: Dict[str, str], body: Dict[str, Any], expires: float):
+        """Response payload of the first request to succeed, and whether a hedge was sent"""
+        first = asyncio.create_task(self._post(url, headers, body, expires))
+        if self.hedge_after is None:
+            return await first, False
+
+        done, _ = await asyncio.wait({first}, timeout=min(self.hedge_after, max(expires - time.monotonic(), 0)))
+        _, semaphore = self._session()
+        # Hedging only pays off when there is spare capacity; never queue a hedge behind other calls
+        if done or semaphore.locked():
+            return await first, False
+
+        self.hedges += 1
+        hedge = asyncio.create_task(self._post(url, headers, body, expires))
+        pending = {first, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result(), True
+                    error = task.exception()
+                    if not getattr(error, "retryable", False):
+                        raise error
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _post(self, url: str, headers: Dict[str, str], body: Dict[str, Any], expires: float) -> Dict[str, Any]:
+        client, semaphore = self._session()
+        try:
+            async with semaphore:
+                response = await client.post(url, headers=headers, json=body, timeout=_remaining(expires))
+        except httpx.TimeoutException as e:
+            self.timeouts += 1
+            raise LLMError(f"LLM request timed out: {type(e).__name__}", retryable=True)
+        except httpx.TransportError as e:
+            raise LLMError(f"LLM connection failed: {type(e).__name__}: {str(e)}", retryable=True)
+        if response.status_code >= 400:
+            raise _status_error(response)
+        try:
+            return response.json()
+        except ValueError:
+            # Proxies and overloaded gateways sometimes answer 200 with an HTML page
+            raise LLMError(
+                f"LLM provider returned invalid JSON: {response.text[:200]}",
+                status_code=response.status_code,
+                retryable=True
+            )
+
+    def _retry_delay(self, error: LLMError, attempt: int, expires: float) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None if the call should fail now"""
+        if not error.retryable or attempt > self.max_retries:
+            return None
+        delay = error.retry_after
+        if delay is None:
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+        # Leave time for the next attempt itself, not only the wait before it
+        if time.monotonic() + delay >= expires - 0.05:
+            return None
+        return delay
+
+    def _account(self, latency_ms: float, prompt_tokens: int, completion_tokens: int):
+        self._latencies.append(latency_ms)
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        latencies = np.array(self._latencies) if self._latencies else None
+        return {
+            "provider": self.provider.name,
+            "model": self.provider.model,
+            "requests": self.requests,
+            "failures": self.failures,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "latency_ms": {
+                "p50": round(float(np.percentile(latencies, 50)), 2),
+                "p95": round(float(np.percentile(latencies, 95)), 2),
+                "max": round(float(latencies.max()), 2)
+            } if latencies is not None else None
+        }
+
+
+def _remaining(expires: float) -> float:
+    remaining = expires - time.monotonic()
+    if remaining <= 0:
+        raise LLMError("LLM call exceeded its deadline")
+    return remaining
+
+
+def _status_error(response: httpx.Response) -> LLMError:
+    retry_after = response.headers.get("retry-after")
+    try:
+        retry_after = float(retry_after) if retry_after is not None else None
+    except ValueError:
+        retry_after = None
+    return LLMError(
+        f"LLM provider returned {response.status_code}: {response.text[:200]}",
+        status_code=response.status_code,
+        retryable=response.status_code in RETRYABLE_STATUS,
+        retry_after=retry_after
+    )
+
+
+def _sse_data(line: str) -> Optional[Dict[str, Any]]:
+    """JSON payload of a Server-Sent Events ``data:`` line, None for anything else"""
+    if not line.startswith("data:"):
+        return None
+    data = line[5:].strip()
+    if not data or data == "[DONE]":
+        return None
+    try:
+        return json.loads(data)
+    except ValueError:
+        raise LLMError(f"LLM provider sent an invalid stream event: {data[:200]}", retryable=True)
+
+
+async def _close_quietly(client: httpx.AsyncClient):
+    try:
+        await client.aclose()
+    except Exception as e:
+        logger.debug(f"Closing a stale LLM connection pool failed: {str(e)}")
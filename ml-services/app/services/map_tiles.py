@@ -0,0 +1,244 @@
+from collections import OrderedDict, defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import threading
+import json
+import logging
+from .profile_catalog import ProfileCatalog
+from .spatial_index import SearchFilters
+from ..utils.geo import lonlat_to_tile, tile_bbox, in_bbox
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+TileKey = Tuple[int, int, int]
+
+# Deepest zoom level served; web maps rarely go past 22
+MAX_ZOOM = 22
+
+
+class MapTileService:
+    """Zoom-aware map features served as z/x/y tiles
+
+    Below ``point_zoom`` each tile aggregates its profiles into a
+    ``grid_size`` x ``grid_size`` grid of cells (profile and float counts,
+    centroid, latest date); from ``point_zoom`` on it returns the latest
+    position of every float. Tiles are built from the catalog's spatial index
+    on first request and kept in an LRU cache; when profiles are added only
+    the cached tiles containing them are dropped, and tiles that were being
+    built at that moment are not cached.
+    """
+
+    def __init__(
+        self,
+        catalog: ProfileCatalog,
+        grid_size: Optional[int] = None,
+        point_zoom: Optional[int] = None,
+        max_tiles: Optional[int] = None
+    ):
+        self.catalog = catalog
+        self.grid_size = grid_size or settings.map_tile_grid_size
+        self.point_zoom = point_zoom or settings.map_point_zoom
+        self.max_tiles = max_tiles or settings.map_tile_cache_size
+        self._cache: "OrderedDict[Tuple[TileKey, str], Dict[str, Any]]" = OrderedDict()
+        self._cached_filters: Dict[TileKey, set] = defaultdict(set)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        catalog.add_listener(self.invalidate)
+
+    def get_tile(self, zoom: int, x: int, y: int, filters: Optional[SearchFilters] = None) -> Dict[str, Any]:
+        """GeoJSON FeatureCollection for one tile"""
+        _check_zoom(zoom)
+        n = 2 ** zoom
+        if not (0 <= x < n and 0 <= y < n):
+            raise ValueError(f"Tile {zoom}/{x}/{y} is outside the map")
+        filters = filters or SearchFilters()
+        key = ((zoom, x, y), _filter_key(filters))
+
+        with self._lock:
+            tile = self._cache.get(key)
+            if tile is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return tile
+            self.misses += 1
+            generation = self._generation
+
+        tile = self._build_tile(zoom, x, y, filters)
+        with self._lock:
+            if generation != self._generation:
+                # Profiles were added while building; the tile may already be stale
+                return tile
+            self._cache[key] = tile
+            self._cached_filters[key[0]].add(key[1])
+            while len(self._cache) > self.max_tiles:
+                (tile_key, filter_key), _ = self._cache.popitem(last=False)
+                self._discard(tile_key, filter_key)
+        return tile
+
+    def get_features(
+        self,
+        bbox: Tuple[float, float, float, float],
+        zoom: int,
+        filters: Optional[SearchFilters] = None,
+        max_tiles: int = 64
+    ) -> Dict[str, Any]:
+        """Features of every tile covering ``bbox``, clipped to it
+
+        The zoom is lowered until the box is covered by at most ``max_tiles`` tiles.
+        """
+        _check_zoom(zoom)
+        min_lat, min_lon, max_lat, max_lon = bbox
+        while True:
+            n = 2 ** zoom
+            _, y0 = lonlat_to_tile(max_lat, min_lon, zoom)
+            _, y1 = lonlat_to_tile(min_lat, max_lon, zoom)
+            # Longitudes are not wrapped here so that max_lon = 180 stays in the last column
+            x0, x1 = (int(np.clip((lon + 180.0) / 360.0 * n, 0, n - 1)) for lon in (min_lon, max_lon))
+            xs = list(range(x0, x1 + 1)) if min_lon <= max_lon else list(range(x0, n)) + list(range(0, x1 + 1))
+            ys = range(int(y0), int(y1) + 1)
+            if len(xs) * len(ys) <= max_tiles or zoom == 0:
+                break
+            zoom -= 1
+
+        features = []
+        for x in xs:
+            for y in ys:
+                for feature in self.get_tile(zoom, x, y, filters)["features"]:
+                    lon, lat = feature["geometry"]["coordinates"]
+                    if in_bbox(lat, lon, bbox):
+                        features.append(feature)
+        return {"type": "FeatureCollection", "zoom": zoom, "features": features}
+
+    def invalidate(self, records: np.ndarray):
+        """Drop the cached tiles containing any of the given profile records"""
+        valid = ~np.isnan(records["latitude"]) & ~np.isnan(records["longitude"])
+        latitude, longitude = records["latitude"][valid], records["longitude"][valid]
+        if len(latitude) == 0:
+            return
+
+        with self._lock:
+            self._generation += 1
+            for zoom in {tile_key[0] for tile_key in self._cached_filters}:
+                x, y = lonlat_to_tile(latitude, longitude, zoom)
+                for tile_key in set(zip([zoom] * len(x), x.astype(int).tolist(), y.astype(int).tolist())):
+                    for filter_key in self._cached_filters.pop(tile_key, ()):
+                        del self._cache[(tile_key, filter_key)]
+                        self.invalidations += 1
+
+    def _discard(self, tile_key: TileKey, filter_key: str):
+        filter_keys = self._cached_filters.get(tile_key)
+        if filter_keys is not None:
+            filter_keys.discard(filter_key)
+            if not filter_keys:
+                del self._cached_filters[tile_key]
+
+    def _build_tile(self, zoom: int, x: int, y: int, filters: SearchFilters) -> Dict[str, Any]:
+        tile_filters = SearchFilters(
+            bbox=tile_bbox(zoom, x, y),
+            start_date=filters.start_date,
+            end_date=filters.end_date,
+            parameters=filters.parameters
+        )
+        records, rows = self.catalog.select(tile_filters)
+        selected = records[rows]
+
+        # Tile bboxes overlap on their edges; keep only points that map to this tile
+        tile_x, tile_y = lonlat_to_tile(selected["latitude"], selected["longitude"], zoom)
+        in_tile = (tile_x.astype(int) == x) & (tile_y.astype(int) == y)
+        selected = selected[in_tile]
+
+        if zoom >= self.point_zoom:
+            features = _float_features(selected)
+        else:
+            tile_x, tile_y = tile_x[in_tile], tile_y[in_tile]
+            cell_x = np.minimum(((tile_x - x) * self.grid_size).astype(int), self.grid_size - 1)
+            cell_y = np.minimum(((tile_y - y) * self.grid_size).astype(int), self.grid_size - 1)
+            features = _cell_features(selected, cell_y * self.grid_size + cell_x)
+
+        return {
+            "type": "FeatureCollection",
+            "tile": {"z": zoom, "x": x, "y": y},
+            "aggregated": zoom < self.point_zoom,
+            "profile_count": int(len(selected)),
+            "features": features
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "tiles": len(self._cache),
+            "max_tiles": self.max_tiles,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None
+        }
+
+
+def _cell_features(records: np.ndarray, cells: np.ndarray) -> List[Dict[str, Any]]:
+    """One point feature per occupied grid cell, at the centroid of its profiles"""
+    if len(records) == 0:
+        return []
+    unique_cells, inverse, counts = np.unique(cells, return_inverse=True, return_counts=True)
+    latitude = np.bincount(inverse, weights=records["latitude"]) / counts
+    longitude = np.bincount(inverse, weights=records["longitude"]) / counts
+
+    # Distinct floats per cell, from the unique (cell, float) pairs encoded as integers
+    float_codes, float_ids = pd.factorize(records["float_id"])
+    pairs = np.unique(inverse.astype(np.int64) * len(float_ids) + float_codes)
+    float_counts = np.bincount(pairs // len(float_ids), minlength=len(unique_cells))
+
+    # NaT is the smallest datetime64 integer, so it survives only in cells without any dates
+    latest = np.full(len(unique_cells), np.iinfo(np.int64).min, dtype=np.int64)
+    np.maximum.at(latest, inverse, records["date"].astype(np.int64))
+    latest = latest.astype("datetime64[s]")
+
+    return [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [round(float(lon), 5), round(float(lat), 5)]},
+            "properties": {
+                "profile_count": int(count),
+                "float_count": int(floats),
+                "latest_date": None if np.isnat(date) else str(pd.Timestamp(date))
+            }
+        }
+        for lat, lon, count, floats, date in zip(latitude, longitude, counts, float_counts, latest)
+    ]
+
+
+def _float_features(records: np.ndarray) -> List[Dict[str, Any]]:
+    """One point feature per float, at its latest position within the tile"""
+    if len(records) == 0:
+        return []
+    order = np.lexsort((records["date"], records["float_id"]))
+    records = records[order]
+    last = np.r_[records["float_id"][1:] != records["float_id"][:-1], True]
+    counts = np.diff(np.r_[-1, np.flatnonzero(last)])
+    return [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [round(float(record["longitude"]), 5), round(float(record["latitude"]), 5)]},
+            "properties": {
+                "float_id": record["float_id"].decode(),
+                "cycle_number": int(record["cycle_number"]) if record["cycle_number"] >= 0 else None,
+                "date": None if np.isnat(record["date"]) else str(pd.Timestamp(record["date"])),
+                "profile_count": int(count)
+            }
+        }
+        for record, count in zip(records[last], counts)
+    ]
+
+
+def _check_zoom(zoom: int):
+    if not 0 <= zoom <= MAX_ZOOM:
+        raise ValueError(f"Zoom must be between 0 and {MAX_ZOOM}, got {zoom}")
+
+
+def _filter_key(filters: SearchFilters) -> str:
+    return json.dumps([filters.start_date, filters.end_date, sorted(filters.parameters)])
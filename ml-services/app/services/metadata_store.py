@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, List, Optional, Sequence
+import threading
+import json
+from .netcdf_processor import SUPPORTED_PARAMETERS, SUMMARY_DTYPE
+from .profile_table import ProfileTable
+from .profile_summary import summarize_documents, summary_to_dict
+
+# Fixed-width record kept per vector; everything else lives in the lazily read payload
+METADATA_DTYPE = np.dtype([
+    ("float_id", "S16"),
+    ("profile_id", "i8"),
+    ("cycle_number", "i8"),
+    ("date", "datetime64[s]"),
+    ("latitude", "f8"),
+    ("longitude", "f8"),
+    ("parameters", "u4"),
+])
+
+# Bit assigned to each parameter in the ``parameters`` bitmask
+PARAMETER_BITS = {param: 1 << bit for bit, param in enumerate(SUPPORTED_PARAMETERS)}
+
+
+def encode_parameters(parameters: Sequence[str]) -> int:
+    mask = 0
+    for param in parameters:
+        mask |= PARAMETER_BITS.get(param, 0)
+    return mask
+
+
+def decode_parameters(mask: int) -> List[str]:
+    return [param for param, bit in PARAMETER_BITS.items() if mask & bit]
+
+
+def encode_documents(documents: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Split profile documents into compact record and summary arrays and a JSON measurement payload"""
+    records = np.zeros(len(documents), dtype=METADATA_DTYPE)
+    records["float_id"] = [str(doc.get("float_id") or "").encode() for doc in documents]
+    records["profile_id"] = [_int_or(doc.get("profile_id"), -1) for doc in documents]
+    records["cycle_number"] = [_int_or(doc.get("cycle_number"), -1) for doc in documents]
+    records["date"] = pd.to_datetime([doc.get("date") for doc in documents], errors="coerce").values.astype("datetime64[s]")
+    records["latitude"] = [_float_or_nan(doc.get("latitude")) for doc in documents]
+    records["longitude"] = [_float_or_nan(doc.get("longitude")) for doc in documents]
+    records["parameters"] = [encode_parameters(doc.get("measurements", {}).keys()) for doc in documents]
+
+    blobs = [json.dumps(doc.get("measurements", {})).encode() for doc in documents]
+    offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(blob) for blob in blobs])
+    payload = np.frombuffer(b"".join(blobs), dtype=np.uint8)
+
+    return {
+        "metadata": records,
+        "summaries": summarize_documents(documents, SUMMARY_DTYPE),
+        "payload": payload,
+        "payload_offsets": offsets
+    }
+
+
+def encode_table(table: ProfileTable) -> np.ndarray:
+    """Records for every profile of a table, computed column by column"""
+    index = table.index
+    records = np.zeros(len(table), dtype=METADATA_DTYPE)
+    records["float_id"] = index["float_id"].fillna("").astype(str).str.encode("utf-8").to_numpy(dtype="S16")
+    records["profile_id"] = index["profile_id"].to_numpy()
+    records["cycle_number"] = index["cycle_number"].to_numpy()
+    records["date"] = index["date"].to_numpy(dtype="datetime64[s]")
+    records["latitude"] = index["latitude"].to_numpy()
+    records["longitude"] = index["longitude"].to_numpy()
+    for param, values in table.measurements.items():
+        has_values = (~np.isnan(values)).any(axis=1)
+        records["parameters"] |= np.where(has_values, PARAMETER_BITS.get(param, 0), 0).astype(np.uint32)
+    return records
+
+
+def merge_payload_offsets(offsets: List[np.ndarray]) -> np.ndarray:
+    """Concatenate per-segment payload offsets, rebasing each onto the previous payloads"""
+    merged = [np.zeros(1, dtype=np.int64)]
+    base = 0
+    for segment_offsets in offsets:
+        merged.append(np.asarray(segment_offsets[1:]) + base)
+        base += int(segment_offsets[-1])
+    return np.concatenate(merged)
+
+
+class MetadataStore:
+    """Columnar metadata for the vectors in the index, addressed by row ID
+
+    Segments hold a record array of retrieval fields, a record array of
+    profile summaries, a byte payload of JSON-encoded measurements (and
+    optionally the vectors themselves); all may be memory-mapped, so only the
+    rows a caller asks for are decoded. Segments written before summaries
+    existed have none, and their documents carry no ``summary``.
+    """
+
+    def __init__(self):
+        self._segments: List[Dict[str, np.ndarray]] = []
+        self._starts = np.zeros(1, dtype=np.int64)
+        self._columns: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return int(self._starts[-1])
+
+    def append(self, parts: Dict[str, np.ndarray]):
+        """Add a segment's metadata, summaries, payload, payload offsets and vectors"""
+        with self._lock:
+            self._segments.append(parts)
+            self._starts = np.append(self._starts, self._starts[-1] + len(parts["metadata"]))
+            self._columns = None
+
+    def clear(self):
+        with self._lock:
+            self._segments = []
+            self._starts = np.zeros(1, dtype=np.int64)
+            self._columns = None
+
+    @property
+    def columns(self) -> np.ndarray:
+        """All records as one array, for vectorised filtering"""
+        with self._lock:
+            if self._columns is None:
+                if self._segments:
+                    self._columns = np.concatenate([segment["metadata"] for segment in self._segments])
+                else:
+                    self._columns = np.zeros(0, dtype=METADATA_DTYPE)
+            return self._columns
+
+    def _locate(self, row: int):
+        segment = int(np.searchsorted(self._starts, row, side="right")) - 1
+        return self._segments[segment], row - int(self._starts[segment])
+
+    def get(self, row: int) -> Dict[str, Any]:
+        """Retrieval fields of one row as a document dict"""
+        segment, local = self._locate(row)
+        record = segment["metadata"][local]
+        date = record["date"]
+        document = {
+            "doc_id": int(row),
+            "float_id": record["float_id"].decode(),
+            "profile_id": int(record["profile_id"]),
+            "date": str(pd.Timestamp(date)) if not np.isnat(date) else None,
+            "latitude": _none_if_nan(record["latitude"]),
+            "longitude": _none_if_nan(record["longitude"]),
+            "parameters": decode_parameters(int(record["parameters"]))
+        }
+        if record["cycle_number"] >= 0:
+            document["cycle_number"] = int(record["cycle_number"])
+        if "summaries" in segment:
+            document["summary"] = summary_to_dict(segment["summaries"][local])
+        return document
+
+    def take(self, part: str, rows: np.ndarray) -> np.ndarray:
+        """Gather the given rows of a per-row array part (e.g. ``vectors``) across segments"""
+        rows = np.asarray(rows, dtype=np.int64)
+        segment_ids = np.searchsorted(self._starts, rows, side="right") - 1
+        first = self._segments[0][part] if self._segments else np.zeros((0,))
+        out = np.empty((len(rows),) + first.shape[1:], dtype=first.dtype)
+        for segment_id in np.unique(segment_ids):
+            selected = segment_ids == segment_id
+            out[selected] = self._segments[segment_id][part][rows[selected] - self._starts[segment_id]]
+        return out
+
+    def get_measurements(self, row: int) -> Dict[str, Any]:
+        """Decode the full measurements of one row from its payload"""
+        segment, local = self._locate(row)
+        offsets = segment["payload_offsets"]
+        blob = segment["payload"][int(offsets[local]):int(offsets[local + 1])]
+        return json.loads(bytes(blob))
+
+
+def _int_or(value: Any, default: int) -> int:
+    return default if value is None else int(value)
+
+
+def _float_or_nan(value: Any) -> float:
+    return np.nan if value is None else float(value)
+
+
+def _none_if_nan(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
@@ -2,53 +2,65 @@ import xarray as xr
 import pandas as pd
 import numpy as np
 from fastapi import UploadFile
+import aiofiles
+import asyncio
 import tempfile
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, Optional, Iterator, AsyncIterator, TYPE_CHECKING
 import logging
+from .profile_table import ProfileTable
+from .profile_summary import summary_dtype, summarize
+from .trajectory import build_trajectory
+from ..config.settings import settings
+
+if TYPE_CHECKING:
+    from .profile_archive import ProfileArchive
 
 logger = logging.getLogger(__name__)
 
+SUPPORTED_PARAMETERS = [
+    'TEMP', 'PSAL', 'PRES', 'DOXY', 'CHLA', 'BBP700', 'PH_IN_SITU_TOTAL',
+    'NITRATE', 'DOXY_ADJUSTED', 'TEMP_ADJUSTED', 'PSAL_ADJUSTED'
+]
+
+# Per-profile summary computed at ingest for every measured parameter
+SUMMARY_DTYPE = summary_dtype([param for param in SUPPORTED_PARAMETERS if param != 'PRES'])
+
 class NetCDFProcessor:
     """Service for processing ARGO NetCDF files"""
     
     def __init__(self):
-        self.supported_parameters = [
-            'TEMP', 'PSAL', 'PRES', 'DOXY', 'CHLA', 'BBP700', 'PH_IN_SITU_TOTAL',
-            'NITRATE', 'DOXY_ADJUSTED', 'TEMP_ADJUSTED', 'PSAL_ADJUSTED'
-        ]
+        self.supported_parameters = list(SUPPORTED_PARAMETERS)
+        # Fill values used by ARGO files that were not decoded to NaN by xarray
+        self.fill_values = [-999.0, 99999.0]
+        # ARGO QC flags: 3 = probably bad, 4 = bad, 9 = missing
+        self.rejected_qc_flags = ['3', '4', '9']
     
     async def process_file(self, file: UploadFile) -> Dict[str, Any]:
-        """Process uploaded NetCDF file and extract ARGO data"""
+        """Summarise an uploaded NetCDF file without decoding its profiles
+
+        Returns the file's metadata, trajectory and number of profiles; the
+        profile data itself is ingested through the job manager.
+        """
         try:
-            # Save uploaded file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.nc') as tmp_file:
-                content = await file.read()
-                tmp_file.write(content)
-                tmp_file_path = tmp_file.name
+            tmp_file_path = await self.save_upload(file)
             
             try:
-                # Open and process NetCDF file
-                dataset = xr.open_dataset(tmp_file_path)
-                
-                # Extract metadata
-                metadata = self._extract_metadata(dataset)
-                
-                # Extract profile data
-                profiles = self._extract_profiles(dataset)
-                
-                # Extract trajectory data
-                trajectory = self._extract_trajectory(dataset)
-                
-                # Close dataset
-                dataset.close()
+                # Metadata, trajectory and the profile count only touch small 1-D variables and dimensions
+                dataset = await asyncio.to_thread(self.open_dataset, tmp_file_path)
+                try:
+                    metadata = self._extract_metadata(dataset)
+                    trajectory = await asyncio.to_thread(self._extract_trajectory, dataset)
+                    profile_count = int(dataset.sizes.get("N_PROF", 0))
+                finally:
+                    dataset.close()
                 
                 return {
                     "success": True,
                     "metadata": metadata,
-                    "profiles": profiles,
+                    "profile_count": profile_count,
                     "trajectory": trajectory,
-                    "message": f"Successfully processed {len(profiles)} profiles"
+                    "message": f"Found {profile_count} profiles"
                 }
                 
             finally:
@@ -63,6 +75,86 @@ class NetCDFProcessor:
                 "message": "Failed to process NetCDF file"
             }
     
+    async def save_upload(self, file: UploadFile, directory: Optional[str] = None) -> str:
+        """Copy an upload to disk in bounded chunks and return the file path"""
+        directory = directory or settings.upload_path
+        os.makedirs(directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix='.nc', dir=directory)
+        os.close(fd)
+        
+        written = 0
+        try:
+            async with aiofiles.open(path, 'wb') as out:
+                while True:
+                    chunk = await file.read(settings.upload_chunk_size)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if written > settings.max_file_size:
+                        raise ValueError(f"File exceeds maximum size of {settings.max_file_size} bytes")
+                    await out.write(chunk)
+        except Exception:
+            os.unlink(path)
+            raise
+        
+        return path
+    
+    def open_dataset(self, file_path: str) -> xr.Dataset:
+        """Open a NetCDF file lazily; variables are only read when sliced"""
+        try:
+            # HDF5-based NetCDF4 files
+            return xr.open_dataset(file_path, engine="h5netcdf", cache=False)
+        except Exception:
+            # Classic NetCDF3 files, as served by the ARGO GDAC
+            return xr.open_dataset(file_path, cache=False)
+    
+    def iter_profile_batches(self, file_path: str, batch_size: Optional[int] = None) -> Iterator[ProfileTable]:
+        """Yield the profiles of a file as tables of at most ``batch_size`` rows"""
+        batch_size = batch_size or settings.profile_batch_size
+        dataset = self.open_dataset(file_path)
+        try:
+            n_prof = dataset.sizes.get("N_PROF", 0)
+            for start in range(0, n_prof, batch_size):
+                yield self._extract_profile_range(dataset, start, min(start + batch_size, n_prof))
+        finally:
+            dataset.close()
+    
+    def write_archive(self, file_path: str, archive: "ProfileArchive", batch_size: Optional[int] = None) -> int:
+        """Write every profile of a file into a columnar archive and return the number of level rows"""
+        return sum(archive.write_table(table) for table in self.iter_profile_batches(file_path, batch_size))
+    
+    def count_profiles(self, file_path: str) -> int:
+        """Return the number of profiles in a file without reading any data"""
+        dataset = self.open_dataset(file_path)
+        try:
+            return int(dataset.sizes.get("N_PROF", 0))
+        finally:
+            dataset.close()
+    
+    def read_profile_range(self, file_path: str, start: int, stop: int) -> ProfileTable:
+        """Read profiles ``start:stop`` of a file as a table"""
+        dataset = self.open_dataset(file_path)
+        try:
+            return self._extract_profile_range(dataset, start, stop)
+        finally:
+            dataset.close()
+    
+    def _extract_profile_range(self, dataset: xr.Dataset, start: int, stop: int) -> ProfileTable:
+        """Extract a contiguous slice of profiles from an open dataset"""
+        return self.extract_profile_table(dataset.isel(N_PROF=slice(start, stop)), profile_offset=start)
+    
+    async def stream_profiles(self, file_path: str, batch_size: Optional[int] = None) -> AsyncIterator[ProfileTable]:
+        """Async variant of ``iter_profile_batches`` that decodes off the event loop"""
+        batches = self.iter_profile_batches(file_path, batch_size)
+        try:
+            while True:
+                batch = await asyncio.to_thread(next, batches, None)
+                if batch is None:
+                    break
+                yield batch
+        finally:
+            batches.close()
+    
     def _extract_metadata(self, dataset: xr.Dataset) -> Dict[str, Any]:
         """Extract metadata from NetCDF dataset"""
         try:
@@ -90,95 +182,88 @@ class NetCDFProcessor:
             logger.error(f"Error extracting metadata: {str(e)}")
             return {}
     
-    def _extract_profiles(self, dataset: xr.Dataset) -> List[Dict[str, Any]]:
-        """Extract profile data from NetCDF dataset"""
-        try:
-            profiles = []
+    def extract_profile_table(self, dataset: xr.Dataset, profile_offset: int = 0) -> ProfileTable:
+        """Extract all profiles as a columnar table, reading each variable once"""
+        n_prof = dataset.sizes.get("N_PROF", 0)
+        n_levels = dataset.sizes.get("N_LEVELS", 0)
+        
+        index = pd.DataFrame({"profile_id": np.arange(profile_offset, profile_offset + n_prof, dtype=np.int64)})
+        index["float_id"] = (
+            _decode_strings(dataset["PLATFORM_NUMBER"].values)
+            if "PLATFORM_NUMBER" in dataset.variables else None
+        )
+        index["cycle_number"] = (
+            dataset["CYCLE_NUMBER"].values.astype(np.int64)
+            if "CYCLE_NUMBER" in dataset.variables else -1
+        )
+        index["date"] = (
+            _juld_to_datetime(dataset["JULD"].values)
+            if "JULD" in dataset.variables else pd.NaT
+        )
+        for column, variable in (("latitude", "LATITUDE"), ("longitude", "LONGITUDE")):
+            index[column] = (
+                self._mask_invalid(dataset[variable].values.astype(np.float64))
+                if variable in dataset.variables else np.nan
+            )
+        
+        if "PRES" in dataset.variables:
+            pressure = self._mask_invalid(dataset["PRES"].values.astype(np.float64))
+        else:
+            pressure = np.full((n_prof, n_levels), np.nan)
+        
+        measurements = {}
+        qc_flags = {}
+        for param in self.supported_parameters:
+            if param not in dataset.variables:
+                continue
             
-            # Get number of profiles
-            n_prof = dataset.dims.get("N_PROF", 0)
-            n_levels = dataset.dims.get("N_LEVELS", 0)
+            values = self._mask_invalid(dataset[param].values.astype(np.float64))
             
-            for prof_idx in range(n_prof):
-                profile = {
-                    "profile_id": prof_idx,
-                    "date": None,
-                    "latitude": None,
-                    "longitude": None,
-                    "measurements": {}
-                }
-                
-                # Extract position and time
-                if "LATITUDE" in dataset.variables:
-                    profile["latitude"] = float(dataset["LATITUDE"].values[prof_idx])
-                
-                if "LONGITUDE" in dataset.variables:
-                    profile["longitude"] = float(dataset["LONGITUDE"].values[prof_idx])
-                
-                if "JULD" in dataset.variables:
-                    # Convert Julian day to datetime
-                    juld = dataset["JULD"].values[prof_idx]
-                    if not np.isnan(juld):
-                        # ARGO uses days since 1950-01-01
-                        base_date = pd.Timestamp("1950-01-01")
-                        profile["date"] = str(base_date + pd.Timedelta(days=juld))
-                
-                # Extract measurement parameters
-                for param in self.supported_parameters:
-                    if param in dataset.variables:
-                        values = dataset[param].values[prof_idx, :]
-                        
-                        # Filter out fill values (typically -999 or NaN)
-                        valid_mask = ~np.isnan(values) & (values != -999)
-                        
-                        if np.any(valid_mask):
-                            profile["measurements"][param] = {
-                                "values": values[valid_mask].tolist(),
-                                "pressure": dataset["PRES"].values[prof_idx, valid_mask].tolist() if "PRES" in dataset.variables else [],
-                                "qc_flags": dataset.get(f"{param}_QC", dataset.get("PROFILE_PRES_QC", None))
-                            }
-                
-                profiles.append(profile)
-            
-            return profiles
+            qc_name = f"{param}_QC"
+            if qc_name in dataset.variables:
+                flags = _decode_qc_flags(dataset[qc_name].values)
+                values[np.isin(flags, self.rejected_qc_flags)] = np.nan
+                qc_flags[param] = flags
             
-        except Exception as e:
-            logger.error(f"Error extracting profiles: {str(e)}")
-            return []
+            measurements[param] = values
+        
+        return ProfileTable(
+            index=index,
+            pressure=pressure,
+            measurements=measurements,
+            qc_flags=qc_flags,
+            summaries=summarize(pressure, measurements, SUMMARY_DTYPE)
+        )
+    
+    def _mask_invalid(self, values: np.ndarray) -> np.ndarray:
+        """Replace fill values with NaN in place and return the array"""
+        values[np.isin(values, self.fill_values)] = np.nan
+        return values
     
-    def _extract_trajectory(self, dataset: xr.Dataset) -> Dict[str, Any]:
-        """Extract trajectory data from NetCDF dataset"""
+    def _extract_trajectory(
+        self,
+        dataset: xr.Dataset,
+        tolerance: Optional[float] = None,
+        format: str = "coordinates"
+    ) -> Dict[str, Any]:
+        """Extract trajectory data from NetCDF dataset, optionally simplified to ``tolerance`` degrees"""
         try:
-            trajectory = {
-                "coordinates": [],
-                "dates": [],
-                "float_id": None
-            }
-            
-            if "LATITUDE" in dataset.variables and "LONGITUDE" in dataset.variables:
-                lats = dataset["LATITUDE"].values
-                lons = dataset["LONGITUDE"].values
-                
-                # Remove invalid coordinates
-                valid_mask = ~np.isnan(lats) & ~np.isnan(lons)
-                
-                trajectory["coordinates"] = [
-                    [float(lon), float(lat)] 
-                    for lat, lon in zip(lats[valid_mask], lons[valid_mask])
-                ]
-                
-                if "JULD" in dataset.variables:
-                    dates = dataset["JULD"].values[valid_mask]
-                    base_date = pd.Timestamp("1950-01-01")
-                    trajectory["dates"] = [
-                        str(base_date + pd.Timedelta(days=float(d))) 
-                        for d in dates if not np.isnan(d)
-                    ]
+            if "LATITUDE" not in dataset.variables or "LONGITUDE" not in dataset.variables:
+                return {"coordinates": [], "dates": [], "float_id": None}
             
+            dates = _juld_to_datetime(dataset["JULD"].values) if "JULD" in dataset.variables else None
+            float_id = None
             if "PLATFORM_NUMBER" in dataset.variables:
-                trajectory["float_id"] = str(dataset["PLATFORM_NUMBER"].values[0])
+                float_id = _decode_strings(np.atleast_1d(dataset["PLATFORM_NUMBER"].values))[0] or None
             
-            return trajectory
+            return build_trajectory(
+                dataset["LATITUDE"].values,
+                dataset["LONGITUDE"].values,
+                dates,
+                float_id=float_id,
+                tolerance=tolerance,
+                format=format
+            )
             
         except Exception as e:
             logger.error(f"Error extracting trajectory: {str(e)}")
@@ -187,8 +272,37 @@ class NetCDFProcessor:
     def validate_netcdf(self, file_path: str) -> bool:
         """Validate if file is a proper NetCDF file"""
         try:
-            dataset = xr.open_dataset(file_path)
+            dataset = self.open_dataset(file_path)
             dataset.close()
             return True
         except Exception:
-            return False
\ No newline at end of file
+            return False
+
+
+ARGO_REFERENCE_DATE = np.datetime64("1950-01-01T00:00:00", "ns")
+
+
+def _juld_to_datetime(juld: np.ndarray) -> np.ndarray:
+    """Convert ARGO JULD values (days since 1950-01-01) to datetime64[ns]"""
+    if np.issubdtype(juld.dtype, np.datetime64):
+        # xarray already decoded the CF time units
+        return juld.astype("datetime64[ns]")
+    days = juld.astype(np.float64)
+    nanoseconds = np.round(days * 86400e9)
+    dates = ARGO_REFERENCE_DATE + np.where(np.isnan(days), 0, nanoseconds).astype("timedelta64[ns]")
+    dates[np.isnan(days)] = np.datetime64("NaT")
+    return dates
+
+
+def _decode_strings(values: np.ndarray) -> np.ndarray:
+    """Decode a fixed-width byte/char array into stripped Python strings"""
+    if values.dtype.kind in ("S", "O"):
+        values = np.char.decode(values.astype("S"), "utf-8", errors="ignore")
+    return np.char.strip(values.astype("U")).astype(object)
+
+
+def _decode_qc_flags(values: np.ndarray) -> np.ndarray:
+    """Decode an ARGO QC character array into single-character strings"""
+    if values.dtype.kind in ("S", "O"):
+        return values.astype("S1").astype("U1")
+    return values.astype("U1")
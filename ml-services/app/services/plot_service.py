@@ -0,0 +1,325 @@
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Callable, Sequence
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import threading
+import asyncio
+import hashlib
+import base64
+import json
+import time
+import logging
+from .profile_table import ProfileTable
+from .profile_grid import ProfileGridder
+from .spatial_index import SearchFilters
+from ..utils.downsample import lttb, bin_2d
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PLOT_TYPES = ("ts_diagram", "depth_section", "time_series")
+PLOT_FORMATS = ("json", "png")
+
+DEFAULT_OPTIONS = {
+    "width": 800,
+    "height": 500,
+    "format": "json",
+    "parameter": "TEMP",
+    "level": 5.0,
+    "max_points": 5000,
+    "title": None
+}
+
+
+class PlotService:
+    """Server-side plot rendering with a result cache and single-flight renders
+
+    Plots are built from a selection (``float_id`` with optional
+    ``start_date`` and ``end_date``) or from inline ``x``/``y`` arrays, and
+    downsampled to the output resolution before rendering: time series with
+    LTTB, dense T-S scatters binned into a heatmap, depth sections averaged
+    into at most one column per pixel pair. Results are cached under a hash of
+    the plot type, data and options; concurrent requests for a key that is
+    being rendered wait for that render instead of starting their own. Cached
+    plots of a float are dropped when new profiles of it are ingested.
+    """
+
+    def __init__(
+        self,
+        table_loader: Callable[[str, SearchFilters], ProfileTable],
+        gridder: ProfileGridder,
+        max_entries: Optional[int] = None
+    ):
+        self.table_loader = table_loader
+        self.gridder = gridder
+        self.max_entries = max_entries or settings.plot_cache_size
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._float_keys: Dict[str, set] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.renders = 0
+        self.render_seconds = 0.0
+
+    async def render(self, plot_type: str, data: Optional[Dict[str, Any]] = None,
+                     options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Rendered plot for a request, from the cache or a (shared) fresh render"""
+        data = data or {}
+        options = self._resolve_options(plot_type, data, options or {})
+        key = plot_key(plot_type, data, options)
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return dict(entry["result"], cached=True)
+            self.misses += 1
+
+        flight = self._inflight.get(key)
+        while flight is not None:
+            self.coalesced += 1
+            # Waiting does not propagate the flight's cancellation; only this request's own
+            await asyncio.wait({flight})
+            if not flight.cancelled():
+                return dict(flight.result(), cached=False)
+            # The request that started the render was cancelled; take over from it
+            flight = self._inflight.get(key)
+
+        flight = asyncio.get_running_loop().create_future()
+        self._inflight[key] = flight
+        try:
+            generation = self._generation
+            result = await asyncio.to_thread(self._render, plot_type, data, options)
+            self._store(key, data.get("float_id"), result, generation)
+            flight.set_result(result)
+            return dict(result, cached=False)
+        except Exception as e:
+            flight.set_exception(e)
+            # Mark the exception as retrieved so an unshared failure is not logged twice
+            flight.exception()
+            raise
+        finally:
+            if not flight.done():
+                # Cancelled before the render finished: release coalesced requests
+                flight.cancel()
+            del self._inflight[key]
+
+    def _resolve_options(self, plot_type: str, data: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+        if plot_type not in PLOT_TYPES:
+            raise ValueError(f"Unknown plot type: {plot_type}. Expected one of {', '.join(PLOT_TYPES)}")
+        unknown = set(options) - set(DEFAULT_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown plot options: {', '.join(sorted(unknown))}")
+        options = dict(DEFAULT_OPTIONS, **options)
+        if options["format"] not in PLOT_FORMATS:
+            raise ValueError(f"Unknown plot format: {options['format']}")
+        options["width"] = int(np.clip(_number(options, "width", int), 100, 4000))
+        options["height"] = int(np.clip(_number(options, "height", int), 100, 4000))
+        options["max_points"] = max(_number(options, "max_points", int), 3)
+        options["level"] = _number(options, "level", float)
+        options["parameter"] = str(options["parameter"]).upper()
+        if not data.get("float_id") and not ("x" in data and "y" in data):
+            raise ValueError("Plot data needs a float_id selection or x and y arrays")
+        if plot_type == "depth_section" and not data.get("float_id"):
+            raise ValueError("Depth sections need a float_id selection")
+        return options
+
+    def _render(self, plot_type: str, data: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        figure, points, method = getattr(self, f"_{plot_type}")(data, options)
+        figure.update_layout(
+            width=options["width"],
+            height=options["height"],
+            title=options["title"],
+            margin={"l": 60, "r": 20, "t": 50 if options["title"] else 20, "b": 50}
+        )
+
+        result = {
+            "type": plot_type,
+            "format": options["format"],
+            "plot_url": None,
+            "plot_data": None,
+            "points": points,
+            "downsampling": method
+        }
+        if options["format"] == "png":
+            # Needs kaleido; plotly raises with install instructions when it is missing
+            image = figure.to_image(format="png", width=options["width"], height=options["height"])
+            result["plot_url"] = "data:image/png;base64," + base64.b64encode(image).decode()
+        else:
+            result["plot_data"] = json.loads(figure.to_json())
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.renders += 1
+            self.render_seconds += elapsed
+        logger.info(f"Rendered {plot_type} from {points['input']} points in {elapsed * 1000:.0f} ms")
+        return result
+
+    def _ts_diagram(self, data: Dict[str, Any], options: Dict[str, Any]):
+        """Temperature against salinity for every level; binned into a heatmap when dense"""
+        if data.get("float_id"):
+            table = self._load_table(data)
+            if "TEMP" not in table.measurements or "PSAL" not in table.measurements:
+                raise ValueError(f"Float {data['float_id']} does not measure both TEMP and PSAL")
+            salinity, temperature = table.measurements["PSAL"].ravel(), table.measurements["TEMP"].ravel()
+            pressure = table.pressure.ravel()
+        else:
+            salinity, temperature = _array(data["x"]), _array(data["y"])
+            pressure = None
+        valid = ~np.isnan(salinity) & ~np.isnan(temperature)
+        salinity, temperature = salinity[valid], temperature[valid]
+        axes = {"xaxis_title": "Salinity (PSU)", "yaxis_title": "Temperature (°C)"}
+
+        if len(salinity) > options["max_points"]:
+            # One bin per 4x4 pixels: finer bins would not be visible at this size
+            counts, x_centers, y_centers = bin_2d(
+                salinity, temperature, (max(options["width"] // 4, 1), max(options["height"] // 4, 1))
+            )
+            figure = go.Figure(go.Heatmap(
+                x=np.round(x_centers, 4), y=np.round(y_centers, 4), z=np.where(counts > 0, counts, np.nan),
+                colorscale="Viridis", colorbar={"title": "Levels"}
+            ))
+            figure.update_layout(**axes)
+            return figure, {"input": int(valid.sum()), "rendered": int((counts > 0).sum())}, "binned"
+
+        marker = {"size": 4}
+        if pressure is not None:
+            marker.update(color=pressure[valid], colorscale="Viridis_r", colorbar={"title": "Pressure (dbar)"})
+        figure = go.Figure(go.Scattergl(x=salinity, y=temperature, mode="markers", marker=marker))
+        figure.update_layout(**axes)
+        return figure, {"input": len(salinity), "rendered": len(salinity)}, None
+
+    def _depth_section(self, data: Dict[str, Any], options: Dict[str, Any]):
+        """Parameter on standard levels against profile date, averaged down to the plot width"""
+        parameter = options["parameter"]
+        grid = self._query_grid(data, parameter)
+        values = np.array(grid["parameters"][parameter], dtype=np.float64)
+        dates = pd.to_datetime(grid["profiles"]["date"])
+
+        # Average neighbouring profiles so that each column is at least two pixels wide
+        columns = max(options["width"] // 2, 1)
+        method = None
+        if len(values) > columns:
+            groups = np.arange(len(values)) * columns // len(values)
+            starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+            valid = ~np.isnan(values)
+            sums = np.add.reduceat(np.where(valid, values, 0.0), starts, axis=0)
+            counts = np.add.reduceat(valid.astype(np.int64), starts, axis=0)
+            values = np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0)
+            dates = pd.to_datetime(pd.Series(dates.asi8).groupby(groups).mean().to_numpy())
+            method = "binned"
+
+        figure = go.Figure(go.Heatmap(
+            x=[str(date) for date in dates], y=grid["levels"], z=np.round(values.T, 4),
+            colorscale="Thermal", colorbar={"title": parameter}
+        ))
+        figure.update_yaxes(autorange="reversed", title="Pressure (dbar)")
+        figure.update_xaxes(title="Date")
+        return figure, {"input": len(grid["profiles"]["date"]) * len(grid["levels"]), "rendered": int(values.size)}, method
+
+    def _time_series(self, data: Dict[str, Any], options: Dict[str, Any]):
+        """Parameter at one pressure level over time, reduced with LTTB to one point per pixel"""
+        parameter = options["parameter"]
+        if data.get("float_id"):
+            grid = self._query_grid(data, parameter, levels=[float(options["level"])])
+            x = pd.to_datetime(grid["profiles"]["date"]).asi8.astype(np.float64)
+            y = np.array([row[0] for row in grid["parameters"][parameter]], dtype=np.float64)
+            y_title = f"{parameter} at {options['level']:g} dbar"
+        else:
+            x, y = _array(data["x"]), _array(data["y"])
+            y_title = parameter
+        valid = ~np.isnan(x) & ~np.isnan(y)
+        order = np.argsort(x[valid], kind="stable")
+        x, y = x[valid][order], y[valid][order]
+
+        kept = lttb(x, y, options["width"])
+        method = "lttb" if len(kept) < len(x) else None
+        x_values = pd.to_datetime(x[kept]).astype(str).tolist() if data.get("float_id") else x[kept]
+        figure = go.Figure(go.Scatter(x=x_values, y=np.round(y[kept], 4), mode="lines+markers", marker={"size": 3}))
+        figure.update_layout(yaxis_title=y_title, xaxis_title="Date" if data.get("float_id") else None)
+        return figure, {"input": len(x), "rendered": len(kept)}, method
+
+    def _load_table(self, data: Dict[str, Any]) -> ProfileTable:
+        table = self.table_loader(
+            str(data["float_id"]),
+            SearchFilters(start_date=data.get("start_date"), end_date=data.get("end_date"))
+        )
+        if len(table) == 0:
+            raise ValueError(f"No profiles found for float {data['float_id']}")
+        return table
+
+    def _query_grid(self, data: Dict[str, Any], parameter: str, levels: Optional[Sequence[float]] = None):
+        grid = self.gridder.query(
+            str(data["float_id"]),
+            parameters=[parameter],
+            start_date=data.get("start_date"),
+            end_date=data.get("end_date"),
+            levels=levels
+        )
+        if not grid["profiles"]["date"]:
+            raise ValueError(f"No profiles found for float {data['float_id']}")
+        return grid
+
+    def _store(self, key: str, float_id: Optional[str], result: Dict[str, Any], generation: int):
+        with self._lock:
+            if float_id and generation != self._generation:
+                # Profiles were ingested while rendering; the result may already be stale
+                return
+            self._cache[key] = {"result": result, "float_id": float_id}
+            if float_id:
+                self._float_keys.setdefault(str(float_id), set()).add(key)
+            while len(self._cache) > self.max_entries:
+                evicted, entry = self._cache.popitem(last=False)
+                self._discard(evicted, entry["float_id"])
+
+    def _discard(self, key: str, float_id: Optional[str]):
+        keys = self._float_keys.get(str(float_id)) if float_id else None
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._float_keys[str(float_id)]
+
+    def invalidate(self, float_ids: Sequence[str]):
+        """Drop the cached plots of the given floats"""
+        with self._lock:
+            self._generation += 1
+            for float_id in float_ids:
+                for key in self._float_keys.pop(str(float_id), ()):
+                    self._cache.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "renders": self.renders,
+            "avg_render_ms": round(self.render_seconds / self.renders * 1000, 2) if self.renders else None,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None
+        }
+
+
+def plot_key(plot_type: str, data: Dict[str, Any], options: Dict[str, Any]) -> str:
+    """Cache key of a plot request: a hash of its canonical JSON form"""
+    canonical = json.dumps({"type": plot_type, "data": data, "options": options}, sort_keys=True,
+                           separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _array(values: List[Any]) -> np.ndarray:
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+
+def _number(options: Dict[str, Any], name: str, cast: Callable[[Any], Any]):
+    try:
+        return cast(options[name])
+    except (TypeError, ValueError):
+        raise ValueError(f"Plot option {name} must be a number, got {options[name]!r}")
@@ -0,0 +1,240 @@
+from typing import List, Optional, Sequence
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import numpy as np
+import pandas as pd
+import threading
+import hashlib
+import time
+import os
+import logging
+from .netcdf_processor import SUPPORTED_PARAMETERS
+from .profile_table import ProfileTable
+from .spatial_index import SearchFilters
+from ..utils.geo import ocean_basin, haversine_km
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Measured parameters stored as columns; pressure is the level coordinate itself
+ARCHIVE_PARAMETERS = [param for param in SUPPORTED_PARAMETERS if param != 'PRES']
+
+# One row per (profile, level), same layout as ProfileTable.to_frame
+ARCHIVE_SCHEMA = pa.schema(
+    [
+        ("profile_id", pa.int64()),
+        ("float_id", pa.string()),
+        ("cycle_number", pa.int64()),
+        ("date", pa.timestamp("s")),
+        ("latitude", pa.float64()),
+        ("longitude", pa.float64()),
+        ("level", pa.int32()),
+        ("pressure", pa.float64()),
+    ]
+    + [(param, pa.float64()) for param in ARCHIVE_PARAMETERS]
+    + [(f"{param}_QC", pa.string()) for param in ARCHIVE_PARAMETERS]
+)
+
+# Identity of an archived level; the same level may be stored by more than one write
+LEVEL_KEY = ["float_id", "cycle_number", "date", "level"]
+PROFILE_KEY = ["float_id", "cycle_number", "date"]
+
+# Stored with every row: increases with each write, so the latest copy of a profile wins on read.
+# Files written before the column existed read it as null and rank below any later write.
+WRITE_SEQ = "write_seq"
+STORED_SCHEMA = pa.schema(list(ARCHIVE_SCHEMA) + [(WRITE_SEQ, pa.int64())])
+
+# Hive-style directories: year=2021/month=7/basin=indian/
+PARTITION_SCHEMA = pa.schema([("year", pa.int16()), ("month", pa.int8()), ("basin", pa.string())])
+
+
+class ProfileArchive:
+    """Parquet archive of profile levels, partitioned by year, month and ocean basin
+
+    Queries are pushed down to the dataset scanner: partition keys prune
+    whole directories, and row-group statistics on date and position skip
+    the rest of the irrelevant data. Files are read through a memory-mapped
+    local filesystem. Profiles written again in a different batch split land
+    in new files; every row carries the sequence number of its write, and
+    reads keep only the levels of the latest write of each profile.
+    """
+
+    def __init__(self, directory: Optional[str] = None, row_group_size: int = 65536):
+        self.directory = os.path.abspath(directory or settings.profile_archive_path)
+        self.row_group_size = row_group_size
+        self.partitioning = ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+        self.filesystem = pafs.LocalFileSystem(use_mmap=True)
+        self._dataset: Optional[ds.Dataset] = None
+        self._last_write_seq = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def write_table(self, table: ProfileTable) -> int:
+        """Archive the levels of a parsed table and return the number of rows written
+
+        File names are derived from the batch's (float, cycle) keys, so writing
+        the same batch again replaces its files; profiles re-archived as part of
+        a different batch supersede their earlier copies on read.
+        """
+        frame = table.to_frame()
+        if frame.empty:
+            return 0
+
+        dates = pd.to_datetime(frame["date"]).dt.floor("s")
+        frame["date"] = dates
+        frame["year"] = dates.dt.year.astype("Int16")
+        frame["month"] = dates.dt.month.astype("Int8")
+        frame["basin"] = ocean_basin(frame["latitude"], frame["longitude"])
+        for param in ARCHIVE_PARAMETERS:
+            if param not in frame:
+                frame[param] = np.nan
+            if f"{param}_QC" not in frame:
+                frame[f"{param}_QC"] = None
+        frame = frame.sort_values(["year", "month", "basin", "float_id", "date", "level"], kind="stable")
+
+        schema = pa.schema(list(ARCHIVE_SCHEMA) + list(PARTITION_SCHEMA))
+        arrow_table = pa.Table.from_pandas(frame[schema.names], schema=schema, preserve_index=False)
+
+        keys = table.index[["float_id", "cycle_number"]].astype(str).agg(":".join, axis=1)
+        digest = hashlib.sha1("\n".join(sorted(keys)).encode()).hexdigest()[:16]
+        with self._lock:
+            # Taken under the write lock so sequence order is the order files land on disk
+            self._last_write_seq = max(time.time_ns(), self._last_write_seq + 1)
+            arrow_table = arrow_table.append_column(
+                WRITE_SEQ, pa.array(np.full(len(arrow_table), self._last_write_seq), pa.int64())
+            )
+            ds.write_dataset(
+                arrow_table,
+                self.directory,
+                format="parquet",
+                partitioning=self.partitioning,
+                basename_template=f"part-{digest}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+                max_rows_per_group=self.row_group_size,
+                min_rows_per_group=min(self.row_group_size, len(arrow_table)),
+                filesystem=self.filesystem
+            )
+            self._dataset = None
+        return len(arrow_table)
+
+    @property
+    def dataset(self) -> ds.Dataset:
+        """The archive as a pyarrow dataset, rediscovered after each write"""
+        with self._lock:
+            if self._dataset is None:
+                self._dataset = ds.dataset(
+                    self.directory,
+                    schema=pa.schema(list(STORED_SCHEMA) + list(PARTITION_SCHEMA)),
+                    format="parquet",
+                    partitioning=self.partitioning,
+                    filesystem=self.filesystem
+                )
+            return self._dataset
+
+    def filter_expression(
+        self,
+        filters: Optional[SearchFilters] = None,
+        months: Optional[Sequence[int]] = None,
+        basins: Optional[Sequence[str]] = None,
+        float_ids: Optional[Sequence[str]] = None
+    ) -> Optional[ds.Expression]:
+        """Dataset filter combining partition keys (for pruning) with row predicates (for pushdown)"""
+        filters = filters or SearchFilters()
+        conditions = []
+
+        start, end = filters.date_range()
+        if start is not None:
+            year, month = _year_month(start)
+            conditions.append((ds.field("year") > year) | ((ds.field("year") == year) & (ds.field("month") >= month)))
+            conditions.append(ds.field("date") >= pa.scalar(start.astype("datetime64[s]").item(), pa.timestamp("s")))
+        if end is not None:
+            year, month = _year_month(end)
+            conditions.append((ds.field("year") < year) | ((ds.field("year") == year) & (ds.field("month") <= month)))
+            conditions.append(ds.field("date") <= pa.scalar(end.astype("datetime64[s]").item(), pa.timestamp("s")))
+        if months:
+            conditions.append(ds.field("month").isin([int(month) for month in months]))
+        if basins:
+            conditions.append(ds.field("basin").isin(list(basins)))
+        if float_ids:
+            conditions.append(ds.field("float_id").isin([str(float_id) for float_id in float_ids]))
+
+        bbox = filters.spatial_bbox
+        if bbox:
+            min_lat, min_lon, max_lat, max_lon = bbox
+            conditions.append((ds.field("latitude") >= min_lat) & (ds.field("latitude") <= max_lat))
+            if min_lon <= max_lon:
+                conditions.append((ds.field("longitude") >= min_lon) & (ds.field("longitude") <= max_lon))
+            else:
+                conditions.append((ds.field("longitude") >= min_lon) | (ds.field("longitude") <= max_lon))
+
+        if filters.parameters:
+            present = [~ds.field(param).is_null() for param in filters.parameters if param in ARCHIVE_PARAMETERS]
+            if present:
+                conditions.append(_any(present))
+
+        if not conditions:
+            return None
+        expression = conditions[0]
+        for condition in conditions[1:]:
+            expression = expression & condition
+        return expression
+
+    def files(self, filters: Optional[SearchFilters] = None, **partition_filters) -> List[str]:
+        """Files a query would read after partition pruning"""
+        expression = self.filter_expression(filters, **partition_filters)
+        return [fragment.path for fragment in self.dataset.get_fragments(filter=expression)]
+
+    def read(
+        self,
+        filters: Optional[SearchFilters] = None,
+        months: Optional[Sequence[int]] = None,
+        basins: Optional[Sequence[str]] = None,
+        columns: Optional[List[str]] = None,
+        float_ids: Optional[Sequence[str]] = None
+    ) -> pd.DataFrame:
+        """Levels matching the filters as a frame, reading only the partitions and columns needed"""
+        filters = filters or SearchFilters()
+        expression = self.filter_expression(filters, months=months, basins=basins, float_ids=float_ids)
+
+        read_columns = list(columns) if columns else None
+        radius = filters.center and filters.radius_km
+        if read_columns is not None:
+            extra = LEVEL_KEY + [WRITE_SEQ] + (["latitude", "longitude"] if radius else [])
+            read_columns += [column for column in extra if column not in read_columns]
+
+        frame = self.dataset.to_table(columns=read_columns, filter=expression).to_pandas()
+        # A profile archived more than once is stored in several files; keep every level of
+        # its latest write only, so levels dropped by a correction do not resurface
+        write_seq = frame[WRITE_SEQ].fillna(0)
+        if write_seq.nunique() > 1:
+            latest = write_seq.groupby([frame[key] for key in PROFILE_KEY], sort=False).transform("max")
+            frame = frame[write_seq == latest]
+        frame = frame.drop_duplicates(LEVEL_KEY, keep="last")
+        if radius:
+            # The pushed-down predicate is the enclosing bbox; trim it to the circle
+            lat, lon = filters.center
+            frame = frame[haversine_km(lat, lon, frame["latitude"], frame["longitude"]) <= filters.radius_km]
+        if columns:
+            frame = frame[list(columns)]
+        else:
+            frame = frame.drop(columns=WRITE_SEQ)
+        return frame.reset_index(drop=True)
+
+    def read_table(self, filters: Optional[SearchFilters] = None, **kwargs) -> ProfileTable:
+        """Matching levels regrouped into a ProfileTable, ordered by float and date"""
+        frame = self.read(filters, columns=list(ARCHIVE_SCHEMA.names), **kwargs)
+        frame = frame.sort_values(["float_id", "date", "cycle_number", "level"], kind="stable")
+        return ProfileTable.from_frame(frame)
+
+
+def _year_month(value: np.datetime64):
+    timestamp = pd.Timestamp(value)
+    return timestamp.year, timestamp.month
+
+
+def _any(conditions: List[ds.Expression]) -> ds.Expression:
+    expression = conditions[0]
+    for condition in conditions[1:]:
+        expression = expression | condition
+    return expression
@@ -0,0 +1,221 @@
+from typing import Dict, Any, List, Optional, Callable, Tuple
+import numpy as np
+import pandas as pd
+import threading
+import base64
+import binascii
+import logging
+from .segment_store import SegmentStore
+from .metadata_store import METADATA_DTYPE, encode_table, encode_parameters, decode_parameters
+from .spatial_index import SpatioTemporalIndex, SearchFilters
+from .profile_table import ProfileTable
+from ..utils.geo import haversine_km
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileCatalog:
+    """Positions and dates of every ingested profile, queryable by radius and date window
+
+    Records are appended as segments of a SegmentStore and held in memory as
+    one record array indexed by a SpatioTemporalIndex, so radius and date
+    queries touch only the grid cells and date slices they need. A profile is
+    identified by (float_id, cycle_number, date), the key the dataset
+    statistics count by; cataloging it again replaces the earlier record, so
+    re-ingesting a file changes no counts. Superseded records stay in their
+    segments and are dropped when the catalog is loaded.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.store = SegmentStore(directory or settings.profile_catalog_path)
+        self.spatial_index = SpatioTemporalIndex()
+        self._lock = threading.Lock()
+        self._chunks = [self.store.load_part(segment, "profiles") for segment in self.store.segments]
+        self._records: Optional[np.ndarray] = None
+        # Sorted profile keys of the built records and the row of each, for replacing re-cataloged profiles
+        self._keys: Optional[np.ndarray] = None
+        self._key_rows = np.zeros(0, dtype=np.int64)
+        self._listeners: List[Callable[[np.ndarray], None]] = []
+        logger.info(f"Loaded profile catalog with {len(self)} profiles")
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def records(self) -> np.ndarray:
+        """All current profile records, merged and indexed on first access after a change"""
+        with self._lock:
+            if self._records is None:
+                self._build()
+            return self._records
+
+    def _build(self):
+        if self._keys is None:
+            records = _latest(np.concatenate(self._chunks) if self._chunks else np.zeros(0, dtype=METADATA_DTYPE))
+            self._set_keys(records)
+        else:
+            base, added = self._chunks[0], _latest(np.concatenate(self._chunks[1:]))
+            added_keys = _profile_keys(added)
+            superseded = self._lookup(added_keys)
+            if len(superseded):
+                keep = np.ones(len(base), dtype=bool)
+                keep[superseded] = False
+                records = np.concatenate([base[keep], added])
+                self._set_keys(records)
+                # Rows moved, so the index cannot treat the new records as appended
+                self.spatial_index = SpatioTemporalIndex()
+            else:
+                records = np.concatenate([base, added])
+                order = np.argsort(added_keys, kind="stable")
+                positions = np.searchsorted(self._keys, added_keys[order])
+                self._keys = np.insert(self._keys, positions, added_keys[order])
+                self._key_rows = np.insert(self._key_rows, positions, len(base) + order)
+        self._records = records
+        self._chunks = [records]
+        self.spatial_index.update(records["latitude"], records["longitude"], records["date"])
+
+    def _set_keys(self, records: np.ndarray):
+        keys = _profile_keys(records)
+        self._key_rows = np.argsort(keys, kind="stable")
+        self._keys = keys[self._key_rows]
+
+    def _lookup(self, keys: np.ndarray) -> np.ndarray:
+        """Rows of the built records holding any of ``keys``"""
+        if len(self._keys) == 0:
+            return np.zeros(0, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        return self._key_rows[positions[self._keys[positions] == keys]]
+
+    def add_listener(self, listener: Callable[[np.ndarray], None]):
+        """Call ``listener`` with every batch of records added from now on, and the records they replace"""
+        self._listeners.append(listener)
+
+    def add_table(self, table: ProfileTable) -> int:
+        """Catalog the profiles of a parsed table and return how many were added or replaced"""
+        return self.add_records(encode_table(table))
+
+    def add_records(self, records: np.ndarray) -> int:
+        """Append profile records (METADATA_DTYPE) and return how many were added or replaced"""
+        if len(records) == 0:
+            return 0
+        records = np.asarray(records, dtype=METADATA_DTYPE)
+        current = self.records
+        with self._lock:
+            # Listeners also see the replaced records, whose old positions may be cached elsewhere
+            superseded = current[self._lookup(_profile_keys(records))] if current is self._records else current[:0]
+            self.store.append({"profiles": records}, len(records))
+            self._chunks.append(records)
+            self._records = None
+        if len(self.store.segments) > settings.profile_catalog_max_segments:
+            self.store.compact(settings.profile_catalog_segment_rows)
+        changed = np.concatenate([superseded, records])
+        for listener in self._listeners:
+            listener(changed)
+        return len(records)
+
+    def select(self, filters: SearchFilters) -> Tuple[np.ndarray, np.ndarray]:
+        """All records and the sorted row IDs of those satisfying ``filters``"""
+        records = self.records
+        rows = self.spatial_index.candidates(filters, records["parameters"], encode_parameters(filters.parameters))
+        return records, rows
+
+    def find_floats(
+        self,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None,
+        radius_km: Optional[float] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Floats with at least one profile in the radius and date window, ordered by float ID
+
+        Pagination is keyset-based: ``next_cursor`` encodes the last float ID
+        returned, and the next page starts strictly after it.
+        """
+        filters = SearchFilters(
+            center=(lat, lon) if lat is not None and lon is not None and radius_km else None,
+            radius_km=radius_km,
+            start_date=start_date,
+            end_date=end_date
+        )
+        records, rows = self.select(filters)
+
+        # Group matching profiles by float, latest profile last within each group; NaT is
+        # the smallest datetime64 integer, so undated profiles sort first instead of last
+        float_ids = records["float_id"][rows]
+        order = np.lexsort((records["date"][rows].astype(np.int64), float_ids))
+        rows, float_ids = rows[order], float_ids[order]
+        unique_ids, first, counts = np.unique(float_ids, return_index=True, return_counts=True)
+        undated = np.add.reduceat(np.isnat(records["date"][rows]).astype(np.int64), first) if len(first) else first
+        total = len(unique_ids)
+
+        if cursor:
+            start = np.searchsorted(unique_ids, _decode_cursor(cursor), side="right")
+            unique_ids, first, counts, undated = unique_ids[start:], first[start:], counts[start:], undated[start:]
+        has_more = len(unique_ids) > limit
+        unique_ids, first, counts, undated = unique_ids[:limit], first[:limit], counts[:limit], undated[:limit]
+
+        floats = []
+        for float_id, start, count, n_undated in zip(unique_ids, first, counts, undated):
+            latest = records[rows[start + count - 1]]
+            parameters = np.bitwise_or.reduce(records["parameters"][rows[start:start + count]])
+            entry = {
+                "float_id": float_id.decode(),
+                "profile_count": int(count),
+                "first_date": _format_date(records["date"][rows[start + min(n_undated, count - 1)]]),
+                "last_date": _format_date(latest["date"]),
+                "last_cycle": int(latest["cycle_number"]),
+                "latitude": float(latest["latitude"]),
+                "longitude": float(latest["longitude"]),
+                "parameters": decode_parameters(int(parameters))
+            }
+            if filters.center:
+                entry["distance_km"] = round(float(haversine_km(lat, lon, latest["latitude"], latest["longitude"])), 3)
+            floats.append(entry)
+
+        return {
+            "floats": floats,
+            "total": total,
+            "next_cursor": _encode_cursor(unique_ids[-1]) if has_more else None
+        }
+
+    def get_float_profiles(self, float_id: str) -> np.ndarray:
+        """Records of one float's profiles, ordered by date"""
+        records = self.records
+        records = records[records["float_id"] == float_id.encode()]
+        return records[np.argsort(records["date"], kind="stable")]
+
+
+def _profile_keys(records: np.ndarray) -> np.ndarray:
+    """One fixed-width byte string per record identifying its profile; NaT dates compare equal"""
+    keys = np.zeros(len(records), dtype=[("float_id", "S16"), ("cycle_number", "<i8"), ("date", "<i8")])
+    keys["float_id"] = records["float_id"]
+    keys["cycle_number"] = records["cycle_number"]
+    keys["date"] = records["date"].astype(np.int64)
+    return keys.view("S32")
+
+
+def _latest(records: np.ndarray) -> np.ndarray:
+    """Records keeping only the last one of each profile, in their original order"""
+    _, last = np.unique(_profile_keys(records)[::-1], return_index=True)
+    if len(last) == len(records):
+        return records
+    return records[np.sort(len(records) - 1 - last)]
+
+
+def _format_date(value: np.datetime64) -> Optional[str]:
+    return None if np.isnat(value) else str(pd.Timestamp(value))
+
+
+def _encode_cursor(float_id: bytes) -> str:
+    return base64.urlsafe_b64encode(float_id).decode()
+
+
+def _decode_cursor(cursor: str) -> bytes:
+    try:
+        return base64.urlsafe_b64decode(cursor.encode("ascii"))
+    except (binascii.Error, UnicodeEncodeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
@@ -0,0 +1,169 @@
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Callable, Sequence, Tuple
+import numpy as np
+import pandas as pd
+import threading
+import logging
+from .profile_table import ProfileTable
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Standard pressure levels (dbar) used when the caller does not ask for others
+STANDARD_LEVELS = np.array([
+    5, 10, 20, 30, 50, 75, 100, 125, 150, 200, 250, 300, 400, 500, 600, 700,
+    800, 900, 1000, 1100, 1200, 1300, 1400, 1500, 1750, 2000
+], dtype=np.float64)
+
+
+def interpolate_to_levels(pressure: np.ndarray, values: np.ndarray, levels: np.ndarray,
+                          max_gap: Optional[float] = None) -> np.ndarray:
+    """Linearly interpolate every profile of ``values`` onto ``levels`` at once
+
+    ``pressure`` and ``values`` are ``(N_PROF, N_LEVELS)`` with NaN for
+    missing data. The valid points of all profiles are sorted into one
+    array keyed by ``row * span + pressure``, so a single ``searchsorted``
+    finds the bracketing points for every (profile, level) pair. Levels
+    outside a profile's sampled range, or inside a gap wider than
+    ``max_gap`` dbar, are NaN; nothing is extrapolated.
+    """
+    n_prof = pressure.shape[0]
+    levels = np.asarray(levels, dtype=np.float64)
+    result = np.full((n_prof, len(levels)), np.nan)
+
+    valid = ~np.isnan(pressure) & ~np.isnan(values)
+    if n_prof == 0 or not valid.any():
+        return result
+    rows, cols = np.nonzero(valid)
+    p, v = pressure[rows, cols], values[rows, cols]
+
+    # Offset each profile by more than the whole pressure range so keys never interleave
+    span = max(float(np.abs(p).max()), float(np.abs(levels).max())) * 2 + 1
+    keys = rows * span + p
+    order = np.argsort(keys, kind="stable")
+    keys, rows, v = keys[order], rows[order], v[order]
+
+    query_rows = np.repeat(np.arange(n_prof), len(levels))
+    queries = query_rows * span + np.tile(levels, n_prof)
+    upper = np.searchsorted(keys, queries, side="left")
+    lower = upper - 1
+    upper_ok = upper < len(keys)
+    upper_c = np.minimum(upper, len(keys) - 1)
+    lower_c = np.maximum(lower, 0)
+
+    exact = upper_ok & (keys[upper_c] == queries)
+    bracketed = upper_ok & (lower >= 0) & (rows[lower_c] == query_rows) & (rows[upper_c] == query_rows)
+    gap = keys[upper_c] - keys[lower_c]
+    if max_gap is not None:
+        bracketed &= gap <= max_gap
+
+    weight = np.divide(queries - keys[lower_c], gap, out=np.zeros_like(gap), where=gap > 0)
+    interpolated = v[lower_c] + weight * (v[upper_c] - v[lower_c])
+    flat = np.where(exact, v[upper_c], np.where(bracketed, interpolated, np.nan))
+    return flat.reshape(n_prof, len(levels))
+
+
+class ProfileGridder:
+    """Profiles of a float resampled onto common pressure levels, cached per float
+
+    ``loader`` returns a float's profiles as a ProfileTable ordered by date.
+    The gridded result holds one dense ``(N_PROF, N_LEVELS)`` array per
+    parameter and is cached until new profiles of that float are ingested;
+    a grid loaded while profiles were being ingested is not cached.
+    """
+
+    def __init__(self, loader: Callable[[str], ProfileTable], max_floats: Optional[int] = None,
+                 max_gap: Optional[float] = None):
+        self.loader = loader
+        self.max_floats = max_floats or settings.profile_grid_cache_size
+        self.max_gap = max_gap
+        self._cache: "OrderedDict[Tuple[str, Tuple[float, ...]], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_grid(self, float_id: str, levels: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+        """Gridded profiles of a float: ``levels``, per-profile ``index`` and ``values`` per parameter"""
+        levels = np.asarray(levels if levels is not None else STANDARD_LEVELS, dtype=np.float64)
+        key = (float_id, tuple(levels.tolist()))
+        with self._lock:
+            grid = self._cache.get(key)
+            if grid is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return grid
+            self.misses += 1
+            generation = self._generation
+
+        table = self.loader(float_id)
+        grid = {
+            "levels": levels,
+            "index": table.index,
+            "values": {
+                param: interpolate_to_levels(table.pressure, values, levels, self.max_gap)
+                for param, values in table.measurements.items() if param != "PRES"
+            }
+        }
+        with self._lock:
+            if generation != self._generation:
+                # Profiles were ingested while loading; serve this grid but do not cache it
+                return grid
+            self._cache[key] = grid
+            while len(self._cache) > self.max_floats:
+                self._cache.popitem(last=False)
+        return grid
+
+    def query(self, float_id: str, parameters: Optional[List[str]] = None, start_date: Optional[str] = None,
+              end_date: Optional[str] = None, levels: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+        """Slice of a float's grid by parameter and date range, as JSON-ready lists"""
+        grid = self.get_grid(float_id, levels)
+        index = grid["index"]
+        dates = pd.to_datetime(index["date"])
+        keep = np.ones(len(index), dtype=bool)
+        if start_date:
+            keep &= (dates >= pd.Timestamp(start_date)).to_numpy()
+        if end_date:
+            end = pd.Timestamp(end_date)
+            if len(end_date) <= 10:
+                end += pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+            keep &= (dates <= end).to_numpy()
+
+        parameters = parameters or list(grid["values"])
+        missing = [param for param in parameters if param not in grid["values"]]
+        if missing:
+            raise ValueError(f"Parameters not measured by float {float_id}: {', '.join(missing)}")
+
+        return {
+            "float_id": float_id,
+            "levels": grid["levels"].tolist(),
+            "profiles": {
+                "cycle_number": index["cycle_number"][keep].tolist(),
+                "date": [str(date) if not pd.isna(date) else None for date in dates[keep]],
+                "latitude": _nullable(index["latitude"].to_numpy()[keep]),
+                "longitude": _nullable(index["longitude"].to_numpy()[keep])
+            },
+            "parameters": {param: _nullable(grid["values"][param][keep]) for param in parameters}
+        }
+
+    def invalidate(self, float_ids: Sequence[str]):
+        """Drop the cached grids of the given floats"""
+        float_ids = set(float_ids)
+        with self._lock:
+            self._generation += 1
+            for key in [key for key in self._cache if key[0] in float_ids]:
+                del self._cache[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "floats": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None
+        }
+
+
+def _nullable(values: np.ndarray) -> list:
+    """Nested lists with None in place of NaN"""
+    return np.where(np.isnan(values), None, np.round(values, 4)).tolist()
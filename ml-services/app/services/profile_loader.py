@@ -0,0 +1,240 @@
+from typing import Dict, Any, List, Optional
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.engine import Engine, Connection
+from sqlalchemy.dialects import postgresql, sqlite
+import numpy as np
+import pandas as pd
+import io
+import logging
+from .profile_table import ProfileTable
+from .spatial_index import SearchFilters
+from ..models.profiles import profiles_table, levels_table, LEVEL_PARAMETERS
+from ..config.database import engine as default_engine
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Dialect-specific INSERT constructs supporting ON CONFLICT upserts
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+# Positional placeholder for each DB-API paramstyle used by the raw level inserts
+_PLACEHOLDERS = {"qmark": "?", "format": "%s", "pyformat": "%s"}
+
+# Keep IN (...) lists below the bound-parameter limits of every backend
+_MAX_IN_PARAMS = 1000
+
+
+class ProfileLoader:
+    """Bulk persistence of parsed profiles into ``argo_profiles`` / ``argo_levels``
+
+    Profiles are upserted on (platform_number, cycle_number) and their levels
+    replaced in one transaction per batch, so loading the same file
+    twice leaves the database unchanged. Levels are streamed with ``COPY``
+    on PostgreSQL (psycopg2) and inserted in executemany batches elsewhere.
+    """
+
+    def __init__(self, engine: Optional[Engine] = None, batch_rows: Optional[int] = None):
+        self.engine = engine or default_engine
+        self.batch_rows = batch_rows or settings.db_copy_batch_rows
+        self._tables_created = False
+
+    def create_tables(self):
+        """Create the profile tables if they do not exist"""
+        profiles_table.metadata.create_all(self.engine, tables=[profiles_table, levels_table])
+        self._tables_created = True
+
+    def load_table(self, table: ProfileTable) -> int:
+        """Upsert the profiles of a table with all their levels and return the number of level rows written"""
+        if len(table) == 0:
+            return 0
+        if not self._tables_created:
+            self.create_tables()
+
+        profiles = _profile_rows(table)
+        with self.engine.begin() as connection:
+            self._upsert_profiles(connection, profiles)
+            ids = self._profile_ids(connection, profiles)
+            levels = _level_frame(table, profiles["row"].to_numpy(), ids)
+
+            for chunk in _chunks(ids.tolist(), _MAX_IN_PARAMS):
+                connection.execute(delete(levels_table).where(levels_table.c.profile_id.in_(chunk)))
+            if connection.dialect.driver == "psycopg2":
+                self._copy_levels(connection, levels)
+            else:
+                self._insert_levels(connection, levels)
+
+        return len(levels)
+
+    def _upsert_profiles(self, connection: Connection, profiles: pd.DataFrame):
+        dialect_insert = _UPSERT_INSERTS.get(connection.dialect.name)
+        if dialect_insert is None:
+            raise ValueError(f"Profile upserts are not supported on {connection.dialect.name}")
+
+        statement = dialect_insert(profiles_table)
+        statement = statement.on_conflict_do_update(
+            index_elements=["platform_number", "cycle_number"],
+            set_={
+                column: statement.excluded[column]
+                for column in ("date", "latitude", "longitude", "n_levels")
+            }
+        )
+        columns = ["platform_number", "cycle_number", "date", "latitude", "longitude", "n_levels"]
+        for chunk in _chunks(_records(profiles[columns]), self.batch_rows):
+            connection.execute(statement, chunk)
+
+    def _profile_ids(self, connection: Connection, profiles: pd.DataFrame) -> np.ndarray:
+        """Database IDs of the upserted profiles, in the order of ``profiles``"""
+        found = []
+        for platforms in _chunks(profiles["platform_number"].unique().tolist(), _MAX_IN_PARAMS):
+            query = select(profiles_table.c.id, profiles_table.c.platform_number, profiles_table.c.cycle_number)
+            result = connection.execute(query.where(profiles_table.c.platform_number.in_(platforms)))
+            found.append(pd.DataFrame(result.fetchall(), columns=["id", "platform_number", "cycle_number"]))
+        ids = profiles.merge(pd.concat(found), on=["platform_number", "cycle_number"], how="left")["id"]
+        return ids.to_numpy(dtype=np.int64)
+
+    def _copy_levels(self, connection: Connection, levels: pd.DataFrame):
+        """Stream level rows through COPY ... FROM STDIN, ``batch_rows`` at a time"""
+        columns = ", ".join(levels.columns)
+        cursor = connection.connection.cursor()
+        try:
+            for start in range(0, len(levels), self.batch_rows):
+                buffer = io.StringIO()
+                levels.iloc[start:start + self.batch_rows].to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+                cursor.copy_expert(f"COPY {levels_table.name} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+
+    def _insert_levels(self, connection: Connection, levels: pd.DataFrame):
+        """Insert level rows as positional executemany batches, bypassing per-row statement compilation"""
+        placeholder = _PLACEHOLDERS.get(connection.dialect.paramstyle)
+        if placeholder is None:
+            for chunk in _chunks(_records(levels), self.batch_rows):
+                connection.execute(insert(levels_table), chunk)
+            return
+
+        statement = (
+            f"INSERT INTO {levels_table.name} ({', '.join(levels.columns)}) "
+            f"VALUES ({', '.join([placeholder] * len(levels.columns))})"
+        )
+        rows = list(_nullable(levels).itertuples(index=False, name=None))
+        for chunk in _chunks(rows, self.batch_rows):
+            connection.exec_driver_sql(statement, chunk)
+
+    def read_table(self, float_id: str, filters: Optional[SearchFilters] = None) -> ProfileTable:
+        """Stored profiles of a float with their levels as a ProfileTable ordered by date
+
+        Only the date range of ``filters`` applies; it is used where the
+        profile archive is disabled and the database is the only level store.
+        """
+        if not self._tables_created:
+            self.create_tables()
+        query = (
+            select(
+                profiles_table.c.id.label("profile_id"),
+                profiles_table.c.platform_number.label("float_id"),
+                profiles_table.c.cycle_number,
+                profiles_table.c.date,
+                profiles_table.c.latitude,
+                profiles_table.c.longitude,
+                *[column for column in levels_table.c if column.name != "profile_id"]
+            )
+            .join(levels_table, levels_table.c.profile_id == profiles_table.c.id)
+            .where(profiles_table.c.platform_number == str(float_id))
+            .order_by(profiles_table.c.date, profiles_table.c.cycle_number, levels_table.c.level)
+        )
+        start, end = (filters or SearchFilters()).date_range()
+        if start is not None:
+            query = query.where(profiles_table.c.date >= pd.Timestamp(start).to_pydatetime())
+        if end is not None:
+            query = query.where(profiles_table.c.date <= pd.Timestamp(end).to_pydatetime())
+
+        with self.engine.connect() as connection:
+            result = connection.execute(query)
+            frame = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+        frame = frame.rename(columns={
+            **{param.lower(): param for param in LEVEL_PARAMETERS},
+            **{f"{param.lower()}_qc": f"{param}_QC" for param in LEVEL_PARAMETERS}
+        })
+        return ProfileTable.from_frame(frame)
+
+    def count_rows(self) -> Dict[str, int]:
+        """Number of profile and level rows in the database"""
+        with self.engine.connect() as connection:
+            return {
+                "profiles": connection.execute(select(func.count()).select_from(profiles_table)).scalar(),
+                "levels": connection.execute(select(func.count()).select_from(levels_table)).scalar()
+            }
+
+
+def _profile_rows(table: ProfileTable) -> pd.DataFrame:
+    """One row per (platform, cycle), keeping the last occurrence within the table
+
+    Profiles sharing a key with a later one (a cycle's descending profile
+    next to its ascending one, or several profiles without a cycle number)
+    are not stored; they are logged so the loss is visible.
+    """
+    index = table.index
+    n_levels = (~np.isnan(table.pressure)).sum(axis=1) if table.pressure.size else np.zeros(len(index), dtype=int)
+    profiles = pd.DataFrame({
+        "row": np.arange(len(index)),
+        "platform_number": index["float_id"].fillna("").astype(str).str.strip(),
+        "cycle_number": index["cycle_number"].astype("int64"),
+        "date": index["date"],
+        "latitude": index["latitude"],
+        "longitude": index["longitude"],
+        "n_levels": n_levels.astype("int64"),
+    })
+    duplicated = profiles.duplicated(["platform_number", "cycle_number"], keep="last")
+    if duplicated.any():
+        dropped = profiles.loc[duplicated, ["platform_number", "cycle_number"]]
+        keys = ", ".join(f"{platform}/{cycle}" for platform, cycle in dropped.head(10).itertuples(index=False))
+        logger.warning(
+            f"Skipping {len(dropped)} profiles that share a platform/cycle with a later profile "
+            f"({int((dropped['cycle_number'] < 0).sum())} without a cycle number): {keys}"
+            + (", ..." if len(dropped) > 10 else "")
+        )
+    return profiles[~duplicated].reset_index(drop=True)
+
+
+def _level_frame(table: ProfileTable, rows: np.ndarray, profile_ids: np.ndarray) -> pd.DataFrame:
+    """Long-format level rows of the given table rows, with ``profile_id`` set to their database IDs"""
+    present = ~np.isnan(table.pressure[rows])
+    for param in LEVEL_PARAMETERS:
+        if param in table.measurements:
+            present |= ~np.isnan(table.measurements[param][rows])
+    prof_idx, level_idx = np.nonzero(present)
+    source_rows = rows[prof_idx]
+
+    levels = pd.DataFrame({
+        "profile_id": profile_ids[prof_idx],
+        "level": level_idx,
+        "pressure": table.pressure[source_rows, level_idx],
+    })
+    for param in LEVEL_PARAMETERS:
+        values = table.measurements.get(param)
+        levels[param.lower()] = values[source_rows, level_idx] if values is not None else np.nan
+    for param in LEVEL_PARAMETERS:
+        flags = table.qc_flags.get(param)
+        column = np.full(len(levels), None, dtype=object)
+        if flags is not None:
+            selected = flags[source_rows, level_idx]
+            has_flag = np.char.strip(selected.astype(str)) != ""
+            column[has_flag] = selected[has_flag]
+        levels[f"{param.lower()}_qc"] = column
+    return levels
+
+
+def _nullable(frame: pd.DataFrame) -> pd.DataFrame:
+    """Object-typed copy of a frame holding None for every missing value"""
+    return frame.astype(object).where(frame.notna(), None)
+
+
+def _records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Frame rows as parameter dicts with NULL for every missing value"""
+    return _nullable(frame).to_dict("records")
+
+
+def _chunks(items: List[Any], size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -0,0 +1,153 @@
+import numpy as np
+from typing import Dict, Any, List, Optional, Sequence
+
+SUMMARY_STATS = ("surface", "bottom", "min", "max")
+
+# Mixed-layer depth: first pressure where temperature departs from its value
+# at the reference pressure by more than the threshold (de Boyer Montegut et al., 2004)
+MLD_REFERENCE_PRESSURE = 10.0
+MLD_TEMPERATURE_THRESHOLD = 0.2
+
+
+def summary_dtype(parameters: Sequence[str]) -> np.dtype:
+    """Fixed-width summary record for the given parameters; fields are NaN wherever a value is not available"""
+    return np.dtype([
+        ("n_levels", "i4"),
+        ("min_pressure", "f4"),
+        ("max_pressure", "f4"),
+        ("mixed_layer_depth", "f4"),
+        *[(f"{param}_{stat}", "f4") for param in parameters for stat in SUMMARY_STATS],
+    ])
+
+
+def summary_parameters(dtype: np.dtype) -> List[str]:
+    """Parameters summarised by records of ``dtype``"""
+    return [name[:-len("_surface")] for name in dtype.names if name.endswith("_surface")]
+
+
+def empty_summaries(n_prof: int, dtype: np.dtype) -> np.ndarray:
+    summaries = np.zeros(n_prof, dtype=dtype)
+    for name in dtype.names[1:]:
+        summaries[name] = np.nan
+    return summaries
+
+
+def summarize(pressure: np.ndarray, measurements: Dict[str, np.ndarray], dtype: np.dtype) -> np.ndarray:
+    """Summary records of ``dtype`` for ``(N_PROF, N_LEVELS)`` pressure and measurement arrays
+
+    Every statistic is computed for all profiles at once. Surface and bottom
+    values are taken at the shallowest and deepest valid pressure, so the
+    result does not depend on the order of levels.
+    """
+    rows = np.arange(pressure.shape[0])
+    summaries = empty_summaries(pressure.shape[0], dtype)
+    if pressure.shape[1] == 0:
+        return summaries
+
+    any_valid = np.zeros(pressure.shape, dtype=bool)
+    for param in summary_parameters(dtype):
+        values = measurements.get(param)
+        if values is None:
+            continue
+        valid = ~np.isnan(values) & ~np.isnan(pressure)
+        any_valid |= valid
+        has_values = valid.any(axis=1)
+        surface = np.argmin(np.where(valid, pressure, np.inf), axis=1)
+        bottom = np.argmax(np.where(valid, pressure, -np.inf), axis=1)
+        masked = np.where(valid, values, np.nan)
+        summaries[f"{param}_surface"] = np.where(has_values, values[rows, surface], np.nan)
+        summaries[f"{param}_bottom"] = np.where(has_values, values[rows, bottom], np.nan)
+        # fmin/fmax ignore NaN and return NaN for empty rows without warnings
+        summaries[f"{param}_min"] = np.fmin.reduce(masked, axis=1)
+        summaries[f"{param}_max"] = np.fmax.reduce(masked, axis=1)
+
+    summaries["n_levels"] = any_valid.sum(axis=1)
+    covered = np.where(any_valid, pressure, np.nan)
+    summaries["min_pressure"] = np.fmin.reduce(covered, axis=1)
+    summaries["max_pressure"] = np.fmax.reduce(covered, axis=1)
+
+    if "TEMP" in measurements:
+        summaries["mixed_layer_depth"] = _mixed_layer_depth(pressure, measurements["TEMP"])
+    return summaries
+
+
+def _mixed_layer_depth(pressure: np.ndarray, temperature: np.ndarray) -> np.ndarray:
+    """Mixed-layer depth in dbar per profile, NaN when the profile never leaves the mixed layer"""
+    rows = np.arange(pressure.shape[0])
+    valid = ~np.isnan(temperature) & ~np.isnan(pressure)
+    reference = np.argmin(np.where(valid & (pressure >= MLD_REFERENCE_PRESSURE), pressure, np.inf), axis=1)
+    has_reference = (valid & (pressure >= MLD_REFERENCE_PRESSURE)).any(axis=1)
+    reference_pressure = pressure[rows, reference][:, None]
+    reference_temperature = temperature[rows, reference][:, None]
+    with np.errstate(invalid="ignore"):
+        departed = valid & (pressure > reference_pressure) & (
+            np.abs(temperature - reference_temperature) > MLD_TEMPERATURE_THRESHOLD
+        )
+    depth = np.fmin.reduce(np.where(departed, pressure, np.nan), axis=1)
+    return np.where(has_reference, depth, np.nan)
+
+
+def summary_to_dict(record: np.void) -> Dict[str, Any]:
+    """Compact dict form of a summary record, leaving out parameters the profile does not have"""
+    summary = {
+        "n_levels": int(record["n_levels"]),
+        "min_pressure": _rounded(record["min_pressure"]),
+        "max_pressure": _rounded(record["max_pressure"]),
+        "mixed_layer_depth": _rounded(record["mixed_layer_depth"]),
+        "parameters": {}
+    }
+    for param in summary_parameters(record.dtype):
+        if np.isnan(record[f"{param}_min"]):
+            continue
+        summary["parameters"][param] = {stat: _rounded(record[f"{param}_{stat}"]) for stat in SUMMARY_STATS}
+    return summary
+
+
+def summarize_documents(documents: List[Dict[str, Any]], dtype: np.dtype) -> np.ndarray:
+    """Summary records for profile documents, reusing the summaries computed at ingest"""
+    summaries = empty_summaries(len(documents), dtype)
+    for row, doc in enumerate(documents):
+        summary = doc.get("summary")
+        if summary is not None:
+            _fill_record(summaries[row:row + 1], summary)
+        else:
+            summaries[row] = _summarize_measurements(doc.get("measurements", {}), dtype)
+    return summaries
+
+
+def _fill_record(record: np.ndarray, summary: Dict[str, Any]):
+    record["n_levels"] = summary.get("n_levels") or 0
+    for name in ("min_pressure", "max_pressure", "mixed_layer_depth"):
+        record[name] = _nan_if_none(summary.get(name))
+    for param, stats in summary.get("parameters", {}).items():
+        for stat in SUMMARY_STATS:
+            if f"{param}_{stat}" in record.dtype.names:
+                record[f"{param}_{stat}"] = _nan_if_none(stats.get(stat))
+
+
+def _summarize_measurements(measurements: Dict[str, Any], dtype: np.dtype) -> np.void:
+    """Summary of one document whose parameters each carry their own pressure levels
+
+    The parameters' levels are laid side by side on one row, which the
+    order-independent statistics of ``summarize`` handle as they are.
+    """
+    params = [param for param in measurements if f"{param}_surface" in dtype.names]
+    pressures = [np.asarray(measurements[param].get("pressure", []), dtype=np.float64) for param in params]
+    pressure = np.concatenate(pressures)[None, :] if pressures else np.full((1, 0), np.nan)
+    arrays, start = {}, 0
+    for param, levels in zip(params, pressures):
+        values = np.full(pressure.shape, np.nan)
+        values[0, start:start + len(levels)] = np.asarray(measurements[param].get("values", []), dtype=np.float64)
+        arrays[param] = values
+        start += len(levels)
+    record = summarize(pressure, arrays, dtype)[0]
+    record["n_levels"] = len(np.unique(pressure[~np.isnan(pressure)]))
+    return record
+
+
+def _rounded(value) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 3)
+
+
+def _nan_if_none(value) -> float:
+    return np.nan if value is None else float(value)
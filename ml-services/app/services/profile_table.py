@@ -0,0 +1,216 @@
+import pandas as pd
+import numpy as np
+from typing import Dict, Any, List, Optional, Sequence
+from .profile_summary import summary_to_dict
+
+
+class ProfileTable:
+    """Columnar, array-backed table of ARGO profiles
+
+    Each measured parameter is kept as a dense ``(N_PROF, N_LEVELS)`` float
+    array with NaN wherever the value is a fill value or failed QC, so whole
+    blocks of profiles can be processed with single NumPy operations. The
+    per-profile dict representation used by the API is built lazily.
+    Tables read from NetCDF files also carry one summary record per profile
+    (surface/bottom values, ranges, mixed-layer depth, depth coverage).
+    """
+
+    def __init__(
+        self,
+        index: pd.DataFrame,
+        pressure: np.ndarray,
+        measurements: Dict[str, np.ndarray],
+        qc_flags: Optional[Dict[str, np.ndarray]] = None,
+        summaries: Optional[np.ndarray] = None,
+    ):
+        # One row per profile: profile_id, float_id, cycle_number, date, latitude, longitude
+        self.index = index.reset_index(drop=True)
+        self.pressure = pressure
+        self.measurements = measurements
+        self.qc_flags = qc_flags or {}
+        self.summaries = summaries
+        self._profiles = None
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def parameters(self) -> List[str]:
+        """Parameters present in the table"""
+        return list(self.measurements.keys())
+
+    @property
+    def profiles(self) -> List[Dict[str, Any]]:
+        """Per-profile dict view, built on first access"""
+        if self._profiles is None:
+            self._profiles = self.to_dicts()
+        return self._profiles
+
+    def take(self, rows: Sequence[int]) -> "ProfileTable":
+        """Return a new table holding only the given profile rows"""
+        rows = np.asarray(rows, dtype=np.intp)
+        return ProfileTable(
+            index=self.index.iloc[rows],
+            pressure=self.pressure[rows],
+            measurements={param: values[rows] for param, values in self.measurements.items()},
+            qc_flags={param: flags[rows] for param, flags in self.qc_flags.items()},
+            summaries=self.summaries[rows] if self.summaries is not None else None,
+        )
+
+    @classmethod
+    def concat(cls, tables: Sequence["ProfileTable"]) -> "ProfileTable":
+        """Concatenate tables along the profile axis, padding levels with NaN"""
+        tables = [table for table in tables if len(table)]
+        if not tables:
+            return cls.empty()
+        if len(tables) == 1:
+            return tables[0]
+
+        n_levels = max(table.pressure.shape[1] for table in tables)
+        parameters = list(dict.fromkeys(param for table in tables for param in table.parameters))
+        qc_parameters = list(dict.fromkeys(param for table in tables for param in table.qc_flags))
+
+        def _pad(array: Optional[np.ndarray], n_prof: int, fill, dtype) -> np.ndarray:
+            padded = np.full((n_prof, n_levels), fill, dtype=dtype)
+            if array is not None:
+                padded[:, :array.shape[1]] = array
+            return padded
+
+        return cls(
+            index=pd.concat([table.index for table in tables], ignore_index=True),
+            pressure=np.concatenate([_pad(t.pressure, len(t), np.nan, np.float64) for t in tables]),
+            measurements={
+                param: np.concatenate([_pad(t.measurements.get(param), len(t), np.nan, np.float64) for t in tables])
+                for param in parameters
+            },
+            qc_flags={
+                param: np.concatenate([_pad(t.qc_flags.get(param), len(t), " ", "U1") for t in tables])
+                for param in qc_parameters
+            },
+            summaries=(
+                np.concatenate([table.summaries for table in tables])
+                if all(table.summaries is not None for table in tables) else None
+            ),
+        )
+
+    @classmethod
+    def empty(cls) -> "ProfileTable":
+        """Return a table with no profiles"""
+        index = pd.DataFrame({
+            "profile_id": pd.Series([], dtype="int64"),
+            "float_id": pd.Series([], dtype="object"),
+            "cycle_number": pd.Series([], dtype="int64"),
+            "date": pd.Series([], dtype="datetime64[ns]"),
+            "latitude": pd.Series([], dtype="float64"),
+            "longitude": pd.Series([], dtype="float64"),
+        })
+        return cls(index=index, pressure=np.empty((0, 0)), measurements={})
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "ProfileTable":
+        """Rebuild a table from long-format rows as produced by ``to_frame``
+
+        Profiles are identified by (float_id, cycle_number, date) and keep the
+        order in which they first appear.
+        """
+        if frame.empty:
+            return cls.empty()
+        keys = ["float_id", "cycle_number", "date"]
+        groups = frame.groupby(keys, sort=False, dropna=False)
+        rows = groups.ngroup().to_numpy()
+        index = groups[["profile_id", "latitude", "longitude"]].first().reset_index()
+        index = index[["profile_id", "float_id", "cycle_number", "date", "latitude", "longitude"]]
+
+        levels = frame["level"].to_numpy(dtype=np.intp)
+        shape = (len(index), int(levels.max()) + 1)
+
+        def _dense(values: np.ndarray, fill, dtype) -> np.ndarray:
+            dense = np.full(shape, fill, dtype=dtype)
+            dense[rows, levels] = values
+            return dense
+
+        measurements, qc_flags = {}, {}
+        for column in frame.columns:
+            if column.endswith("_QC") or column in keys or column in ("profile_id", "latitude", "longitude", "level", "pressure"):
+                continue
+            values = pd.to_numeric(frame[column], errors="coerce").to_numpy(dtype=np.float64)
+            if np.isnan(values).all():
+                continue
+            measurements[column] = _dense(values, np.nan, np.float64)
+            if f"{column}_QC" in frame:
+                qc_flags[column] = _dense(frame[f"{column}_QC"].fillna(" ").to_numpy(dtype="U1"), " ", "U1")
+
+        return cls(
+            index=index,
+            pressure=_dense(frame["pressure"].to_numpy(dtype=np.float64), np.nan, np.float64),
+            measurements=measurements,
+            qc_flags=qc_flags,
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """Long-format frame with one row per (profile, level) holding any valid value"""
+        n_prof, n_levels = self.pressure.shape
+        if n_prof == 0 or not self.measurements:
+            return pd.DataFrame(columns=list(self.index.columns) + ["level", "pressure"] + self.parameters)
+
+        any_valid = np.zeros((n_prof, n_levels), dtype=bool)
+        for values in self.measurements.values():
+            any_valid |= ~np.isnan(values)
+        prof_idx, level_idx = np.nonzero(any_valid)
+
+        frame = self.index.iloc[prof_idx].reset_index(drop=True)
+        frame["level"] = level_idx
+        frame["pressure"] = self.pressure[prof_idx, level_idx]
+        for param, values in self.measurements.items():
+            frame[param] = values[prof_idx, level_idx]
+        for param, flags in self.qc_flags.items():
+            frame[f"{param}_QC"] = flags[prof_idx, level_idx]
+        return frame
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Build the per-profile dict representation"""
+        index = self.index
+        dates = _nullable_list(index["date"].astype(str), index["date"].notna())
+        latitudes = _nullable_list(index["latitude"], index["latitude"].notna())
+        longitudes = _nullable_list(index["longitude"], index["longitude"].notna())
+        profile_ids = index["profile_id"].tolist()
+        float_ids = index["float_id"].tolist() if "float_id" in index else [None] * len(index)
+        cycles = index["cycle_number"].tolist() if "cycle_number" in index else [None] * len(index)
+
+        valid = {param: ~np.isnan(values) for param, values in self.measurements.items()}
+
+        profiles = []
+        for row in range(len(index)):
+            profile = {
+                "profile_id": profile_ids[row],
+                "date": dates[row],
+                "latitude": latitudes[row],
+                "longitude": longitudes[row],
+                "measurements": {}
+            }
+            if float_ids[row]:
+                profile["float_id"] = float_ids[row]
+            if cycles[row] is not None and cycles[row] >= 0:
+                profile["cycle_number"] = int(cycles[row])
+            if self.summaries is not None:
+                profile["summary"] = summary_to_dict(self.summaries[row])
+
+            for param, values in self.measurements.items():
+                mask = valid[param][row]
+                if not mask.any():
+                    continue
+                flags = self.qc_flags.get(param)
+                profile["measurements"][param] = {
+                    "values": values[row, mask].tolist(),
+                    "pressure": self.pressure[row, mask].tolist(),
+                    "qc_flags": flags[row, mask].tolist() if flags is not None else []
+                }
+
+            profiles.append(profile)
+
+        return profiles
+
+
+def _nullable_list(series: pd.Series, present: pd.Series) -> List[Any]:
+    """Convert a series to a list with None wherever ``present`` is False"""
+    return series.astype(object).where(present, None).tolist()
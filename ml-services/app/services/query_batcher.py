@@ -0,0 +1,122 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter, deque
+from typing import Dict, Any, List, Callable, Optional, Set, Tuple
+import numpy as np
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """Rolling window of latency samples with percentile reporting"""
+
+    def __init__(self, window: int = 10000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        if not self.samples:
+            return {"count": self.count, "p50_ms": None, "p99_ms": None}
+        p50, p99 = np.percentile(np.fromiter(self.samples, dtype=float), [50, 99]) * 1000
+        return {"count": self.count, "p50_ms": round(float(p50), 3), "p99_ms": round(float(p99), 3)}
+
+
+class QueryBatcher:
+    """Coalesces concurrent search queries into batched calls on a thread pool
+
+    Queries arriving within ``window_ms`` of the first pending query are
+    encoded and searched together with one call to ``search_batch``, which
+    takes a list of queries and a limit and returns one result list per query.
+    Searches that cannot be batched (filtered ones) go through ``run`` on the
+    same pool; their latencies are reported separately.
+    """
+
+    def __init__(
+        self,
+        search_batch: Callable[[List[str], int], List[List[Dict[str, Any]]]],
+        window_ms: float = 5.0,
+        max_batch_size: int = 32,
+        max_workers: int = 2
+    ):
+        self.search_batch = search_batch
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vector-search")
+        self.latency = LatencyTracker()
+        self.unbatched_latency = LatencyTracker()
+        self.batch_sizes = Counter()
+        self._pending: List[Tuple[str, int, asyncio.Future, float]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # The loop only keeps weak references to tasks; running batches are held here until done
+        self._batches: Set[asyncio.Task] = set()
+
+    async def submit(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Queue a query and wait for its results"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((query, limit, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        """Run one unbatched search on the pool and record its latency"""
+        started = time.perf_counter()
+        result = await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        self.unbatched_latency.record(time.perf_counter() - started)
+        return result
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, int, asyncio.Future, float]]):
+        queries = [query for query, _, _, _ in batch]
+        limit = max(limit for _, limit, _, _ in batch)
+        self.batch_sizes[len(batch)] += 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(self.executor, self.search_batch, queries, limit)
+            if len(results) != len(batch):
+                raise RuntimeError(f"Batched search returned {len(results)} result lists for {len(batch)} queries")
+        except Exception as e:
+            logger.error(f"Batched search of {len(batch)} queries failed: {str(e)}")
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        now = time.perf_counter()
+        for (_, query_limit, future, started), query_results in zip(batch, results):
+            self.latency.record(now - started)
+            if not future.done():
+                future.set_result(query_results[:query_limit])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Latency percentiles and batch size distribution"""
+        return {
+            "latency": self.latency.get_stats(),
+            "unbatched_latency": self.unbatched_latency.get_stats(),
+            "batch_sizes": {str(size): count for size, count in sorted(self.batch_sizes.items())}
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
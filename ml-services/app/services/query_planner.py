@@ -0,0 +1,411 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import select, func, and_, or_, exists, bindparam, true
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import Select
+import pandas as pd
+import threading
+import re
+import logging
+from .spatial_index import SearchFilters
+from ..models.profiles import profiles_table, levels_table, LEVEL_PARAMETERS
+from ..config.database import engine as default_engine
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Named regions as (min_lat, min_lon, max_lat, max_lon); min_lon > max_lon crosses the antimeridian.
+# Longer names come first so that "north atlantic" wins over "atlantic".
+REGIONS = {
+    "arabian sea": (0.0, 50.0, 25.0, 78.0),
+    "bay of bengal": (5.0, 78.0, 23.0, 100.0),
+    "red sea": (12.0, 32.0, 30.0, 44.0),
+    "mediterranean": (30.0, -6.0, 46.0, 36.0),
+    "gulf of mexico": (18.0, -98.0, 31.0, -80.0),
+    "north atlantic": (0.0, -80.0, 66.0, 0.0),
+    "south atlantic": (-60.0, -70.0, 0.0, 20.0),
+    "north pacific": (0.0, 120.0, 66.0, -100.0),
+    "south pacific": (-60.0, 147.0, 0.0, -70.0),
+    "southern ocean": (-90.0, -180.0, -60.0, 180.0),
+    "indian ocean": (-60.0, 20.0, 31.0, 147.0),
+    "atlantic": (-60.0, -80.0, 66.0, 20.0),
+    "pacific": (-60.0, 120.0, 66.0, -70.0),
+    "arctic": (66.0, -180.0, 90.0, 180.0),
+    "equator": (-5.0, -180.0, 5.0, 180.0),
+    "equatorial": (-5.0, -180.0, 5.0, 180.0),
+}
+
+# Words naming each parameter; matched on word boundaries
+PARAMETER_WORDS = {
+    "TEMP": ["temperature", "temperatures", "temp", "thermal", "warm", "warming"],
+    "PSAL": ["salinity", "salinities", "salt", "saline", "psal"],
+    "DOXY": ["oxygen", "doxy", "o2"],
+    "CHLA": ["chlorophyll", "chla"],
+    "NITRATE": ["nitrate", "nitrates"],
+    "PH_IN_SITU_TOTAL": ["ph", "acidity"],
+    "BBP700": ["backscatter", "backscattering", "bbp", "bbp700"],
+}
+
+MONTHS = {name: number for number, names in enumerate([
+    ("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"), ("may",), ("jun", "june"),
+    ("jul", "july"), ("aug", "august"), ("sep", "sept", "september"), ("oct", "october"), ("nov", "november"),
+    ("dec", "december")
+], 1) for name in names}
+
+_NUMBER = r"(-?\d+(?:\.\d+)?)"
+_DEPTH_UNIT = r"\s*(?:m|meters?|metres?|dbar|db|decibars?)\b"
+# Years are never followed by a depth unit, so "2000 m" stays a depth
+_DATE = (
+    r"(\d{4}-\d{2}-\d{2}|(?:(?:" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\.?\s+)?(?:19|20)\d{2}"
+    + r"(?!" + _DEPTH_UNIT + r"))"
+)
+_DEPTH = re.compile(_NUMBER + _DEPTH_UNIT)
+_COORDINATE = re.compile(_NUMBER + r"\s*°?\s*([nsew])\b")
+_RELATIVE = re.compile(r"\b(?:last|past)\s+(\d+\s+)?(day|week|month|year)s?\b")
+
+
+@dataclass
+class QueryPlan:
+    """Constraints extracted from a question and the bind parameters of its compiled query
+
+    ``template`` names which constraints are present, not their values, so
+    questions of the same shape share one compiled statement.
+    """
+
+    question: str
+    template: str
+    filters: SearchFilters
+    float_id: Optional[str] = None
+    region: Optional[str] = None
+    min_pressure: Optional[float] = None
+    max_pressure: Optional[float] = None
+    params: Dict[str, Any] = field(default_factory=dict)
+    sql: Optional[str] = None
+
+    @property
+    def is_selective(self) -> bool:
+        """Whether the plan narrows down profiles by place, time or float, so executing it is cheap"""
+        return bool(self.filters.spatial_bbox or self.filters.start_date or self.filters.end_date or self.float_id)
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.template}|{sorted((key, str(value)) for key, value in self.params.items())}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "template": self.template,
+            "filters": asdict(self.filters),
+            "float_id": self.float_id,
+            "region": self.region,
+            "min_pressure": self.min_pressure,
+            "max_pressure": self.max_pressure,
+            "sql": self.sql,
+            "params": {key: str(value) if isinstance(value, datetime) else value for key, value in self.params.items()}
+        }
+
+
+class QueryPlanner:
+    """Turns natural language questions into parameterised queries over the profile tables
+
+    Regions, coordinates, date ranges, parameters, pressure ranges and float
+    IDs are extracted with regular expressions. They compile into a summary
+    aggregate and a short list of matching profiles, written as range
+    predicates on the indexed profile columns with the level table joined
+    only when parameters or pressures are involved. Compiled statements are
+    cached per template, and unselective plans are never executed, so a
+    question never scans or returns the whole table.
+    """
+
+    def __init__(self, engine: Optional[Engine] = None, max_templates: Optional[int] = None,
+                 row_limit: Optional[int] = None):
+        self.engine = engine or default_engine
+        self.max_templates = max_templates or settings.query_plan_cache_size
+        self.row_limit = row_limit or settings.query_plan_row_limit
+        self._statements: "OrderedDict[str, Tuple[Select, Select, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.executions = 0
+
+    def plan(self, question: str, now: Optional[datetime] = None) -> QueryPlan:
+        """Extract the constraints of a question and bind them to its compiled query"""
+        text = question.lower()
+        now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+
+        min_pressure, max_pressure, text = _extract_pressure(text)
+        # Depths the pressure patterns did not consume must not be read as years or float IDs
+        text = _DEPTH.sub(" ", text)
+        start_date, end_date, text = _extract_dates(text, now)
+        float_match = re.search(r"\b([1-9]\d{6})\b", text)
+        float_id = float_match.group(1) if float_match else None
+        bbox, center, radius_km, region = _extract_area(text)
+        parameters = [
+            param for param, words in PARAMETER_WORDS.items()
+            if re.search(r"\b(?:" + "|".join(map(re.escape, words)) + r")\b", text)
+        ]
+
+        filters = SearchFilters(
+            bbox=bbox,
+            center=center,
+            radius_km=radius_km,
+            start_date=start_date,
+            end_date=end_date,
+            parameters=parameters
+        )
+        # The SQL filters on the enclosing box of a radius; the vector search applies the exact circle
+        bbox = filters.spatial_bbox
+        params: Dict[str, Any] = {}
+        parts = []
+        if bbox:
+            params.update(zip(("min_lat", "min_lon", "max_lat", "max_lon"), bbox))
+            parts.append("bbox_wrap" if bbox[1] > bbox[3] else "bbox")
+        start, end = filters.date_range()
+        if start is not None:
+            params["start_date"] = pd.Timestamp(start).to_pydatetime()
+            parts.append("start")
+        if end is not None:
+            params["end_date"] = pd.Timestamp(end).to_pydatetime()
+            parts.append("end")
+        if float_id:
+            params["platform_number"] = float_id
+            parts.append("float")
+        if parameters:
+            parts.append("params:" + ",".join(parameters))
+        if min_pressure is not None:
+            params["min_pressure"] = min_pressure
+            parts.append("pmin")
+        if max_pressure is not None:
+            params["max_pressure"] = max_pressure
+            parts.append("pmax")
+
+        plan = QueryPlan(
+            question=question,
+            template="|".join(parts) or "all",
+            filters=filters,
+            float_id=float_id,
+            region=region,
+            min_pressure=min_pressure,
+            max_pressure=max_pressure,
+            params=params
+        )
+        plan.sql = self._compiled(plan)[2]
+        return plan
+
+    def execute(self, plan: QueryPlan) -> Optional[Dict[str, Any]]:
+        """Run a selective plan and return its summary and most recent matching profiles"""
+        if not plan.is_selective:
+            return None
+        summary_statement, profiles_statement, _ = self._compiled(plan)
+        with self.engine.connect() as connection:
+            summary = connection.execute(summary_statement, plan.params).mappings().one()
+            profiles = connection.execute(profiles_statement, plan.params).mappings().all()
+        self.executions += 1
+        return {
+            "summary": {key: _json_value(value) for key, value in summary.items()},
+            "profiles": [{key: _json_value(value) for key, value in row.items()} for row in profiles]
+        }
+
+    def _compiled(self, plan: QueryPlan) -> Tuple[Select, Select, str]:
+        with self._lock:
+            compiled = self._statements.get(plan.template)
+            if compiled is not None:
+                self._statements.move_to_end(plan.template)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+
+        compiled = self._compile(plan)
+        with self._lock:
+            self._statements[plan.template] = compiled
+            while len(self._statements) > self.max_templates:
+                self._statements.popitem(last=False)
+        return compiled
+
+    def _compile(self, plan: QueryPlan) -> Tuple[Select, Select, str]:
+        p, l = profiles_table.c, levels_table.c
+        params = plan.params
+
+        profile_conditions = []
+        if "min_lat" in params:
+            profile_conditions.append(p.latitude.between(bindparam("min_lat"), bindparam("max_lat")))
+            if params["min_lon"] > params["max_lon"]:
+                profile_conditions.append(or_(p.longitude >= bindparam("min_lon"), p.longitude <= bindparam("max_lon")))
+            else:
+                profile_conditions.append(p.longitude.between(bindparam("min_lon"), bindparam("max_lon")))
+        if "start_date" in params:
+            profile_conditions.append(p.date >= bindparam("start_date"))
+        if "end_date" in params:
+            profile_conditions.append(p.date <= bindparam("end_date"))
+        if "platform_number" in params:
+            profile_conditions.append(p.platform_number == bindparam("platform_number"))
+
+        parameters = [param for param in plan.filters.parameters if param in LEVEL_PARAMETERS]
+        level_conditions = []
+        if "min_pressure" in params:
+            level_conditions.append(l.pressure >= bindparam("min_pressure"))
+        if "max_pressure" in params:
+            level_conditions.append(l.pressure <= bindparam("max_pressure"))
+        if parameters:
+            level_conditions.append(or_(*[l[param.lower()].isnot(None) for param in parameters]))
+
+        columns = [
+            func.count(p.id.distinct()).label("profiles"),
+            func.count(p.platform_number.distinct()).label("floats"),
+            func.min(p.date).label("first_date"),
+            func.max(p.date).label("last_date")
+        ]
+        if level_conditions:
+            columns += [func.min(l.pressure).label("min_pressure"), func.max(l.pressure).label("max_pressure")]
+            for param in parameters:
+                column = l[param.lower()]
+                columns += [
+                    func.count(column).label(f"{param.lower()}_count"),
+                    func.avg(column).label(f"{param.lower()}_mean"),
+                    func.min(column).label(f"{param.lower()}_min"),
+                    func.max(column).label(f"{param.lower()}_max")
+                ]
+            summary = (
+                select(*columns)
+                .select_from(profiles_table.join(levels_table, l.profile_id == p.id))
+                .where(and_(*profile_conditions, *level_conditions))
+            )
+            profile_conditions.append(exists().where(l.profile_id == p.id, *level_conditions))
+        else:
+            summary = select(*columns).where(and_(true(), *profile_conditions))
+
+        profiles = (
+            select(p.platform_number, p.cycle_number, p.date, p.latitude, p.longitude)
+            .where(and_(true(), *profile_conditions))
+            .order_by(p.date.desc())
+            .limit(self.row_limit)
+        )
+        sql = f"{summary};\n{profiles}"
+        return summary, profiles, sql
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "templates": len(self._statements),
+            "hits": self.hits,
+            "misses": self.misses,
+            "executions": self.executions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None
+        }
+
+
+def _extract_pressure(text: str) -> Tuple[Optional[float], Optional[float], str]:
+    """Pressure range in dbar (metres are taken as dbar), with the matched words removed"""
+    patterns = [
+        (r"\b(?:between|from)\s+" + _NUMBER + r"(?:" + _DEPTH_UNIT + r")?\s+(?:and|to|-)\s+" + _NUMBER + _DEPTH_UNIT,
+         lambda a, b: (min(a, b), max(a, b))),
+        (r"\b(?:below|deeper than|under|beneath)\s+" + _NUMBER + _DEPTH_UNIT, lambda a: (a, None)),
+        (r"\b(?:above|shallower than|upper|top|first|up to|down to|within)\s+" + _NUMBER + _DEPTH_UNIT,
+         lambda a: (0.0, a)),
+        (r"\b(?:(?:at\s+)?(?:an?\s+)?depths?\s+of|at|around|near)\s+" + _NUMBER + _DEPTH_UNIT,
+         lambda a: (a * 0.9, a * 1.1)),
+    ]
+    for pattern, bounds in patterns:
+        match = re.search(pattern, text)
+        if match:
+            min_pressure, max_pressure = bounds(*[abs(float(value)) for value in match.groups()])
+            return min_pressure, max_pressure, text[:match.start()] + " " + text[match.end():]
+    if re.search(r"\bsurface\b", text):
+        return 0.0, 10.0, text
+    return None, None, text
+
+
+def _extract_dates(text: str, now: datetime) -> Tuple[Optional[str], Optional[str], str]:
+    """Start and end dates as ISO strings (a date-only end includes that day), with the matched words removed"""
+    match = _RELATIVE.search(text)
+    if match:
+        count, unit = int(match.group(1) or 1), match.group(2)
+        offset = {"day": pd.DateOffset(days=count), "week": pd.DateOffset(weeks=count),
+                  "month": pd.DateOffset(months=count), "year": pd.DateOffset(years=count)}[unit]
+        start = pd.Timestamp(now) - offset
+        return start.date().isoformat(), None, _remove(text, match)
+
+    match = re.search(r"\b(?:from|between)\s+" + _DATE + r"\s+(?:to|and|until|through|-)\s+" + _DATE + r"\b", text)
+    if match:
+        (start, _), (_, end) = _period(match.group(1)), _period(match.group(2))
+        return start, end, _remove(text, match)
+
+    match = re.search(r"\b(since|after|from)\s+" + _DATE + r"\b", text)
+    if match:
+        start, end = _period(match.group(2))
+        return (start if match.group(1) != "after" else _next_day(end)), None, _remove(text, match)
+
+    match = re.search(r"\b(before|until|till|up to)\s+" + _DATE + r"\b", text)
+    if match:
+        start, end = _period(match.group(2))
+        return None, (end if match.group(1) != "before" else _previous_day(start)), _remove(text, match)
+
+    match = re.search(r"\b" + _DATE + r"\b", text)
+    if match:
+        start, end = _period(match.group(1))
+        return start, end, _remove(text, match)
+    return None, None, text
+
+
+def _period(token: str) -> Tuple[str, str]:
+    """First and last day of a year, month or single date"""
+    token = token.strip()
+    if re.fullmatch(r"\d{4}-\d{2}-\d{2}", token):
+        return token, token
+    words = token.replace(".", "").split()
+    year = int(words[-1])
+    if len(words) == 2:
+        month = MONTHS[words[0]]
+        start = pd.Timestamp(year=year, month=month, day=1)
+        return start.date().isoformat(), (start + pd.offsets.MonthEnd(0)).date().isoformat()
+    return f"{year}-01-01", f"{year}-12-31"
+
+
+def _next_day(date: str) -> str:
+    return (pd.Timestamp(date) + pd.Timedelta(days=1)).date().isoformat()
+
+
+def _previous_day(date: str) -> str:
+    return (pd.Timestamp(date) - pd.Timedelta(days=1)).date().isoformat()
+
+
+def _extract_area(text: str):
+    """Bounding box, or centre and radius, from coordinates or a named region"""
+    latitudes, longitudes = [], []
+    for value, hemisphere in _COORDINATE.findall(text):
+        value = float(value)
+        if hemisphere in "ns":
+            latitudes.append(-abs(value) if hemisphere == "s" else value)
+        else:
+            longitudes.append(-abs(value) if hemisphere == "w" else value)
+    for axis, values in (("lat", latitudes), ("lon", longitudes)):
+        match = re.search(r"\b" + axis + r"(?:itude|gitude)?s?\s+(?:between|from)?\s*" + _NUMBER
+                          + r"\s*(?:to|and|-)\s*" + _NUMBER, text)
+        if match:
+            values[:] = [float(match.group(1)), float(match.group(2))]
+
+    if len(latitudes) >= 2 and len(longitudes) >= 2:
+        return (min(latitudes[:2]), longitudes[0], max(latitudes[:2]), longitudes[1]), None, None, None
+    if latitudes and longitudes:
+        radius = re.search(r"\bwithin\s+" + _NUMBER + r"\s*km\b", text)
+        return None, (latitudes[0], longitudes[0]), float(radius.group(1)) if radius else 300.0, None
+    if len(latitudes) >= 2:
+        return (min(latitudes[:2]), -180.0, max(latitudes[:2]), 180.0), None, None, None
+
+    for region, bbox in REGIONS.items():
+        if re.search(r"\b" + region + r"\b", text):
+            return bbox, None, None, region
+    return None, None, None, None
+
+
+def _remove(text: str, match: re.Match) -> str:
+    return text[:match.start()] + " " + text[match.end():]
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, float):
+        return round(value, 4)
+    return value
@@ -1,15 +1,29 @@
-from typing import Dict, Any, List, Optional
-import openai
+from typing import Dict, Any, List, Optional, AsyncIterator
+import asyncio
+import re
 import logging
 from .vector_database import VectorDatabase
+from .semantic_cache import SemanticCache
+from .llm_client import LLMClient
+from .query_planner import QueryPlanner, QueryPlan
+from ..config.settings import settings
 
 logger = logging.getLogger(__name__)
 
 class RAGService:
     """Retrieval-Augmented Generation service for ARGO data queries"""
     
-    def __init__(self):
-        self.vector_db = VectorDatabase()
+    def __init__(
+        self,
+        vector_db: Optional[VectorDatabase] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        llm_client: Optional[LLMClient] = None,
+        query_planner: Optional[QueryPlanner] = None
+    ):
+        self.vector_db = vector_db or VectorDatabase()
+        self.semantic_cache = semantic_cache
+        self.llm_client = llm_client
+        self.query_planner = query_planner or QueryPlanner()
         self.system_prompt = self._get_system_prompt()
     
     def _get_system_prompt(self) -> str:
@@ -42,25 +56,39 @@ class RAGService:
     async def process_query(self, query: str, context_limit: int = 5) -> Dict[str, Any]:
         """Process a natural language query using RAG"""
         try:
-            # Step 1: Retrieve relevant context from vector database
-            context_docs = await self.vector_db.search(query, limit=context_limit)
+            # Step 1: Extract the query's constraints into a parameterised query plan
+            plan = self.query_planner.plan(query)
             
-            # Step 2: Format context for the LLM
-            context_text = self._format_context(context_docs)
+            # Answers to sufficiently similar earlier queries with the same constraints are reused as they are
+            scope = (context_limit, plan.cache_key)
+            cached, vector, generation = await self._cached_answer(query, scope)
+            if cached is not None:
+                return cached
             
-            # Step 3: Generate SQL query if needed
-            sql_query = self._generate_sql_query(query, context_docs)
+            # Step 2: Retrieve relevant context and run the plan concurrently
+            context_docs, query_results = await asyncio.gather(
+                self._retrieve(query, context_limit, plan),
+                self._execute_plan(plan)
+            )
+            suggestions = self._generate_suggestions(query)
+            
+            # Step 3: Format context for the LLM
+            context_text = self._format_context(context_docs, query_results)
             
             # Step 4: Generate response using LLM
             response = await self._generate_response(query, context_text)
             
-            return {
+            result = {
                 "query": query,
                 "response": response,
                 "context_documents": context_docs,
-                "sql_query": sql_query,
-                "suggestions": self._generate_suggestions(query)
+                "sql_query": plan.sql,
+                "query_plan": plan.to_dict(),
+                "query_results": query_results,
+                "suggestions": suggestions
             }
+            self._cache_answer(query, scope, result, vector, generation)
+            return result
             
         except Exception as e:
             logger.error(f"Error processing RAG query: {str(e)}")
@@ -70,96 +98,219 @@ class RAGService:
                 "error": str(e)
             }
     
-    def _format_context(self, context_docs: List[Dict[str, Any]]) -> str:
-        """Format retrieved documents as context for the LLM"""
-        if not context_docs:
+    async def stream_query(self, query: str, context_limit: int = 5) -> AsyncIterator[Dict[str, Any]]:
+        """Process a query as a stream of events, so clients see results before the answer is complete
+
+        Yields ``context`` (the retrieved documents and query results) as soon as
+        they are available, then ``token`` events with incremental answer text,
+        then ``done`` with the query plan and suggestions; failures end the stream
+        with an ``error`` event.
+        """
+        try:
+            plan = self.query_planner.plan(query)
+            scope = (context_limit, plan.cache_key)
+            cached, vector, generation = await self._cached_answer(query, scope)
+            if cached is not None:
+                yield {"event": "context", "data": {key: cached[key] for key in ("query", "context_documents", "query_results")}}
+                yield {"event": "token", "data": {"text": cached["response"]}}
+                yield {"event": "done", "data": {key: cached[key] for key in ("sql_query", "query_plan", "suggestions", "cache")}}
+                return
+            
+            context_docs, query_results = await asyncio.gather(
+                self._retrieve(query, context_limit, plan),
+                self._execute_plan(plan)
+            )
+            suggestions = self._generate_suggestions(query)
+            yield {"event": "context", "data": {"query": query, "context_documents": context_docs, "query_results": query_results}}
+            
+            chunks = []
+            async for chunk in self._stream_response(query, self._format_context(context_docs, query_results)):
+                chunks.append(chunk)
+                yield {"event": "token", "data": {"text": chunk}}
+            
+            result = {
+                "response": "".join(chunks),
+                "context_documents": context_docs,
+                "sql_query": plan.sql,
+                "query_plan": plan.to_dict(),
+                "query_results": query_results,
+                "suggestions": suggestions
+            }
+            self._cache_answer(query, scope, result, vector, generation)
+            yield {"event": "done", "data": {key: result[key] for key in ("sql_query", "query_plan", "suggestions")}}
+        except Exception as e:
+            logger.error(f"Error streaming RAG query: {str(e)}")
+            yield {"event": "error", "data": {"error": str(e)}}
+    
+    async def _retrieve(self, query: str, context_limit: int, plan: QueryPlan) -> List[Dict[str, Any]]:
+        """Documents most similar to the query, within the plan's constraints when any match"""
+        if not plan.filters.is_empty:
+            context_docs = await self.vector_db.search(query, limit=context_limit, filters=plan.filters)
+            if context_docs:
+                return context_docs
+        return await self.vector_db.search(query, limit=context_limit)
+    
+    async def _execute_plan(self, plan: QueryPlan) -> Optional[Dict[str, Any]]:
+        """Rows behind the answer, when profiles are stored in the database and the plan is selective"""
+        if not settings.persist_profiles or not plan.is_selective:
+            return None
+        try:
+            return await asyncio.to_thread(self.query_planner.execute, plan)
+        except Exception as e:
+            logger.warning(f"Could not execute query plan {plan.template}: {str(e)}")
+            return None
+    
+    async def _cached_answer(self, query: str, scope):
+        """Cached answer to a similar query (or None), the query embedding and the cache generation"""
+        if self.semantic_cache is None:
+            return None, None, None
+        generation = self.semantic_cache.generation
+        entry, vector = await asyncio.to_thread(self.semantic_cache.lookup, query, scope)
+        if entry is None:
+            return None, vector, generation
+        return {
+            "query": query,
+            **entry["result"],
+            "cache": {"query": entry["query"], "similarity": entry["similarity"]}
+        }, vector, generation
+    
+    def _cache_answer(self, query: str, scope, result: Dict[str, Any], vector, generation: Optional[int]):
+        if self.semantic_cache is None:
+            return
+        cached = {
+            key: result[key]
+            for key in ("response", "context_documents", "sql_query", "query_plan", "query_results", "suggestions")
+        }
+        self.semantic_cache.store(query, scope, cached, vector=vector, generation=generation)
+    
+    def _format_context(self, context_docs: List[Dict[str, Any]], query_results: Optional[Dict[str, Any]] = None) -> str:
+        """Format retrieved documents (and the query plan's results, if any) as context for the LLM"""
+        if not context_docs and not (query_results and query_results["summary"].get("profiles")):
             return "No relevant data found in the database."
         
-        context_parts = ["RELEVANT ARGO DATA:"]
+        context_parts = []
+        if query_results and query_results["summary"].get("profiles"):
+            summary = query_results["summary"]
+            context_parts.append("DATABASE SUMMARY:")
+            context_parts.append(
+                f"   {summary['profiles']} profiles from {summary['floats']} floats, "
+                f"{summary['first_date']} to {summary['last_date']}"
+            )
+            if summary.get("min_pressure") is not None:
+                context_parts.append(f"   Pressure range: {summary['min_pressure']:.1f} to {summary['max_pressure']:.1f} dbar")
+            for key, value in summary.items():
+                if key.endswith("_mean") and value is not None:
+                    param = key[:-len("_mean")]
+                    context_parts.append(
+                        f"   {param.upper()}: mean {value:.2f}, range {summary[f'{param}_min']:.2f} to "
+                        f"{summary[f'{param}_max']:.2f} ({summary[f'{param}_count']} measurements)"
+                    )
+            context_parts.append("")
+        
+        context_parts.append("RELEVANT ARGO DATA:")
         
+        # Documents are added in relevance order while they fit in the token budget
+        budget = settings.rag_context_token_budget - _estimate_tokens("\n".join(context_parts))
         for i, doc in enumerate(context_docs, 1):
-            context_parts.append(f"\n{i}. Float Data:")
-            
-            if 'float_id' in doc:
-                context_parts.append(f"   Float ID: {doc['float_id']}")
-            
-            if 'latitude' in doc and 'longitude' in doc:
-                context_parts.append(f"   Location: {doc['latitude']:.2f}°N, {doc['longitude']:.2f}°E")
-            
-            if 'date' in doc:
-                context_parts.append(f"   Date: {doc['date']}")
-            
-            if 'measurements' in doc:
-                params = list(doc['measurements'].keys())
-                context_parts.append(f"   Available parameters: {', '.join(params)}")
-                
-                # Add sample values for key parameters
-                for param in ['TEMP', 'PSAL', 'DOXY']:
-                    if param in doc['measurements']:
-                        values = doc['measurements'][param].get('values', [])
-                        if values:
-                            context_parts.append(f"   {param}: {values[0]:.2f} (surface) to {values[-1]:.2f} (deep)")
-            
-            if 'similarity_score' in doc:
-                context_parts.append(f"   Relevance: {doc['similarity_score']:.2f}")
+            block = self._format_document(i, doc)
+            cost = _estimate_tokens(block)
+            if cost > budget:
+                context_parts.append(f"\n({len(context_docs) - i + 1} less relevant documents omitted)")
+                break
+            context_parts.append(block)
+            budget -= cost
         
         return "\n".join(context_parts)
     
-    def _generate_sql_query(self, query: str, context_docs: List[Dict[str, Any]]) -> Optional[str]:
-        """Generate SQL query based on natural language query"""
-        # Simple heuristics for common query patterns
-        query_lower = query.lower()
+    def _format_document(self, position: int, doc: Dict[str, Any]) -> str:
+        """One retrieved document, described by its ingest-time summary rather than its measurements"""
+        parts = [f"\n{position}. Float Data:"]
         
-        # Basic templates for common queries
-        if "near" in query_lower and "latitude" in query_lower:
-            return "SELECT * FROM argo_profiles WHERE latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?"
+        if 'float_id' in doc:
+            parts.append(f"   Float ID: {doc['float_id']}")
         
-        elif "salinity" in query_lower:
-            return "SELECT * FROM argo_profiles WHERE measurements ? 'PSAL'"
+        if doc.get('latitude') is not None and doc.get('longitude') is not None:
+            parts.append(f"   Location: {doc['latitude']:.2f}°N, {doc['longitude']:.2f}°E")
         
-        elif "temperature" in query_lower:
-            return "SELECT * FROM argo_profiles WHERE measurements ? 'TEMP'"
+        if 'date' in doc:
+            parts.append(f"   Date: {doc['date']}")
         
-        elif "oxygen" in query_lower or "doxy" in query_lower:
-            return "SELECT * FROM argo_profiles WHERE measurements ? 'DOXY'"
+        summary = doc.get('summary')
+        if summary is not None:
+            if summary['max_pressure'] is not None:
+                parts.append(
+                    f"   Depth coverage: {summary['min_pressure']:.1f} to {summary['max_pressure']:.1f} dbar "
+                    f"({summary['n_levels']} levels)"
+                )
+            if summary['mixed_layer_depth'] is not None:
+                parts.append(f"   Mixed-layer depth: {summary['mixed_layer_depth']:.1f} dbar")
+            for param, stats in summary['parameters'].items():
+                parts.append(
+                    f"   {param}: {stats['surface']:.2f} (surface) to {stats['bottom']:.2f} (bottom), "
+                    f"range {stats['min']:.2f} to {stats['max']:.2f}"
+                )
+        elif doc.get('parameters'):
+            parts.append(f"   Available parameters: {', '.join(doc['parameters'])}")
         
-        # Default query
-        return "SELECT * FROM argo_profiles ORDER BY date DESC LIMIT 100"
+        if 'similarity_score' in doc:
+            parts.append(f"   Relevance: {doc['similarity_score']:.2f}")
+        
+        return "\n".join(parts)
     
     async def _generate_response(self, query: str, context: str) -> str:
-        """Generate response using OpenAI GPT"""
-        try:
-            # For now, return a structured response based on the query
-            # In production, this would call OpenAI API
-            
-            response_parts = []
-            
-            if "salinity" in query.lower():
-                response_parts.append("Based on the ARGO float data, here's what I found about salinity:")
-                
-            elif "temperature" in query.lower():
-                response_parts.append("Based on the ARGO float data, here's what I found about temperature:")
-                
-            elif "oxygen" in query.lower() or "doxy" in query.lower():
-                response_parts.append("Based on the ARGO float data, here's what I found about dissolved oxygen:")
-                
-            else:
-                response_parts.append("Based on the available ARGO float data:")
+        """Generate response using the configured LLM (or the built-in template without one)"""
+        if self.llm_client is not None:
+            result = await self.llm_client.complete(
+                self._build_messages(query, context),
+                system=self.system_prompt,
+                max_tokens=settings.llm_max_tokens
+            )
+            return result.text
+        return "".join([chunk async for chunk in self._stream_response(query, context)])
+    
+    def _build_messages(self, query: str, context: str) -> List[Dict[str, str]]:
+        return [{"role": "user", "content": f"{context}\n\nQUESTION: {query}"}]
+    
+    async def _stream_response(self, query: str, context: str) -> AsyncIterator[str]:
+        """Generate the response incrementally, one chunk at a time"""
+        if self.llm_client is not None:
+            async for chunk in self.llm_client.stream(
+                self._build_messages(query, context),
+                system=self.system_prompt,
+                max_tokens=settings.llm_max_tokens
+            ):
+                yield chunk
+            return
+        
+        # Without an LLM, stream a structured response based on the query
+        
+        response_parts = []
+        
+        if "salinity" in query.lower():
+            response_parts.append("Based on the ARGO float data, here's what I found about salinity:")
             
-            # Add context summary
-            if "No relevant data found" not in context:
-                response_parts.append("\n- Multiple float profiles were found matching your query")
-                response_parts.append("- Data includes measurements from various locations and time periods")
-                response_parts.append("- You can visualize this data using the dashboard charts")
-            else:
-                response_parts.append("\n- No specific data found matching your exact criteria")
-                response_parts.append("- Try broadening your search parameters or check different time periods")
+        elif "temperature" in query.lower():
+            response_parts.append("Based on the ARGO float data, here's what I found about temperature:")
             
-            return "\n".join(response_parts)
+        elif "oxygen" in query.lower() or "doxy" in query.lower():
+            response_parts.append("Based on the ARGO float data, here's what I found about dissolved oxygen:")
             
-        except Exception as e:
-            logger.error(f"Error generating response: {str(e)}")
-            return "I apologize, but I couldn't generate a proper response to your query. Please try again."
+        else:
+            response_parts.append("Based on the available ARGO float data:")
+        
+        # Add context summary
+        if "No relevant data found" not in context:
+            response_parts.append("\n- Multiple float profiles were found matching your query")
+            response_parts.append("- Data includes measurements from various locations and time periods")
+            response_parts.append("- You can visualize this data using the dashboard charts")
+        else:
+            response_parts.append("\n- No specific data found matching your exact criteria")
+            response_parts.append("- Try broadening your search parameters or check different time periods")
+        
+        for token in re.findall(r"\s*\S+", "\n".join(response_parts)):
+            yield token
+            # Hand control back to the event loop between tokens, as a network stream would
+            await asyncio.sleep(0)
     
     def _generate_suggestions(self, query: str) -> List[str]:
         """Generate follow-up suggestions based on the query"""
@@ -194,4 +345,9 @@ class RAGService:
                 "Download data as NetCDF"
             ])
         
-        return suggestions[:3]  # Return top 3 suggestions
\ No newline at end of file
+        return suggestions[:3]  # Return top 3 suggestions
+
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token count of ``text``, at about four characters per token"""
+    return (len(text) + 3) // 4
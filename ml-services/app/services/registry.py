@@ -0,0 +1,162 @@
+from sentence_transformers import SentenceTransformer
+from typing import Dict, Any, Optional
+import threading
+import logging
+from ..config.settings import settings
+from ..config.database import redis_client
+from .vector_database import VectorDatabase
+from .embedding_cache import EmbeddingCache
+from .rag_service import RAGService
+from .semantic_cache import SemanticCache
+from .query_planner import QueryPlanner
+from .llm_client import LLMClient, PROVIDERS
+from .chat_service import ChatService
+from .conversation_store import ConversationStore, MemoryConversationStore, RedisConversationStore
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceRegistry:
+    """Process-wide owner of the shared ML services
+
+    Embedding models and the vector index are expensive to load and must be
+    shared so that documents added through one service are visible to all
+    others. Services are created lazily on first use; ``warm_up`` loads the
+    heavy parts ahead of time so ``/health`` can report real readiness.
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+        self.model_name = model_name
+        self._lock = threading.RLock()
+        self._models: Dict[str, SentenceTransformer] = {}
+        self._vector_db: Optional[VectorDatabase] = None
+        self._rag_service: Optional[RAGService] = None
+        self._chat_service: Optional[ChatService] = None
+        self._warm_up_state = "pending"
+        self._warm_up_error: Optional[str] = None
+
+    def get_embedding_model(self, model_name: Optional[str] = None) -> SentenceTransformer:
+        """Get the shared embedding model, loading it on first use"""
+        model_name = model_name or self.model_name
+        with self._lock:
+            if model_name not in self._models:
+                logger.info(f"Loading embedding model {model_name}")
+                self._models[model_name] = SentenceTransformer(model_name)
+            return self._models[model_name]
+
+    def create_embedding_cache(self) -> EmbeddingCache:
+        """Embedding cache, backed by Redis when EMBEDDING_CACHE_REDIS is enabled"""
+        return EmbeddingCache(
+            self.model_name,
+            max_bytes=settings.embedding_cache_max_mb * 1024 * 1024,
+            redis_client=redis_client if settings.embedding_cache_redis else None,
+            redis_ttl=settings.embedding_cache_redis_ttl
+        )
+
+    def create_conversation_store(self) -> ConversationStore:
+        """Conversation store, shared through Redis when CONVERSATION_STORE is redis"""
+        if settings.conversation_store == "redis":
+            return RedisConversationStore(
+                redis_client,
+                max_messages=settings.conversation_max_messages,
+                ttl=settings.conversation_ttl
+            )
+        if settings.conversation_store != "memory":
+            raise ValueError(f"Unknown conversation store: {settings.conversation_store}")
+        return MemoryConversationStore(
+            max_conversations=settings.conversation_max_count,
+            max_messages=settings.conversation_max_messages,
+            ttl=settings.conversation_ttl
+        )
+
+    def create_llm_client(self) -> Optional[LLMClient]:
+        """LLM client for LLM_PROVIDER, or None to answer from the built-in templates"""
+        if settings.llm_provider == "none":
+            return None
+        if settings.llm_provider not in PROVIDERS:
+            raise ValueError(f"Unknown LLM provider: {settings.llm_provider}")
+        api_key = settings.openai_api_key if settings.llm_provider == "openai" else settings.anthropic_api_key
+        provider_args = {"base_url": settings.llm_base_url or None}
+        if settings.llm_model:
+            provider_args["model"] = settings.llm_model
+        return LLMClient(
+            PROVIDERS[settings.llm_provider](api_key, **provider_args),
+            max_concurrency=settings.llm_max_concurrency,
+            timeout=settings.llm_timeout,
+            max_retries=settings.llm_max_retries,
+            hedge_after=settings.llm_hedge_after
+        )
+
+    def get_vector_db(self) -> VectorDatabase:
+        """Get the shared vector database"""
+        with self._lock:
+            if self._vector_db is None:
+                self._vector_db = VectorDatabase(
+                    self.model_name,
+                    model_loader=self.get_embedding_model,
+                    embedding_cache=self.create_embedding_cache()
+                )
+            return self._vector_db
+
+    def get_rag_service(self) -> RAGService:
+        """Get the shared RAG service"""
+        with self._lock:
+            if self._rag_service is None:
+                vector_db = self.get_vector_db()
+                semantic_cache = None
+                if settings.semantic_cache_enabled:
+                    semantic_cache = SemanticCache(
+                        vector_db.encode,
+                        threshold=settings.semantic_cache_threshold,
+                        max_entries=settings.semantic_cache_size,
+                        ttl=settings.semantic_cache_ttl
+                    )
+                    vector_db.add_listener(semantic_cache.invalidate)
+                self._rag_service = RAGService(
+                    vector_db=vector_db,
+                    semantic_cache=semantic_cache,
+                    llm_client=self.create_llm_client(),
+                    query_planner=QueryPlanner()
+                )
+            return self._rag_service
+
+    def get_chat_service(self) -> ChatService:
+        """Get the shared chat service"""
+        with self._lock:
+            if self._chat_service is None:
+                self._chat_service = ChatService(
+                    rag_service=self.get_rag_service(),
+                    store=self.create_conversation_store()
+                )
+            return self._chat_service
+
+    def warm_up(self):
+        """Load the embedding model and vector index ahead of the first request"""
+        self._warm_up_state = "loading"
+        try:
+            vector_db = self.get_vector_db()
+            vector_db.model.encode(["warm up"], normalize_embeddings=True)
+            self._warm_up_state = "ready"
+            logger.info("ML services warmed up")
+        except Exception as e:
+            self._warm_up_state = "failed"
+            self._warm_up_error = str(e)
+            logger.error(f"Error warming up ML services: {str(e)}")
+
+    @property
+    def ready(self) -> bool:
+        return self._warm_up_state == "ready"
+
+    def readiness(self) -> Dict[str, Any]:
+        """Readiness of the shared services"""
+        status = {
+            "state": self._warm_up_state,
+            "ml_models": "loaded" if self._models else "not_loaded",
+            "vector_db": self._vector_db.get_stats() if self._vector_db else "not_initialized"
+        }
+        if self._warm_up_error:
+            status["error"] = self._warm_up_error
+        return status
+
+
+registry = ServiceRegistry()
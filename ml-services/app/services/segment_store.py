@@ -0,0 +1,186 @@
+import numpy as np
+from typing import Dict, Any, List, Optional, Callable, IO
+import threading
+import pickle
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+
+def atomic_write(path: str, writer: Callable[[IO[bytes]], None]):
+    """Write a file through a temporary name and rename it into place"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        writer(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SegmentStore:
+    """Append-only store of immutable segments listed in a JSON manifest
+
+    Each append writes a new segment whose parts are NumPy arrays (saved as
+    ``.npy`` so they can be memory-mapped) or arbitrary picklable objects.
+    Segment files and the manifest are written atomically via rename, so a
+    crash mid-write leaves the previous manifest and its segments intact.
+    Contiguous small segments can be merged by ``compact`` without changing
+    the order of rows.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self._lock = threading.RLock()
+        self._compaction_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        return {"version": 1, "next_segment": 0, "segments": []}
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        atomic_write(self.manifest_path, lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+        self.manifest = manifest
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_path)
+
+    @property
+    def segments(self) -> List[Dict[str, Any]]:
+        return list(self.manifest["segments"])
+
+    @property
+    def total_rows(self) -> int:
+        return sum(segment["rows"] for segment in self.manifest["segments"])
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def append(self, parts: Dict[str, Any], rows: int) -> Dict[str, Any]:
+        """Write a new segment holding ``rows`` rows and record it in the manifest"""
+        with self._lock:
+            segment = self._write_segment(self.manifest["next_segment"], parts, rows)
+            manifest = dict(self.manifest)
+            manifest["next_segment"] += 1
+            manifest["segments"] = self.manifest["segments"] + [segment]
+            self._write_manifest(manifest)
+            return segment
+
+    def _write_segment(self, segment_id: int, parts: Dict[str, Any], rows: int) -> Dict[str, Any]:
+        name = f"seg-{segment_id:06d}"
+        files = {}
+        for part, value in parts.items():
+            if isinstance(value, np.ndarray):
+                filename = f"{name}.{part}.npy"
+                atomic_write(self.path(filename), lambda f: np.save(f, value, allow_pickle=False))
+            else:
+                filename = f"{name}.{part}.pkl"
+                atomic_write(self.path(filename), lambda f: pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL))
+            files[part] = filename
+        return {"name": name, "rows": rows, "files": files}
+
+    def load_part(self, segment: Dict[str, Any], part: str, mmap: bool = True) -> Any:
+        """Load one part of a segment; arrays are memory-mapped read-only by default"""
+        filename = segment["files"][part]
+        if filename.endswith(".npy"):
+            return np.load(self.path(filename), mmap_mode='r' if mmap else None)
+        with open(self.path(filename), 'rb') as f:
+            return pickle.load(f)
+
+    def set_manifest_value(self, key: str, value: Any):
+        """Atomically record an extra value in the manifest"""
+        with self._lock:
+            manifest = dict(self.manifest)
+            manifest[key] = value
+            self._write_manifest(manifest)
+
+    def compact(
+        self,
+        target_rows: int,
+        merge: Optional[Dict[str, Callable[[List[Any]], Any]]] = None
+    ) -> int:
+        """Merge runs of contiguous segments into segments of up to ``target_rows`` rows
+
+        Parts are merged with the matching function in ``merge``; by default
+        arrays are concatenated and other parts are treated as lists. Returns
+        the number of segments removed.
+        """
+        with self._compaction_lock:
+            return self._compact(target_rows, merge or {})
+
+    def _compact(self, target_rows: int, merge: Dict[str, Callable[[List[Any]], Any]]) -> int:
+        with self._lock:
+            runs = self._plan_compaction(self.segments, target_rows)
+        if not runs:
+            return 0
+
+        # Merged segments are written outside the lock; appends only ever add segments at the end
+        replacements = []
+        for run in runs:
+            with self._lock:
+                segment_id = self.manifest["next_segment"]
+                self.manifest["next_segment"] += 1
+            parts = {}
+            for part in run[0]["files"]:
+                values = [self.load_part(segment, part) for segment in run]
+                if part in merge:
+                    parts[part] = merge[part](values)
+                elif isinstance(values[0], np.ndarray):
+                    parts[part] = np.concatenate(values)
+                else:
+                    parts[part] = _concat_lists(values)
+            merged = self._write_segment(segment_id, parts, sum(segment["rows"] for segment in run))
+            replacements.append((run, merged))
+
+        with self._lock:
+            segments = self.segments
+            for run, merged in replacements:
+                start = next(i for i, segment in enumerate(segments) if segment["name"] == run[0]["name"])
+                segments[start:start + len(run)] = [merged]
+            manifest = dict(self.manifest)
+            manifest["segments"] = segments
+            self._write_manifest(manifest)
+
+        removed = 0
+        for run, _ in replacements:
+            removed += len(run) - 1
+            for segment in run:
+                for filename in segment["files"].values():
+                    try:
+                        os.unlink(self.path(filename))
+                    except FileNotFoundError:
+                        pass
+        logger.info(f"Compacted {removed + len(replacements)} segments into {len(replacements)}")
+        return removed
+
+    @staticmethod
+    def _plan_compaction(segments: List[Dict[str, Any]], target_rows: int) -> List[List[Dict[str, Any]]]:
+        runs, current, current_rows = [], [], 0
+        for segment in segments:
+            if current and (current_rows + segment["rows"] > target_rows or _layout(segment) != _layout(current[0])):
+                if len(current) > 1:
+                    runs.append(current)
+                current, current_rows = [], 0
+            current.append(segment)
+            current_rows += segment["rows"]
+        if len(current) > 1:
+            runs.append(current)
+        return runs
+
+
+def _layout(segment: Dict[str, Any]) -> Dict[str, str]:
+    """Part names and file types of a segment; only segments with equal layouts are merged"""
+    return {part: os.path.splitext(filename)[1] for part, filename in segment["files"].items()}
+
+
+def _concat_lists(values: List[List[Any]]) -> List[Any]:
+    return [item for value in values for item in value]
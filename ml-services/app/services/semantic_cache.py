@@ -0,0 +1,138 @@
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Callable, Tuple, Hashable
+import numpy as np
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """Cache of RAG answers looked up by query embedding similarity
+
+    Queries are embedded with ``encoder`` (normalized vectors) and compared
+    with every cached query in one matrix product; the closest entry is a hit
+    when its cosine similarity reaches ``threshold``, so rephrasings such as
+    "show salinity in the Arabian Sea" and "salinity Arabian Sea" share one
+    answer. Entries expire after ``ttl`` seconds and the least recently used
+    one is evicted beyond ``max_entries``. Entries only answer lookups with
+    an equal ``scope`` (e.g. the same context size and extracted query
+    constraints, so "salinity in 2023" never answers "salinity in 2024"
+    however similar the embeddings). The whole cache is cleared when
+    documents are added to the index, since any answer may then change.
+    """
+
+    def __init__(
+        self,
+        encoder: Callable[[List[str]], np.ndarray],
+        threshold: float = 0.92,
+        max_entries: int = 1000,
+        ttl: Optional[int] = 3600
+    ):
+        self.encoder = encoder
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._vectors: Optional[np.ndarray] = None
+        self._active = np.zeros(max_entries, dtype=bool)
+        self._scopes = np.zeros(max_entries, dtype=np.int64)
+        self._expires_at = np.full(max_entries, np.inf)
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._hit_similarity = 0.0
+
+    def lookup(self, query: str, scope: Hashable) -> Tuple[Optional[Dict[str, Any]], np.ndarray]:
+        """Cached answer for the closest similar query, if any, and the query's embedding"""
+        vector = self._encode(query)
+        with self._lock:
+            slot, similarity = self._closest(vector, scope)
+            if slot is None:
+                self.misses += 1
+                return None, vector
+            self._lru.move_to_end(slot)
+            self.hits += 1
+            self._hit_similarity += similarity
+            entry = self._entries[slot]
+            return dict(entry, similarity=round(similarity, 4)), vector
+
+    def store(self, query: str, scope: Hashable, result: Dict[str, Any], vector: Optional[np.ndarray] = None,
+              generation: Optional[int] = None):
+        """Cache ``result`` (response, context documents, SQL query, suggestions) for ``query``
+
+        Pass the ``generation`` read before the answer was computed so that an
+        answer built from an index that has since changed is not cached.
+        """
+        vector = self._encode(query) if vector is None else vector
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            free = np.flatnonzero(~self._active)
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot, _ = self._lru.popitem(last=False)
+                self.evictions += 1
+            self._vectors[slot] = vector
+            self._active[slot] = True
+            self._scopes[slot] = hash(scope)
+            self._expires_at[slot] = time.monotonic() + self.ttl if self.ttl else np.inf
+            self._entries[slot] = {"query": query, "scope": scope, "result": result}
+            self._lru[slot] = None
+            self._lru.move_to_end(slot)
+
+    def invalidate(self, *_):
+        """Drop every cached answer"""
+        with self._lock:
+            self.generation += 1
+            if self._entries:
+                self.invalidations += 1
+            self._active[:] = False
+            self._entries.clear()
+            self._lru.clear()
+
+    def _encode(self, query: str) -> np.ndarray:
+        return np.asarray(self.encoder([query]), dtype=np.float32)[0]
+
+    def _closest(self, vector: np.ndarray, scope: Hashable) -> Tuple[Optional[int], float]:
+        if not self._entries:
+            return None, 0.0
+        self._expire()
+        scores = self._vectors @ vector
+        scores[~self._active | (self._scopes != hash(scope))] = -np.inf
+        slot = int(np.argmax(scores))
+        similarity = float(scores[slot])
+        if similarity < self.threshold or self._entries[slot]["scope"] != scope:
+            return None, similarity
+        return slot, similarity
+
+    def _expire(self):
+        for slot in np.flatnonzero(self._active & (self._expires_at <= time.monotonic())).tolist():
+            self._active[slot] = False
+            del self._entries[slot]
+            del self._lru[slot]
+            self.expirations += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "avg_hit_similarity": round(self._hit_similarity / self.hits, 4) if self.hits else None,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None
+        }
@@ -0,0 +1,159 @@
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import threading
+from .netcdf_processor import SUPPORTED_PARAMETERS
+from ..utils.geo import haversine_km, radius_bbox, in_bbox, normalize_lon
+
+
+@dataclass
+class SearchFilters:
+    """Structured spatial, temporal and parameter constraints for a search
+
+    The spatial constraint is either a bounding box or a centre with a
+    radius, never both or a centre or radius alone. ``parameters`` must all be supported parameter names; a profile
+    matches when it measures every one of them.
+    """
+
+    bbox: Optional[Tuple[float, float, float, float]] = None  # min_lat, min_lon, max_lat, max_lon
+    center: Optional[Tuple[float, float]] = None  # lat, lon
+    radius_km: Optional[float] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    parameters: List[str] = field(default_factory=list)
+
+    def __post_init__(self):
+        if bool(self.center) != bool(self.radius_km):
+            raise ValueError("A centre and a radius must be given together")
+        if self.bbox and self.center:
+            raise ValueError("Give either a bounding box or a centre and radius, not both")
+        unknown = [param for param in self.parameters if param not in SUPPORTED_PARAMETERS]
+        if unknown:
+            raise ValueError(f"Unknown parameters: {', '.join(unknown)}; supported are {', '.join(SUPPORTED_PARAMETERS)}")
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.bbox or (self.center and self.radius_km) or self.start_date or self.end_date or self.parameters)
+
+    @property
+    def spatial_bbox(self) -> Optional[Tuple[float, float, float, float]]:
+        """Bounding box covering the spatial constraints, if any"""
+        if self.center and self.radius_km:
+            return radius_bbox(self.center[0], self.center[1], self.radius_km)
+        return self.bbox
+
+    def date_range(self) -> Tuple[Optional[np.datetime64], Optional[np.datetime64]]:
+        """Start and end as datetime64[s]; a date-only end includes the whole day"""
+        start = _to_datetime64(self.start_date)
+        end = _to_datetime64(self.end_date)
+        if end is not None and len(str(self.end_date)) <= 10:
+            end = end + np.timedelta64(86399, 's')
+        return start, end
+
+
+class SpatioTemporalIndex:
+    """Grid-bucketed positions and time-sorted rows for selecting candidate IDs
+
+    Rows are bucketed into ``cell_size`` degree cells and kept sorted by cell
+    ID, so the cells of a bounding box map to one contiguous slice per
+    latitude band; dates are kept sorted for range lookups. Rows appended
+    since the last build are scanned directly until they justify a rebuild.
+    """
+
+    def __init__(self, cell_size: float = 1.0, rebuild_fraction: float = 0.1):
+        self.cell_size = cell_size
+        self.n_cols = int(np.ceil(360 / cell_size))
+        self.rebuild_fraction = rebuild_fraction
+        self._lock = threading.Lock()
+        self._latitude = np.zeros(0)
+        self._longitude = np.zeros(0)
+        self._dates = np.zeros(0, dtype="datetime64[s]")
+        self._indexed = 0
+        self._cell_order = np.zeros(0, dtype=np.int64)
+        self._sorted_cells = np.zeros(0, dtype=np.int64)
+        self._date_order = np.zeros(0, dtype=np.int64)
+        self._sorted_dates = np.zeros(0, dtype="datetime64[s]")
+
+    def __len__(self) -> int:
+        return len(self._latitude)
+
+    def update(self, latitude: np.ndarray, longitude: np.ndarray, dates: np.ndarray):
+        """Replace the indexed columns; rows beyond the previous length are treated as appended"""
+        with self._lock:
+            if len(latitude) < self._indexed:
+                self._indexed = 0
+            self._latitude = np.asarray(latitude, dtype=np.float64)
+            self._longitude = normalize_lon(longitude)
+            self._dates = np.asarray(dates, dtype="datetime64[s]")
+            if len(self) - self._indexed > self.rebuild_fraction * max(self._indexed, 1):
+                self._build()
+
+    def _build(self):
+        cells = self._cells(self._latitude, self._longitude)
+        self._cell_order = np.argsort(cells, kind="stable")
+        self._sorted_cells = cells[self._cell_order]
+        self._date_order = np.argsort(self._dates, kind="stable")
+        self._sorted_dates = self._dates[self._date_order]
+        self._indexed = len(self)
+
+    def _cells(self, latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+        rows = np.floor((np.nan_to_num(latitude, nan=-91) + 90) / self.cell_size).astype(np.int64)
+        cols = np.floor((np.nan_to_num(longitude, nan=0) + 180) / self.cell_size).astype(np.int64)
+        return rows * self.n_cols + np.clip(cols, 0, self.n_cols - 1)
+
+    def candidates(self, filters: SearchFilters, parameter_masks: Optional[np.ndarray] = None,
+                   required_mask: int = 0) -> np.ndarray:
+        """Sorted row IDs satisfying every constraint in ``filters``"""
+        with self._lock:
+            bbox = filters.spatial_bbox
+            start, end = filters.date_range()
+
+            if bbox is not None:
+                rows = self._bbox_rows(bbox)
+            elif start is not None or end is not None:
+                lo = 0 if start is None else np.searchsorted(self._sorted_dates, start, side="left")
+                hi = len(self._sorted_dates) if end is None else np.searchsorted(self._sorted_dates, end, side="right")
+                rows = self._date_order[lo:hi]
+            else:
+                rows = np.arange(self._indexed)
+
+            # Rows appended since the last build are checked directly
+            rows = np.concatenate([rows, np.arange(self._indexed, len(self))])
+
+            keep = np.ones(len(rows), dtype=bool)
+            if bbox is not None:
+                keep &= in_bbox(self._latitude[rows], self._longitude[rows], bbox)
+            if filters.center and filters.radius_km:
+                distance = haversine_km(filters.center[0], filters.center[1], self._latitude[rows], self._longitude[rows])
+                keep &= distance <= filters.radius_km
+            if start is not None:
+                keep &= self._dates[rows] >= start
+            if end is not None:
+                keep &= self._dates[rows] <= end
+            if required_mask and parameter_masks is not None:
+                keep &= (parameter_masks[rows] & required_mask) == required_mask
+
+            return np.sort(rows[keep])
+
+    def _bbox_rows(self, bbox: Tuple[float, float, float, float]) -> np.ndarray:
+        min_lat, min_lon, max_lat, max_lon = bbox
+        first_row = int(np.floor((max(min_lat, -90) + 90) / self.cell_size))
+        last_row = int(np.floor((min(max_lat, 90) + 90) / self.cell_size))
+        col_ranges = [(min_lon, max_lon)] if min_lon <= max_lon else [(min_lon, 180.0), (-180.0, max_lon)]
+
+        slices = []
+        for band in range(first_row, last_row + 1):
+            for lon_lo, lon_hi in col_ranges:
+                first_col = int(np.clip(np.floor((lon_lo + 180) / self.cell_size), 0, self.n_cols - 1))
+                last_col = int(np.clip(np.floor((lon_hi + 180) / self.cell_size), 0, self.n_cols - 1))
+                lo = np.searchsorted(self._sorted_cells, band * self.n_cols + first_col, side="left")
+                hi = np.searchsorted(self._sorted_cells, band * self.n_cols + last_col, side="right")
+                slices.append(self._cell_order[lo:hi])
+        return np.concatenate(slices) if slices else np.zeros(0, dtype=np.int64)
+
+
+def _to_datetime64(value) -> Optional[np.datetime64]:
+    if value is None or value == "":
+        return None
+    return pd.Timestamp(value).to_datetime64().astype("datetime64[s]")
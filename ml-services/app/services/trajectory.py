@@ -0,0 +1,70 @@
+from typing import Dict, Any, Optional
+import numpy as np
+from ..utils.geo import simplify_track, encode_polyline
+
+# Output encodings for trajectories: raw [lon, lat] pairs, a GeoJSON Feature or an encoded polyline
+TRAJECTORY_FORMATS = ("coordinates", "geojson", "polyline")
+
+# Decimal places kept in coordinate output (~1 m)
+COORDINATE_PRECISION = 5
+
+
+def build_trajectory(
+    latitude: np.ndarray,
+    longitude: np.ndarray,
+    dates: Optional[np.ndarray] = None,
+    float_id: Optional[str] = None,
+    tolerance: Optional[float] = None,
+    format: str = "coordinates",
+    include_dates: bool = True
+) -> Dict[str, Any]:
+    """Build a float track from position arrays, optionally simplified and compactly encoded
+
+    Positions without both coordinates are dropped together with their
+    dates, so points and dates stay aligned. ``tolerance`` (degrees) enables
+    Douglas-Peucker simplification.
+    """
+    if format not in TRAJECTORY_FORMATS:
+        raise ValueError(f"Unknown trajectory format: {format}")
+
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    valid = ~np.isnan(latitude) & ~np.isnan(longitude)
+    latitude, longitude = latitude[valid], longitude[valid]
+    if dates is not None:
+        dates = np.asarray(dates, dtype="datetime64[s]")[valid]
+
+    kept = simplify_track(latitude, longitude, tolerance) if tolerance else np.arange(len(latitude))
+    latitude = np.round(latitude[kept], COORDINATE_PRECISION)
+    longitude = np.round(longitude[kept], COORDINATE_PRECISION)
+
+    trajectory = {
+        "float_id": float_id,
+        "format": format,
+        "n_points": int(valid.sum()),
+        "n_simplified": len(kept)
+    }
+    if format == "polyline":
+        trajectory["polyline"] = encode_polyline(latitude, longitude, precision=COORDINATE_PRECISION)
+        trajectory["precision"] = COORDINATE_PRECISION
+    else:
+        coordinates = np.column_stack([longitude, latitude]).tolist()
+        if format == "geojson":
+            trajectory["geojson"] = {
+                "type": "Feature",
+                "geometry": {"type": "LineString", "coordinates": coordinates},
+                "properties": {"float_id": float_id}
+            }
+        else:
+            trajectory["coordinates"] = coordinates
+
+    if include_dates:
+        trajectory["dates"] = _date_strings(dates[kept]) if dates is not None else []
+    return trajectory
+
+
+def _date_strings(dates: np.ndarray) -> list:
+    """ISO strings with None for missing dates"""
+    strings = np.datetime_as_string(dates, unit="s").astype(object)
+    strings[np.isnat(dates)] = None
+    return strings.tolist()
@@ -1,80 +1,253 @@
 import faiss
 import numpy as np
 from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
+import threading
 import pickle
 import os
 import logging
+from .query_batcher import QueryBatcher
+from .embedding_cache import EmbeddingCache
+from .index_factory import resolve_index_type, create_index, configure_search, min_training_size
+from .segment_store import SegmentStore, atomic_write
+from .metadata_store import MetadataStore, encode_documents, encode_parameters, merge_payload_offsets
+from .spatial_index import SpatioTemporalIndex, SearchFilters
+from ..config.settings import settings
 
 logger = logging.getLogger(__name__)
 
 class VectorDatabase:
     """Vector database service for semantic search of ARGO data"""
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        model_loader: Optional[Callable[[str], SentenceTransformer]] = None,
+        embedding_cache: Optional[EmbeddingCache] = None
+    ):
+        self.model_name = model_name
+        self._model = None
+        self._model_loader = model_loader or SentenceTransformer
+        self._model_lock = threading.Lock()
+        self.embedding_cache = embedding_cache or EmbeddingCache(model_name)
         self.index = None
-        self.metadata = []
+        self._index_lock = threading.RLock()
+        # Flat index holding vectors until an index type that needs training is trained
+        self._staging = None
+        self.index_type = resolve_index_type(settings.vector_db_type)
+        self.metadata_store = MetadataStore()
+        self.spatial_index = SpatioTemporalIndex()
         self.dimension = 384  # Default for all-MiniLM-L6-v2
+        # Single-file index from earlier versions, migrated into the segment store on load
         self.index_path = "vector_index.faiss"
         self.metadata_path = "vector_metadata.pkl"
+        self.store = SegmentStore(settings.vector_store_path)
+        self._compaction_thread = None
+        self._listeners: List[Callable[[int], None]] = []
+        
+        self.batcher = QueryBatcher(
+            self.search_batch,
+            window_ms=settings.search_batch_window_ms,
+            max_batch_size=settings.search_max_batch_size,
+            max_workers=settings.search_workers
+        )
         
         # Load existing index if available
         self._load_index()
     
+    @property
+    def model(self) -> SentenceTransformer:
+        """Embedding model, loaded on first use"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._model_loader(self.model_name)
+        return self._model
+    
+    @property
+    def model_loaded(self) -> bool:
+        return self._model is not None
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Normalized embeddings for ``texts``, served from the embedding cache where possible"""
+        return self.embedding_cache.encode(texts, lambda missing: self.model.encode(missing, normalize_embeddings=True))
+    
+    @property
+    def active_index(self) -> faiss.Index:
+        """Index that currently holds the vectors: the staging index until training happens"""
+        return self._staging if self._staging is not None else self.index
+    
     def _load_index(self):
-        """Load existing FAISS index and metadata"""
+        """Load existing FAISS index and metadata from the segment store"""
         try:
-            if os.path.exists(self.index_path) and os.path.exists(self.metadata_path):
-                self.index = faiss.read_index(self.index_path)
-                with open(self.metadata_path, 'rb') as f:
-                    self.metadata = pickle.load(f)
-                logger.info(f"Loaded vector index with {len(self.metadata)} entries")
+            if not self.store.segments and os.path.exists(self.index_path) and os.path.exists(self.metadata_path):
+                self._migrate_legacy_index()
+            
+            if self.store.segments:
+                self._load_segments()
+                logger.info(f"Loaded vector index with {len(self.metadata_store)} entries")
             else:
                 self._initialize_index()
         except Exception as e:
             logger.error(f"Error loading vector index: {str(e)}")
             self._initialize_index()
     
+    def _load_segments(self):
+        """Restore the index from the latest snapshot plus the segments written after it"""
+        snapshot = self.store.manifest.get("snapshot")
+        if snapshot and os.path.exists(self.store.path(snapshot["file"])):
+            # Read into memory rather than with IO_FLAG_MMAP: the index keeps growing after load,
+            # and mapped IVF lists reject adds while a mapped flat index aborts on them
+            self._set_index(faiss.read_index(self.store.path(snapshot["file"])))
+            indexed_rows = snapshot["rows"]
+        else:
+            self._initialize_index()
+            indexed_rows = 0
+        
+        self.metadata_store.clear()
+        offset = 0
+        for segment in self.store.segments:
+            # Segment vectors are memory-mapped; only rows missing from the snapshot are added
+            vectors = self.store.load_part(segment, "vectors")
+            self.metadata_store.append({**self._load_metadata_parts(segment), "vectors": vectors})
+            end = offset + segment["rows"]
+            if end > indexed_rows:
+                self._add_vectors(np.ascontiguousarray(vectors[max(0, indexed_rows - offset):]))
+            offset = end
+    
+    def _load_metadata_parts(self, segment: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        """Memory-map a segment's metadata, converting segments that pickled full documents"""
+        if segment["files"]["metadata"].endswith(".pkl"):
+            return encode_documents(self.store.load_part(segment, "metadata"))
+        return {part: self.store.load_part(segment, part) for part in segment["files"] if part != "vectors"}
+    
+    def _set_index(self, loaded: faiss.Index):
+        if self.index_type != "flat" and isinstance(loaded, faiss.IndexFlat):
+            # Vectors saved before the configured index was trained
+            self.index = self._create_index()
+            self._staging = loaded
+            self._maybe_train()
+        else:
+            self.index = loaded
+            self._staging = None
+            self._configure_search(self.index)
+    
+    def _migrate_legacy_index(self):
+        """Import a single-file index and pickled metadata as the first segment"""
+        legacy = faiss.read_index(self.index_path)
+        with open(self.metadata_path, 'rb') as f:
+            metadata = pickle.load(f)
+        vectors = legacy.reconstruct_n(0, legacy.ntotal)
+        self.store.append({"vectors": vectors, **encode_documents(metadata)}, len(metadata))
+        logger.info(f"Migrated {len(metadata)} entries from {self.index_path} to {self.store.directory}")
+    
     def _initialize_index(self):
         """Initialize a new FAISS index"""
-        self.index = faiss.IndexFlatIP(self.dimension)  # Inner product for cosine similarity
-        self.metadata = []
-        logger.info("Initialized new vector index")
+        self.index = self._create_index()
+        self._staging = None if self.index.is_trained else faiss.IndexFlatIP(self.dimension)
+        self.metadata_store.clear()
+        logger.info(f"Initialized new {self.index_type} vector index")
+    
+    def _create_index(self) -> faiss.Index:
+        """Create an empty index of the configured type"""
+        index = create_index(
+            self.index_type,
+            self.dimension,
+            nlist=settings.vector_index_nlist,
+            pq_m=settings.vector_index_pq_m,
+            hnsw_m=settings.vector_index_hnsw_m,
+            ef_construction=settings.vector_index_ef_construction
+        )
+        self._configure_search(index)
+        return index
     
-    def _save_index(self):
-        """Save FAISS index and metadata to disk"""
+    def _configure_search(self, index: faiss.Index):
+        configure_search(index, nprobe=settings.vector_index_nprobe, ef_search=settings.vector_index_ef_search)
+    
+    @property
+    def training_size(self) -> int:
+        """Number of staged vectors required before the index is trained"""
+        return max(settings.vector_index_train_size, min_training_size(self.index_type, settings.vector_index_nlist))
+    
+    def _maybe_train(self):
+        if self._staging is not None and self._staging.ntotal >= self.training_size:
+            self.train_index()
+    
+    def train_index(self):
+        """Train the configured index on the staged vectors and move them into it"""
+        with self._index_lock:
+            if self._staging is None:
+                return
+            vectors = self._staging.reconstruct_n(0, self._staging.ntotal)
+            logger.info(f"Training {self.index_type} vector index on {len(vectors)} vectors")
+            self.index.train(vectors)
+            self.index.add(vectors)
+            self._staging = None
+    
+    def _add_vectors(self, embeddings: np.ndarray):
+        with self._index_lock:
+            self.active_index.add(embeddings)
+            self._maybe_train()
+    
+    def _maybe_compact(self):
+        """Start a background compaction once too many segments have accumulated"""
+        if len(self.store.segments) <= settings.vector_max_segments:
+            return
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        self._compaction_thread = threading.Thread(target=self.compact, name="vector-compaction", daemon=True)
+        self._compaction_thread.start()
+    
+    def compact(self):
+        """Merge small segments and snapshot the index so startup skips re-adding vectors"""
         try:
-            faiss.write_index(self.index, self.index_path)
-            with open(self.metadata_path, 'wb') as f:
-                pickle.dump(self.metadata, f)
-            logger.info(f"Saved vector index with {len(self.metadata)} entries")
+            self.store.compact(settings.vector_segment_rows, merge={"payload_offsets": merge_payload_offsets})
+            
+            with self._index_lock:
+                rows = self.active_index.ntotal
+                data = faiss.serialize_index(self.active_index)
+            
+            previous = self.store.manifest.get("snapshot")
+            filename = f"index-{rows:012d}.faiss"
+            atomic_write(self.store.path(filename), lambda f: f.write(data.tobytes()))
+            self.store.set_manifest_value("snapshot", {"file": filename, "rows": rows})
+            if previous and previous["file"] != filename:
+                os.unlink(self.store.path(previous["file"]))
+            
         except Exception as e:
-            logger.error(f"Error saving vector index: {str(e)}")
+            logger.error(f"Error compacting vector index: {str(e)}")
     
-    def add_documents(self, documents: List[Dict[str, Any]]):
-        """Add documents to the vector database"""
+    def add_listener(self, listener: Callable[[int], None]):
+        """Call ``listener`` with the number of documents in every batch added from now on"""
+        self._listeners.append(listener)
+    
+    def add_documents(self, documents: List[Dict[str, Any]]) -> int:
+        """Add documents to the vector database and return how many were added"""
+        if not documents:
+            return 0
+        
         try:
-            texts = []
-            metadata_entries = []
-            
-            for doc in documents:
-                # Create searchable text from document
-                text = self._create_searchable_text(doc)
-                texts.append(text)
-                metadata_entries.append(doc)
+            # Create searchable text from documents
+            texts = [self._create_searchable_text(doc) for doc in documents]
+            parts = encode_documents(documents)
             
             # Generate embeddings
-            embeddings = self.model.encode(texts, normalize_embeddings=True)
+            embeddings = self.encode(texts)
             
-            # Add to FAISS index
-            self.index.add(embeddings.astype('float32'))
-            self.metadata.extend(metadata_entries)
+            embeddings = embeddings.astype('float32')
             
-            # Save to disk
-            self._save_index()
+            # Add to FAISS index and append a segment in the same order
+            with self._index_lock:
+                self._add_vectors(embeddings)
+                self.metadata_store.append({**parts, "vectors": embeddings})
+                self.store.append({"vectors": embeddings, **parts}, len(documents))
+            
+            self._maybe_compact()
+            for listener in self._listeners:
+                listener(len(documents))
             
             logger.info(f"Added {len(documents)} documents to vector database")
+            return len(documents)
             
         except Exception as e:
             logger.error(f"Error adding documents: {str(e)}")
@@ -94,9 +267,10 @@ class VectorDatabase:
         if 'date' in doc:
             text_parts.append(f"Date: {doc['date']}")
         
-        # Add parameter information
-        if 'measurements' in doc:
-            params = list(doc['measurements'].keys())
+        # Add parameter information, from the ingest-time summary when there is one
+        summary = doc.get('summary')
+        if summary is not None or 'measurements' in doc:
+            params = list(summary['parameters'] if summary is not None else doc['measurements'].keys())
             text_parts.append(f"Parameters: {', '.join(params)}")
             
             # Add parameter descriptions
@@ -115,6 +289,9 @@ class VectorDatabase:
                 if param in param_descriptions:
                     text_parts.append(param_descriptions[param])
         
+        if summary is not None and summary['max_pressure'] is not None:
+            text_parts.append(f"Depth: {summary['min_pressure']:.0f} to {summary['max_pressure']:.0f} dbar")
+        
         # Add geographic regions (simple logic)
         if 'latitude' in doc and 'longitude' in doc:
             lat, lon = doc['latitude'], doc['longitude']
@@ -135,37 +312,137 @@ class VectorDatabase:
         
         return " ".join(text_parts)
     
-    async def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Search for similar documents using vector similarity"""
+    async def search(
+        self,
+        query: str,
+        limit: int = 10,
+        filters: Optional[SearchFilters] = None,
+        include_measurements: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Search for similar documents, optionally restricted by spatial/temporal filters"""
         try:
-            if self.index.ntotal == 0:
+            if self.active_index.ntotal == 0:
                 return []
             
-            # Generate query embedding
-            query_embedding = self.model.encode([query], normalize_embeddings=True)
-            
-            # Search in FAISS index
-            scores, indices = self.index.search(query_embedding.astype('float32'), min(limit, self.index.ntotal))
-            
-            # Prepare results
-            results = []
-            for score, idx in zip(scores[0], indices[0]):
-                if idx < len(self.metadata):
-                    result = self.metadata[idx].copy()
-                    result['similarity_score'] = float(score)
-                    results.append(result)
+            if filters is not None and not filters.is_empty:
+                results = await self.batcher.run(self.search_filtered, query, limit, filters)
+            else:
+                # Encoding and search run on the batcher's thread pool, coalesced with concurrent queries
+                results = await self.batcher.submit(query, limit)
             
+            if include_measurements:
+                for result in results:
+                    result['measurements'] = self.get_measurements(result['doc_id'])
             return results
             
         except Exception as e:
             logger.error(f"Error searching vector database: {str(e)}")
             return []
     
+    def search_filtered(self, query: str, limit: int, filters: SearchFilters) -> List[Dict[str, Any]]:
+        """Rank only the documents that satisfy ``filters``
+
+        Small candidate sets are scored exactly against their stored vectors;
+        larger ones restrict the ANN search to the candidate IDs.
+        """
+        candidates = self.filter_candidates(filters)
+        if len(candidates) == 0:
+            return []
+        
+        query_embedding = self.encode([query])
+        k = min(limit, len(candidates))
+        
+        if len(candidates) <= settings.vector_filter_exact_threshold:
+            scores = self.metadata_store.take("vectors", candidates) @ query_embedding[0]
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            scores, indices = scores[top], candidates[top]
+        else:
+            with self._index_lock:
+                index = self.active_index
+                params = self._selector_params(index, faiss.IDSelectorBatch(candidates.astype('int64')))
+                scores, indices = index.search(query_embedding, k, params=params)
+            scores, indices = scores[0], indices[0]
+        
+        results = []
+        for score, idx in zip(scores, indices):
+            if idx >= 0:
+                result = self.metadata_store.get(int(idx))
+                result['similarity_score'] = float(score)
+                results.append(result)
+        return results
+    
+    def filter_candidates(self, filters: SearchFilters) -> np.ndarray:
+        """Row IDs of the documents that satisfy ``filters``"""
+        columns = self.metadata_store.columns
+        if len(self.spatial_index) != len(columns):
+            self.spatial_index.update(columns["latitude"], columns["longitude"], columns["date"])
+        return self.spatial_index.candidates(
+            filters,
+            parameter_masks=columns["parameters"],
+            required_mask=encode_parameters(filters.parameters)
+        )
+    
+    def _selector_params(self, index: faiss.Index, selector: faiss.IDSelector) -> faiss.SearchParameters:
+        """Search parameters restricting ``index`` to the selected IDs, keeping tuned settings"""
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+        downcast = faiss.downcast_index(index)
+        if hasattr(downcast, "hnsw"):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=downcast.hnsw.efSearch)
+        return faiss.SearchParameters(sel=selector)
+    
+    def get_document(self, doc_id: int, include_measurements: bool = True) -> Optional[Dict[str, Any]]:
+        """Get a stored document by ID, decoding its measurements only if asked"""
+        if not 0 <= doc_id < len(self.metadata_store):
+            return None
+        document = self.metadata_store.get(doc_id)
+        if include_measurements:
+            document['measurements'] = self.get_measurements(doc_id)
+        return document
+    
+    def get_measurements(self, doc_id: int) -> Dict[str, Any]:
+        """Get the full measurement arrays of a stored document"""
+        return self.metadata_store.get_measurements(doc_id)
+    
+    def search_batch(self, queries: List[str], limit: int = 10) -> List[List[Dict[str, Any]]]:
+        """Search for several queries with one encode call and one index search"""
+        # Generate query embeddings
+        query_embeddings = self.encode(queries)
+        
+        # Search in FAISS index
+        with self._index_lock:
+            index = self.active_index
+            k = min(limit, index.ntotal)
+            if k == 0:
+                return [[] for _ in queries]
+            scores, indices = index.search(query_embeddings.astype('float32'), k)
+        
+        # Prepare results
+        batch_results = []
+        for query_scores, query_indices in zip(scores, indices):
+            results = []
+            for score, idx in zip(query_scores, query_indices):
+                if 0 <= idx < len(self.metadata_store):
+                    result = self.metadata_store.get(idx)
+                    result['similarity_score'] = float(score)
+                    results.append(result)
+            batch_results.append(results)
+        
+        return batch_results
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get vector database statistics"""
         return {
-            "total_documents": len(self.metadata),
-            "index_size": self.index.ntotal if self.index else 0,
+            "total_documents": len(self.metadata_store),
+            "index_size": self.active_index.ntotal if self.index else 0,
+            "index_type": self.index_type,
+            "index_trained": self._staging is None,
+            "segments": len(self.store.segments),
             "dimension": self.dimension,
-            "model_name": str(self.model)
+            "model_name": self.model_name,
+            "model_loaded": self.model_loaded,
+            "search": self.batcher.get_stats(),
+            "embedding_cache": self.embedding_cache.get_stats()
         }
\ No newline at end of file
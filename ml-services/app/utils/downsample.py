@@ -0,0 +1,46 @@
+import numpy as np
+from typing import Tuple
+
+
+def lttb(x, y, threshold: int) -> np.ndarray:
+    """Indices of the points kept by Largest-Triangle-Three-Buckets downsampling
+
+    Keeps the first and last points and, from each of ``threshold - 2``
+    equal-count buckets in between, the point forming the largest triangle
+    with the previously kept point and the average of the next bucket. ``x``
+    must be sorted; NaN points should be removed beforehand.
+    """
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[stop:next_stop].mean() if next_stop > stop else x[-1]
+        next_y = y[stop:next_stop].mean() if next_stop > stop else y[-1]
+
+        bucket_x, bucket_y = x[start:stop], y[start:stop]
+        areas = np.abs(
+            (x[previous] - next_x) * (bucket_y - y[previous])
+            - (x[previous] - bucket_x) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        kept[bucket + 1] = previous
+    return kept
+
+
+def bin_2d(x, y, bins: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Point counts on a ``bins`` grid spanning the data, for drawing dense scatters as heatmaps
+
+    Returns ``(counts, x_centers, y_centers)`` with ``counts`` shaped ``(len(y_centers), len(x_centers))``.
+    """
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    valid = ~np.isnan(x) & ~np.isnan(y)
+    counts, x_edges, y_edges = np.histogram2d(x[valid], y[valid], bins=bins)
+    return counts.T, (x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2
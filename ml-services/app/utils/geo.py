@@ -0,0 +1,161 @@
+import numpy as np
+from typing import Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in km; arguments broadcast as NumPy arrays"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def radius_bbox(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """Bounding box ``(min_lat, min_lon, max_lat, max_lon)`` enclosing a radius around a point
+
+    The box may cross the antimeridian, in which case ``min_lon > max_lon``.
+    """
+    delta_lat = float(np.degrees(radius_km / EARTH_RADIUS_KM))
+    min_lat, max_lat = lat - delta_lat, lat + delta_lat
+    if min_lat <= -90 or max_lat >= 90:
+        # The circle contains a pole, so every longitude is in range
+        return max(min_lat, -90.0), -180.0, min(max_lat, 90.0), 180.0
+
+    delta_lon = float(np.degrees(np.arcsin(min(1.0, np.sin(radius_km / EARTH_RADIUS_KM) / np.cos(np.radians(lat))))))
+    if delta_lon >= 180:
+        return min_lat, -180.0, max_lat, 180.0
+    return min_lat, float(normalize_lon(lon - delta_lon)), max_lat, float(normalize_lon(lon + delta_lon))
+
+
+def normalize_lon(lon):
+    """Wrap longitudes into [-180, 180)"""
+    return (np.asarray(lon, dtype=np.float64) + 180) % 360 - 180
+
+
+def in_bbox(lat, lon, bbox: Tuple[float, float, float, float]) -> np.ndarray:
+    """Mask of positions inside a bounding box, handling antimeridian crossing"""
+    min_lat, min_lon, max_lat, max_lon = bbox
+    lat, lon = np.asarray(lat), normalize_lon(lon)
+    lat_ok = (lat >= min_lat) & (lat <= max_lat)
+    if min_lon <= max_lon:
+        return lat_ok & (lon >= min_lon) & (lon <= max_lon)
+    return lat_ok & ((lon >= min_lon) | (lon <= max_lon))
+
+
+def ocean_basin(lat, lon) -> np.ndarray:
+    """Coarse ocean basin name for each position
+
+    Boundaries are simple lat/lon rules (Southern Ocean south of 60S, Arctic
+    north of 66N, Atlantic/Indian split at 20E, Indian/Pacific at 147E south
+    of Australia), good enough for partitioning data, not for oceanography.
+    Positions without coordinates get ``"unknown"``.
+    """
+    lat, lon = np.asarray(lat, dtype=np.float64), normalize_lon(lon)
+    atlantic = ((lon >= -70) & (lon < 20)) | ((lon >= -100) & (lon < -70) & (lat > 9))
+    indian = (
+        ((lon >= 20) & (lon < 100) & (lat < 31))
+        | ((lon >= 100) & (lon < 120) & (lat < 0))
+        | ((lon >= 120) & (lon < 147) & (lat < -10))
+    )
+    return np.select(
+        [np.isnan(lat) | np.isnan(lon), lat < -60, lat > 66, atlantic, indian],
+        ["unknown", "southern", "arctic", "atlantic", "indian"],
+        default="pacific"
+    )
+
+
+def simplify_track(lat, lon, tolerance: float) -> np.ndarray:
+    """Indices of the points kept by Douglas-Peucker simplification
+
+    ``tolerance`` is the maximum perpendicular deviation, in degrees, of a
+    dropped point from the simplified line. The first and last points are
+    always kept. Distances within each segment are computed with NumPy, so
+    the cost is one vector operation per kept point.
+    """
+    lat, lon = np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+    n = len(lat)
+    if n <= 2 or tolerance <= 0:
+        return np.arange(n)
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        x, y = lon[first + 1:last], lat[first + 1:last]
+        dx, dy = lon[last] - lon[first], lat[last] - lat[first]
+        length = np.hypot(dx, dy)
+        if length == 0:
+            distances = np.hypot(x - lon[first], y - lat[first])
+        else:
+            distances = np.abs(dy * (x - lon[first]) - dx * (y - lat[first])) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep)
+
+
+def zoom_tolerance(zoom: float, pixels: float = 1.0) -> float:
+    """Simplification tolerance in degrees matching ``pixels`` on a 256px web map tile at ``zoom``"""
+    return pixels * 360.0 / (256 * 2 ** zoom)
+
+
+def encode_polyline(lat, lon, precision: int = 5) -> str:
+    """Encode positions with the Google encoded polyline algorithm"""
+    factor = 10 ** precision
+    points = np.column_stack([
+        np.round(np.asarray(lat, dtype=np.float64) * factor),
+        np.round(np.asarray(lon, dtype=np.float64) * factor)
+    ]).astype(np.int64)
+    deltas = np.diff(points, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    chars = []
+    for value in values.tolist():
+        while value >= 0x20:
+            chars.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chars.append(chr(value + 63))
+    return "".join(chars)
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> np.ndarray:
+    """Decode an encoded polyline into an ``(N, 2)`` array of (lat, lon)"""
+    values, value, shift = [], 0, 0
+    for char in encoded:
+        byte = ord(char) - 63
+        value |= (byte & 0x1f) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value, shift = 0, 0
+    return np.cumsum(np.asarray(values, dtype=np.int64).reshape(-1, 2), axis=0) / 10 ** precision
+
+
+# Latitude limit of the square Web Mercator world used by web map tiles
+MAX_MERCATOR_LAT = 85.0511287798
+
+
+def lonlat_to_tile(lat, lon, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Fractional Web Mercator tile coordinates ``(x, y)`` of positions at ``zoom``"""
+    n = 2 ** zoom
+    lat = np.radians(np.clip(np.asarray(lat, dtype=np.float64), -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    x = (normalize_lon(lon) + 180.0) / 360.0 * n
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * n
+    return np.clip(x, 0, np.nextafter(n, 0)), np.clip(y, 0, np.nextafter(n, 0))
+
+
+def tile_bbox(zoom: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """Bounding box ``(min_lat, min_lon, max_lat, max_lon)`` of a Web Mercator tile"""
+    n = 2 ** zoom
+
+    def tile_lat(tile_y: float) -> float:
+        return float(np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * tile_y / n)))))
+
+    return tile_lat(y + 1), x / n * 360.0 - 180.0, tile_lat(y), (x + 1) / n * 360.0 - 180.0
@@ -0,0 +1,76 @@
+"""Recall vs latency of the approximate vector indexes against the exact flat index
+
+Run from the ml-services directory:
+
+    python -m benchmarks.ann_benchmark --corpus 200000 --queries 1000
+"""
+import argparse
+import time
+import numpy as np
+from app.services.index_factory import create_index, configure_search
+
+
+def synthetic_corpus(n: int, dimension: int, n_clusters: int, seed: int = 0) -> np.ndarray:
+    """Clustered, normalized vectors resembling sentence embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dimension)).astype("float32")
+    vectors = centers[rng.integers(0, n_clusters, n)] + 0.5 * rng.normal(size=(n, dimension)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(np.intersect1d(f, t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def timed_search(index, queries: np.ndarray, k: int):
+    start = time.perf_counter()
+    _, ids = index.search(queries, k)
+    return ids, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--pq-m", type=int, default=48)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.corpus + args.queries, args.dimension, n_clusters=args.nlist * 4)
+    corpus, queries = corpus[:args.corpus], corpus[args.corpus:]
+
+    flat = create_index("flat", args.dimension)
+    flat.add(corpus)
+    truth, flat_ms = timed_search(flat, queries, args.k)
+    print(f"{'index':<10} {'param':<14} {'recall@' + str(args.k):>10} {'ms/query':>10} {'build s':>8}")
+    print(f"{'flat':<10} {'-':<14} {1.0:>10.3f} {flat_ms:>10.3f} {'-':>8}")
+
+    sweeps = {
+        "ivf_flat": ("nprobe", [1, 4, 16, 64]),
+        "ivf_pq": ("nprobe", [1, 4, 16, 64]),
+        "hnsw": ("efSearch", [16, 32, 64, 128, 256]),
+    }
+    for index_type, (param, values) in sweeps.items():
+        start = time.perf_counter()
+        index = create_index(index_type, args.dimension, nlist=args.nlist, pq_m=args.pq_m, hnsw_m=args.hnsw_m)
+        if not index.is_trained:
+            index.train(corpus[:max(40 * args.nlist, 10000)])
+        index.add(corpus)
+        build_s = time.perf_counter() - start
+
+        for value in values:
+            if param == "nprobe":
+                configure_search(index, nprobe=value)
+            else:
+                configure_search(index, ef_search=value)
+            ids, ms = timed_search(index, queries, args.k)
+            print(f"{index_type:<10} {param + '=' + str(value):<14} {recall_at_k(ids, truth):>10.3f} {ms:>10.3f} {build_s:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Latency of /api/floats radius and date queries against the profile catalog
+
+Run from the ml-services directory:
+
+    python -m benchmarks.floats_query_benchmark --profiles 10000 100000 1000000
+"""
+import argparse
+import tempfile
+import time
+import numpy as np
+from app.services.metadata_store import METADATA_DTYPE
+from app.services.profile_catalog import ProfileCatalog
+
+
+def synthetic_records(n: int, seed: int = 0) -> np.ndarray:
+    """Profiles of ~150-cycle floats drifting from random starting points over ten years"""
+    rng = np.random.default_rng(seed)
+    n_floats = max(1, n // 150)
+    float_index = rng.integers(0, n_floats, n)
+    start_lat = rng.uniform(-70, 70, n_floats)
+    start_lon = rng.uniform(-180, 180, n_floats)
+
+    records = np.zeros(n, dtype=METADATA_DTYPE)
+    records["float_id"] = np.char.encode(np.char.mod("%07d", 1900000 + float_index))
+    records["profile_id"] = np.arange(n)
+    records["cycle_number"] = rng.integers(1, 300, n)
+    records["date"] = np.datetime64("2015-01-01", "s") + rng.integers(0, 10 * 365 * 86400, n).astype("timedelta64[s]")
+    records["latitude"] = np.clip(start_lat[float_index] + rng.normal(0, 2, n), -89, 89)
+    records["longitude"] = (start_lon[float_index] + rng.normal(0, 3, n) + 180) % 360 - 180
+    records["parameters"] = 0b111
+    return records
+
+
+def random_query(rng: np.random.Generator):
+    start = np.datetime64("2015-01-01") + int(rng.integers(0, 9 * 365))
+    return {
+        "lat": float(rng.uniform(-60, 60)),
+        "lon": float(rng.uniform(-180, 180)),
+        "radius_km": float(rng.choice([100, 500, 1000])),
+        "start_date": str(start),
+        "end_date": str(start + int(rng.choice([30, 180, 365]))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'profiles':>10} {'load s':>8} {'p50 ms':>8} {'p99 ms':>8} {'floats/query':>13}")
+    for n in args.profiles:
+        with tempfile.TemporaryDirectory() as directory:
+            catalog = ProfileCatalog(directory)
+            catalog.add_records(synthetic_records(n))
+
+            start = time.perf_counter()
+            catalog.records
+            load_s = time.perf_counter() - start
+
+            rng = np.random.default_rng(1)
+            latencies, matches = [], []
+            for _ in range(args.queries):
+                query = random_query(rng)
+                start = time.perf_counter()
+                result = catalog.find_floats(limit=args.limit, **query)
+                latencies.append((time.perf_counter() - start) * 1000)
+                matches.append(result["total"])
+
+            p50, p99 = np.percentile(latencies, [50, 99])
+            print(f"{n:>10} {load_s:>8.2f} {p50:>8.3f} {p99:>8.3f} {np.mean(matches):>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
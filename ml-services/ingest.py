@@ -0,0 +1,131 @@
+"""Bulk ingest a directory tree of Argo NetCDF profile files
+
+    python ingest.py /data/gdac/dac --workers 8
+
+New or changed ``*_prof.nc`` / ``*_Sprof.nc`` files are parsed in parallel
+and written to the database, the vector index, the profile catalog, the
+columnar archive and the dataset statistics; unchanged files are skipped
+using the ingest manifest.
+
+    python ingest.py /data/gdac/dac --verify-stats
+
+recomputes the statistics from every file under the directory and reports
+any difference from the incrementally maintained ones (``--rebuild-stats``
+also replaces them).
+"""
+import argparse
+import atexit
+import logging
+import os
+import tempfile
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.services.bulk_ingest import BulkIngester, IngestManifest, DEFAULT_PATTERNS
+from app.services.dataset_stats import DatasetStatistics
+from app.config.settings import settings
+
+
+def build_sinks(args):
+    """Ingest sinks enabled for this run, keyed by their progress counter"""
+    sinks = {}
+    if not args.no_db:
+        from app.services.profile_loader import ProfileLoader
+        sinks["rows_written"] = ProfileLoader().load_table
+    if not args.no_vectors:
+        from app.services.registry import registry
+        vector_db = registry.get_vector_db()
+        sinks["vectors_indexed"] = lambda table: vector_db.add_documents(table.profiles)
+    if not args.no_catalog:
+        from app.services.profile_catalog import ProfileCatalog
+        sinks["profiles_cataloged"] = ProfileCatalog().add_table
+    if not args.no_archive:
+        from app.services.profile_archive import ProfileArchive
+        sinks["levels_archived"] = ProfileArchive().write_table
+    if not args.no_stats:
+        statistics = DatasetStatistics(settings.dataset_stats_path)
+        # Statistics are saved periodically; write the last changes when the run ends
+        atexit.register(statistics.flush)
+        sinks["profiles_counted"] = statistics.add_table
+    return sinks
+
+
+def check_statistics(args, patterns) -> int:
+    """Rebuild the dataset statistics from the files under ``root`` and compare them with the stored ones"""
+    rebuilt = DatasetStatistics()
+    with tempfile.TemporaryDirectory() as directory:
+        # A fresh manifest, so every file is read regardless of previous ingests
+        manifest = IngestManifest(os.path.join(directory, "manifest.json"))
+        ingester = BulkIngester(
+            {"profiles_counted": rebuilt.add_table},
+            manifest,
+            max_workers=args.workers,
+            batch_size=args.batch_size,
+            report=print_progress
+        )
+        print_progress(ingester.run(args.root, patterns))
+
+    problems = DatasetStatistics(settings.dataset_stats_path).verify(rebuilt)
+    for problem in problems:
+        print(f"mismatch: {problem}")
+    print("statistics match" if not problems else f"{len(problems)} mismatches")
+
+    if args.rebuild_stats:
+        rebuilt.path = settings.dataset_stats_path
+        rebuilt.save()
+        print(f"rebuilt statistics written to {settings.dataset_stats_path}")
+    return 1 if problems and not args.rebuild_stats else 0
+
+
+def print_progress(stats):
+    print(
+        f"[{stats['elapsed_s']:>8.1f}s] files {stats['files_ingested']}/{stats['files_found']} "
+        f"(skipped {stats['files_skipped']}, failed {stats['files_failed']}) | "
+        f"{stats['files_per_s']} files/s | {stats['profiles']} profiles, {stats['profiles_per_s']} profiles/s",
+        flush=True
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root", help="Directory to scan recursively")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Profiles per sink batch")
+    parser.add_argument("--pattern", action="append", help=f"Filename pattern (default: {' '.join(DEFAULT_PATTERNS)})")
+    parser.add_argument("--manifest", default=settings.ingest_manifest_path)
+    parser.add_argument("--force", action="store_true", help="Ignore the manifest and re-ingest every file")
+    parser.add_argument("--no-db", action="store_true")
+    parser.add_argument("--no-vectors", action="store_true")
+    parser.add_argument("--no-catalog", action="store_true")
+    parser.add_argument("--no-archive", action="store_true")
+    parser.add_argument("--no-stats", action="store_true")
+    parser.add_argument("--verify-stats", action="store_true", help="Compare stored statistics with a full rebuild")
+    parser.add_argument("--rebuild-stats", action="store_true", help="Replace stored statistics with a full rebuild")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    patterns = tuple(args.pattern) if args.pattern else DEFAULT_PATTERNS
+
+    if args.verify_stats or args.rebuild_stats:
+        raise SystemExit(check_statistics(args, patterns))
+
+    manifest = IngestManifest(args.manifest)
+    if args.force:
+        manifest.entries = {}
+
+    ingester = BulkIngester(
+        build_sinks(args),
+        manifest,
+        max_workers=args.workers,
+        batch_size=args.batch_size,
+        report=print_progress
+    )
+    stats = ingester.run(args.root, patterns)
+    print_progress(stats)
+    for counter in ingester.sinks:
+        print(f"{counter}: {stats[counter]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,28 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
+from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from dataclasses import asdict
 import uvicorn
+import numpy as np
+import asyncio
+import json
 import os
 from dotenv import load_dotenv
 
 from app.services.netcdf_processor import NetCDFProcessor
-from app.services.vector_database import VectorDatabase
-from app.services.rag_service import RAGService
-from app.services.chat_service import ChatService
-from app.config.database import get_db
+from app.services.job_manager import JobManager
+from app.services.profile_catalog import ProfileCatalog
+from app.services.profile_loader import ProfileLoader
+from app.services.profile_archive import ProfileArchive
+from app.services.map_tiles import MapTileService
+from app.services.dataset_stats import DatasetStatistics
+from app.services.profile_grid import ProfileGridder
+from app.services.plot_service import PlotService
+from app.services.registry import registry
+from app.services.spatial_index import SearchFilters
+from app.services.trajectory import build_trajectory, TRAJECTORY_FORMATS
+from app.utils.geo import zoom_tolerance
+from app.config.database import check_database
 from app.config.settings import settings
 
 # Load environment variables
@@ -31,11 +44,53 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
+# Initialize services (the embedding model and vector index are shared and loaded lazily)
 netcdf_processor = NetCDFProcessor()
-vector_db = VectorDatabase()
-rag_service = RAGService()
-chat_service = ChatService()
+vector_db = registry.get_vector_db()
+rag_service = registry.get_rag_service()
+chat_service = registry.get_chat_service()
+profile_catalog = ProfileCatalog()
+if len(profile_catalog) == 0 and len(vector_db.metadata_store) > 0:
+    # Catalog profiles indexed before the catalog existed
+    profile_catalog.add_records(vector_db.metadata_store.columns)
+map_tiles = MapTileService(profile_catalog)
+dataset_stats = DatasetStatistics(settings.dataset_stats_path)
+profile_archive = ProfileArchive()
+profile_loader = ProfileLoader()
+# Levels of a float come from the archive, or from the database when only that keeps them
+profile_levels_stored = settings.archive_profiles or settings.persist_profiles
+PROFILE_LEVELS_UNAVAILABLE = "Profile levels are not stored; enable ARCHIVE_PROFILES or PERSIST_PROFILES"
+
+def read_float_table(float_id: str, filters: SearchFilters = None):
+    """Profiles of one float with their levels, from whichever store keeps them"""
+    if settings.archive_profiles:
+        return profile_archive.read_table(filters, float_ids=[float_id])
+    return profile_loader.read_table(float_id, filters)
+
+profile_grid = ProfileGridder(read_float_table)
+plot_service = PlotService(read_float_table, profile_grid)
+profile_catalog.add_listener(lambda records: profile_grid.invalidate(np.char.decode(np.unique(records["float_id"])).tolist()))
+profile_catalog.add_listener(lambda records: plot_service.invalidate(np.char.decode(np.unique(records["float_id"])).tolist()))
+job_manager = JobManager()
+job_manager.register_sink("profiles_counted", dataset_stats.add_table)
+if settings.persist_profiles:
+    job_manager.register_sink("rows_written", profile_loader.load_table)
+if settings.archive_profiles:
+    job_manager.register_sink("levels_archived", profile_archive.write_table)
+job_manager.register_sink("vectors_indexed", lambda table: vector_db.add_documents(table.profiles))
+job_manager.register_sink("profiles_cataloged", profile_catalog.add_table)
+
+@app.on_event("startup")
+async def startup():
+    # Load models in the background so the server starts accepting requests immediately
+    asyncio.get_running_loop().run_in_executor(None, registry.warm_up)
+
+@app.on_event("shutdown")
+async def shutdown():
+    job_manager.shutdown()
+    dataset_stats.flush()
+    if rag_service.llm_client is not None:
+        await rag_service.llm_client.aclose()
 
 @app.get("/")
 async def root():
@@ -47,14 +102,19 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {
-        "status": "healthy",
-        "services": {
-            "database": "connected",
-            "vector_db": "initialized",
-            "ml_models": "loaded"
+    database_ok = await asyncio.to_thread(check_database)
+    services = registry.readiness()
+    ready = registry.ready and database_ok
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "healthy" if ready else "starting",
+            "services": {
+                "database": "connected" if database_ok else "unavailable",
+                **services
+            }
         }
-    }
+    )
 
 # Data endpoints
 @app.get("/api/floats")
@@ -64,22 +124,63 @@ async def get_floats(
     radius: float = None,
     start_date: str = None,
     end_date: str = None,
-    db=Depends(get_db)
+    limit: int = 100,
+    cursor: str = None
 ):
-    """Get ARGO float data with optional filtering"""
+    """Get ARGO floats with profiles within ``radius`` km of a point and a date window"""
     try:
-        # TODO: Implement database query
-        return {
-            "floats": [],
-            "total": 0,
-            "filters": {
-                "lat": lat,
-                "lon": lon,
-                "radius": radius,
-                "start_date": start_date,
-                "end_date": end_date
-            }
+        result = await asyncio.to_thread(
+            profile_catalog.find_floats,
+            lat=lat,
+            lon=lon,
+            radius_km=radius,
+            start_date=start_date,
+            end_date=end_date,
+            limit=min(max(limit, 1), 1000),
+            cursor=cursor
+        )
+        result["filters"] = {
+            "lat": lat,
+            "lon": lon,
+            "radius": radius,
+            "start_date": start_date,
+            "end_date": end_date
         }
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/floats/{float_id}/trajectory")
+async def get_float_trajectory(
+    float_id: str,
+    zoom: float = None,
+    tolerance: float = None,
+    format: str = "geojson",
+    include_dates: bool = True
+):
+    """Get a float's track, simplified for a map ``zoom`` level (or ``tolerance`` in degrees)"""
+    if format not in TRAJECTORY_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(TRAJECTORY_FORMATS)}")
+    try:
+        records = await asyncio.to_thread(profile_catalog.get_float_profiles, float_id)
+        if len(records) == 0:
+            raise HTTPException(status_code=404, detail=f"Float {float_id} not found")
+        
+        if tolerance is None and zoom is not None:
+            tolerance = zoom_tolerance(zoom)
+        return build_trajectory(
+            records["latitude"],
+            records["longitude"],
+            records["date"],
+            float_id=float_id,
+            tolerance=tolerance,
+            format=format,
+            include_dates=include_dates
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -89,51 +190,104 @@ async def get_profiles(
     parameter: str = None,
     start_date: str = None,
     end_date: str = None,
-    db=Depends(get_db)
+    levels: str = None
 ):
-    """Get profile data for a specific float"""
+    """Get a float's profiles interpolated onto standard pressure levels
+
+    ``parameter`` and ``levels`` are comma-separated; each parameter is returned
+    as a dense profiles x levels array with null where there is no data. An
+    unknown float is a 404; a known float with no profiles in the date range
+    returns empty arrays.
+    """
+    if not profile_levels_stored:
+        raise HTTPException(status_code=503, detail=PROFILE_LEVELS_UNAVAILABLE)
     try:
-        # TODO: Implement profile data retrieval
-        return {
-            "float_id": float_id,
-            "profiles": [],
-            "parameter": parameter
-        }
+        if len(await asyncio.to_thread(profile_catalog.get_float_profiles, float_id)) == 0:
+            raise HTTPException(status_code=404, detail=f"Float {float_id} not found")
+        parameters = [param.strip() for param in parameter.split(",")] if parameter else None
+        pressure_levels = [float(level) for level in levels.split(",")] if levels else None
+        result = await asyncio.to_thread(
+            profile_grid.query,
+            float_id,
+            parameters=parameters,
+            start_date=start_date,
+            end_date=end_date,
+            levels=pressure_levels
+        )
+        if not result["profiles"]["cycle_number"] and not (start_date or end_date):
+            raise HTTPException(status_code=404, detail=f"No profiles found for float {float_id}")
+        return result
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/search")
-async def search_data(query: str, limit: int = 10):
-    """Search ARGO data using vector similarity"""
+async def search_data(
+    query: str,
+    limit: int = 10,
+    min_lat: float = None,
+    min_lon: float = None,
+    max_lat: float = None,
+    max_lon: float = None,
+    lat: float = None,
+    lon: float = None,
+    radius_km: float = None,
+    start_date: str = None,
+    end_date: str = None,
+    parameters: str = None
+):
+    """Search ARGO data using vector similarity, optionally within a region, radius and date range"""
     try:
-        results = await vector_db.search(query, limit)
+        filters = SearchFilters(
+            bbox=(min_lat, min_lon, max_lat, max_lon) if None not in (min_lat, min_lon, max_lat, max_lon) else None,
+            center=(lat, lon) if lat is not None and lon is not None else None,
+            radius_km=radius_km,
+            start_date=start_date,
+            end_date=end_date,
+            parameters=[param.strip().upper() for param in parameters.split(",")] if parameters else []
+        )
+        results = await vector_db.search(query, limit, filters=filters)
         return {
             "query": query,
             "results": results,
-            "limit": limit
+            "limit": limit,
+            "filters": asdict(filters)
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/search/documents/{doc_id}")
+async def get_search_document(doc_id: int):
+    """Get a search result with its full measurements"""
+    document = vector_db.get_document(doc_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"Unknown document: {doc_id}")
+    return document
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Get service performance metrics"""
+    return {
+        "search": vector_db.batcher.get_stats(),
+        "embedding_cache": vector_db.embedding_cache.get_stats(),
+        "map_tiles": map_tiles.get_stats(),
+        "profile_grid": profile_grid.get_stats(),
+        "plots": plot_service.get_stats(),
+        "conversations": await asyncio.to_thread(chat_service.store.get_stats),
+        "semantic_cache": rag_service.semantic_cache.get_stats() if rag_service.semantic_cache else None,
+        "llm": rag_service.llm_client.get_stats() if rag_service.llm_client else None,
+        "query_planner": rag_service.query_planner.get_stats()
+    }
+
 @app.get("/api/statistics")
-async def get_statistics(db=Depends(get_db)):
-    """Get dataset statistics"""
-    try:
-        # TODO: Implement statistics calculation
-        return {
-            "total_floats": 0,
-            "total_profiles": 0,
-            "date_range": {
-                "start": None,
-                "end": None
-            },
-            "geographic_coverage": {
-                "lat_range": [-90, 90],
-                "lon_range": [-180, 180]
-            }
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def get_statistics():
+    """Get dataset statistics, maintained incrementally during ingestion"""
+    return dataset_stats.summary()
 
 # Chat endpoints
 @app.post("/api/chat/message")
@@ -148,65 +302,129 @@ async def process_chat_message(message_data: dict):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/chat/stream")
+async def stream_chat_message(message_data: dict):
+    """Process a natural language query as Server-Sent Events
+
+    Emits ``context`` with the retrieved documents first, then ``token`` events with
+    incremental answer text, and finally ``done`` (or ``error``).
+    """
+    message = message_data.get("message")
+    if not message:
+        raise HTTPException(status_code=400, detail="message is required")
+    conversation_id = message_data.get("conversationId")
+    
+    async def events():
+        async for event in chat_service.stream_message(message, conversation_id):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Upload endpoints
 @app.post("/api/upload/process")
 async def process_upload(file: UploadFile = File(...)):
-    """Process uploaded NetCDF files"""
+    """Queue an uploaded NetCDF file for background processing"""
     try:
         if not file.filename.endswith(('.nc', '.netcdf')):
             raise HTTPException(status_code=400, detail="Only NetCDF files are supported")
         
-        # Process the file
-        result = await netcdf_processor.process_file(file)
-        return result
+        file_path = await netcdf_processor.save_upload(file)
+        job = job_manager.submit(file_path, filename=file.filename)
+        return {
+            "success": True,
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "status_url": f"/api/upload/status/{job['job_id']}",
+            "message": "File queued for processing"
+        }
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/upload/status/{job_id}")
 async def get_upload_status(job_id: str):
     """Get upload processing status"""
-    try:
-        # TODO: Implement job status tracking
-        return {
-            "job_id": job_id,
-            "status": "completed",
-            "progress": 100,
-            "message": "Processing completed successfully"
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    job = job_manager.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
 
 # Visualization endpoints
 @app.post("/api/visualization/plot")
 async def generate_plot(plot_data: dict):
-    """Generate visualization plots"""
+    """Generate visualization plots
+
+    ``type`` is ``ts_diagram``, ``depth_section`` or ``time_series``; ``data`` selects a
+    float (``float_id``, optional ``start_date``/``end_date``) or passes ``x``/``y`` arrays,
+    and ``options`` sets ``width``, ``height``, ``format`` (json or png), ``parameter``,
+    ``level``, ``max_points`` and ``title``. Rendered plots are cached.
+    """
     try:
         plot_type = plot_data.get("type")
         data = plot_data.get("data")
         options = plot_data.get("options", {})
+        if isinstance(data, dict) and data.get("float_id") and not profile_levels_stored:
+            raise HTTPException(status_code=503, detail=PROFILE_LEVELS_UNAVAILABLE)
         
-        # TODO: Implement plot generation
-        return {
-            "plot_url": None,
-            "plot_data": None,
-            "type": plot_type
-        }
+        return await plot_service.render(plot_type, data, options)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/visualization/map-data")
-async def get_map_data(bounds: str = None, filters: str = None):
-    """Get data for map visualization"""
+async def get_map_data(bounds: str = None, filters: str = None, zoom: int = None):
+    """Get aggregated float positions for a map view
+
+    ``bounds`` is ``min_lat,min_lon,max_lat,max_lon`` (whole world if omitted) and
+    ``filters`` a JSON object with optional ``start_date``, ``end_date`` and ``parameters``.
+    """
     try:
-        # TODO: Implement map data retrieval
-        return {
-            "features": [],
-            "bounds": bounds,
-            "filters": filters
-        }
+        bbox = tuple(float(value) for value in bounds.split(",")) if bounds else (-90.0, -180.0, 90.0, 180.0)
+        if len(bbox) != 4:
+            raise ValueError("bounds must be min_lat,min_lon,max_lat,max_lon")
+        search_filters = _parse_map_filters(filters)
+        if zoom is None:
+            lon_span = (bbox[3] - bbox[1]) % 360 or 360
+            zoom = int(np.clip(np.log2(360 / lon_span) + 2, 0, 18))
+        
+        result = await asyncio.to_thread(map_tiles.get_features, bbox, zoom, search_filters)
+        result.update({"bounds": bounds, "filters": asdict(search_filters)})
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/visualization/tiles/{z}/{x}/{y}")
+async def get_map_tile(z: int, x: int, y: int, filters: str = None):
+    """Get one z/x/y map tile as a GeoJSON FeatureCollection"""
+    try:
+        return await asyncio.to_thread(map_tiles.get_tile, z, x, y, _parse_map_filters(filters))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _parse_map_filters(filters: str = None) -> SearchFilters:
+    values = json.loads(filters) if filters else {}
+    if not isinstance(values, dict):
+        raise ValueError("filters must be a JSON object")
+    return SearchFilters(
+        start_date=values.get("start_date"),
+        end_date=values.get("end_date"),
+        parameters=list(values.get("parameters") or [])
+    )
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
@@ -0,0 +1,4 @@
+import os
+
+# The services import the shared engine at module level; tests run against SQLite
+os.environ.setdefault("DATABASE_URL", "sqlite://")
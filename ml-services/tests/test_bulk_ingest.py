@@ -0,0 +1,55 @@
+import os
+from app.services.bulk_ingest import BulkIngester, IngestManifest
+from tests.test_netcdf_processor import write_argo_file
+
+
+def make_tree(root):
+    for float_id in ("2902746", "2902747", "2902748"):
+        (root / "incois" / float_id).mkdir(parents=True)
+    write_argo_file(root / "incois" / "2902746" / "2902746_prof.nc", n_prof=4, platform="2902746")
+    write_argo_file(root / "incois" / "2902747" / "2902747_prof.nc", n_prof=3, platform="2902747")
+    (root / "incois" / "2902748" / "2902748_prof.nc").write_bytes(b"not a netcdf file")
+    write_argo_file(root / "incois" / "2902746" / "2902746_meta.nc", n_prof=1)
+
+
+def ingest(root, manifest_path, batches=None):
+    batches = [] if batches is None else batches
+    ingester = BulkIngester(
+        {"profiles_stored": lambda table: batches.append(len(table)) or len(table)},
+        IngestManifest(str(manifest_path)),
+        max_workers=2,
+        batch_size=5
+    )
+    return ingester.run(str(root))
+
+
+def test_ingests_matching_files_and_skips_them_next_time(tmp_path):
+    root = tmp_path / "dac"
+    make_tree(root)
+    manifest_path = tmp_path / "manifest.json"
+
+    batches = []
+    stats = ingest(root, manifest_path, batches)
+    assert (stats["files_found"], stats["files_ingested"], stats["files_failed"]) == (3, 2, 1)
+    assert stats["profiles"] == stats["profiles_stored"] == 7
+    assert sum(batches) == 7
+
+    stats = ingest(root, manifest_path)
+    assert (stats["files_skipped"], stats["files_ingested"], stats["profiles"]) == (2, 0, 0)
+
+
+def test_touched_files_are_checked_by_content(tmp_path):
+    root = tmp_path / "dac"
+    root.mkdir()
+    path = write_argo_file(root / "2902746_prof.nc", n_prof=4)
+    manifest_path = tmp_path / "manifest.json"
+    ingest(root, manifest_path)
+
+    # Same bytes, new mtime: skipped after comparing checksums
+    os.utime(path, (1, 1))
+    assert ingest(root, manifest_path)["files_skipped"] == 1
+
+    write_argo_file(root / "2902746_prof.nc", n_prof=6)
+    stats = ingest(root, manifest_path)
+    assert (stats["files_ingested"], stats["profiles"]) == (1, 6)
+    assert IngestManifest(str(manifest_path)).entries[path]["profiles"] == 6
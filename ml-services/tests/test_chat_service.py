@@ -0,0 +1,64 @@
+import asyncio
+import pytest
+
+# ChatService imports the RAG stack, which needs the embedding model package
+pytest.importorskip("sentence_transformers")
+
+from app.services.chat_service import ChatService
+from app.services.conversation_store import MemoryConversationStore
+
+
+class FakeRAGService:
+    """Replays a fixed list of stream events"""
+
+    def __init__(self, events):
+        self.events = events
+
+    async def stream_query(self, query):
+        for event in self.events:
+            yield event
+
+
+CONTEXT = {"event": "context", "data": {"query": "q", "context_documents": [], "query_results": None}}
+
+
+def run_stream(events, stop_after=None):
+    chat = ChatService(rag_service=FakeRAGService(events), store=MemoryConversationStore())
+
+    async def consume():
+        received = []
+        stream = chat.stream_message("Where is float 2902746?", "c1")
+        async for event in stream:
+            received.append(event)
+            if stop_after is not None and len(received) == stop_after:
+                await stream.aclose()
+                break
+        return received
+
+    return chat, asyncio.run(consume())
+
+
+def test_completed_stream_stores_question_and_answer():
+    chat, received = run_stream([
+        CONTEXT,
+        {"event": "token", "data": {"text": "In the "}},
+        {"event": "token", "data": {"text": "Arabian Sea"}},
+        {"event": "done", "data": {"sql_query": None, "suggestions": ["Plot its track"]}}
+    ])
+    messages = chat.get_conversation("c1")["messages"]
+    assert [m["role"] for m in messages] == ["user", "assistant"]
+    assert messages[1]["content"] == "In the Arabian Sea"
+    assert received[-1]["data"]["message"] == messages[1]
+
+
+def test_failed_stream_stores_an_apology():
+    chat, received = run_stream([CONTEXT, {"event": "error", "data": {"error": "LLM provider returned 503"}}])
+    messages = chat.get_conversation("c1")["messages"]
+    assert [m["role"] for m in messages] == ["user", "assistant"]
+    assert messages[1]["metadata"]["error"] == "LLM provider returned 503"
+    assert received[-1]["data"]["conversation_id"] == "c1"
+
+
+def test_abandoned_stream_stores_nothing():
+    chat, _ = run_stream([CONTEXT, {"event": "token", "data": {"text": "In the "}}], stop_after=1)
+    assert chat.get_conversation("c1") is None
@@ -0,0 +1,83 @@
+import fakeredis
+import pytest
+from app.services import conversation_store
+from app.services.conversation_store import ConversationStore, MemoryConversationStore, RedisConversationStore
+
+
+def message(n):
+    return {"role": "user", "content": f"message {n}"}
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    if request.param == "memory":
+        return MemoryConversationStore(max_messages=5, ttl=60)
+    return RedisConversationStore(fakeredis.FakeRedis(), max_messages=5, ttl=60)
+
+
+def test_base_store_is_abstract():
+    with pytest.raises(TypeError):
+        ConversationStore()
+
+
+def test_messages_are_trimmed_and_windowed(store):
+    for n in range(8):
+        metadata = store.append("c1", [message(n)])
+    assert metadata["message_count"] == 5
+
+    conversation = store.get("c1")
+    assert [m["content"] for m in conversation["messages"]] == [f"message {n}" for n in range(3, 8)]
+    assert [m["content"] for m in store.get("c1", last=2)["messages"]] == ["message 6", "message 7"]
+    assert store.get("missing") is None
+
+
+def test_list_and_delete(store):
+    store.append("c1", [message(1)])
+    store.append("c2", [message(2), message(3)])
+    assert [c["id"] for c in store.list()] == ["c2", "c1"]
+    assert store.list()[0]["message_count"] == 2
+
+    assert store.delete("c1")
+    assert not store.delete("c1")
+    assert [c["id"] for c in store.list()] == ["c2"]
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryConversationStore(max_conversations=2)
+    store.append("c1", [message(1)])
+    store.append("c2", [message(2)])
+    store.get("c1")
+    store.append("c3", [message(3)])
+
+    assert store.get("c2") is None
+    assert store.get("c1") is not None and store.get("c3") is not None
+    assert store.get_stats()["evictions"] == 1
+
+
+def test_memory_store_expires_idle_conversations(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(conversation_store.time, "monotonic", lambda: clock[0])
+    store = MemoryConversationStore(ttl=60)
+    store.append("c1", [message(1)])
+    store.append("c2", [message(2)])
+
+    clock[0] += 50
+    store.get("c1")
+    clock[0] += 20
+    assert store.get("c2") is None
+    assert store.get("c1") is not None
+    assert store.get_stats()["expirations"] == 1
+
+
+def test_redis_get_renews_expiry():
+    redis = fakeredis.FakeRedis()
+    store = RedisConversationStore(redis, ttl=600)
+    store.append("c1", [message(1)])
+    redis.expire("conv:c1", 5)
+    redis.expire("conv:c1:messages", 5)
+
+    store.get("c1")
+    assert redis.ttl("conv:c1") > 5
+    assert redis.ttl("conv:c1:messages") > 5
+    assert store.get("missing") is None
+    assert not redis.exists("conv:missing")
@@ -0,0 +1,108 @@
+import json
+import numpy as np
+import pandas as pd
+from app.services.dataset_stats import DatasetStatistics
+from app.services.profile_table import ProfileTable
+
+
+def make_table(cycles, float_id="1900001"):
+    n = len(cycles)
+    cycles = np.asarray(cycles, dtype=np.int64)
+    index = pd.DataFrame({
+        "profile_id": np.arange(n),
+        "float_id": [float_id] * n,
+        "cycle_number": cycles,
+        "date": pd.to_datetime("2024-01-01") + pd.to_timedelta(cycles * 10, unit="D"),
+        "latitude": cycles * 1.5,
+        "longitude": 60.0 + cycles,
+    })
+    pressure = np.tile(np.array([5.0, 50.0, 500.0]), (n, 1))
+    temperature = 20.0 + cycles[:, None] - pressure / 100
+    return ProfileTable(index=index, pressure=pressure, measurements={"TEMP": temperature})
+
+
+def test_reingesting_profiles_does_not_double_count():
+    statistics = DatasetStatistics()
+    assert statistics.add_table(make_table([1, 2, 3])) == 3
+    before = json.dumps(statistics.summary(), sort_keys=True)
+
+    assert statistics.add_table(make_table([1, 2, 3])) == 0
+    assert json.dumps(statistics.summary(), sort_keys=True) == before
+
+    # An overlapping batch split only adds the new profile
+    assert statistics.add_table(make_table([3, 4])) == 1
+    assert statistics.summary()["total_profiles"] == 4
+    assert statistics.verify(DatasetStatistics.rebuild([make_table([1, 2, 3, 4])])) == []
+
+
+def test_saves_are_debounced_and_flushed(tmp_path):
+    path = tmp_path / "stats.json"
+    statistics = DatasetStatistics(str(path), save_interval=3600)
+    statistics.add_table(make_table([1, 2]))
+    assert not path.exists()
+
+    statistics.flush()
+    reloaded = DatasetStatistics(str(path))
+    assert reloaded.summary() == statistics.summary()
+    assert reloaded.add_table(make_table([1, 2])) == 0
+
+
+def test_empty_summary_keeps_coverage_shape():
+    coverage = DatasetStatistics().summary()["geographic_coverage"]
+    assert coverage == {"lat_range": [-90, 90], "lon_range": [-180, 180]}
+
+
+def test_saves_append_only_new_keys(tmp_path):
+    path = tmp_path / "stats.json"
+    statistics = DatasetStatistics(str(path), save_interval=3600)
+    statistics.add_table(make_table(range(1, 101)))
+    statistics.flush()
+    keys_file = tmp_path / json.loads(path.read_text())["keys_file"]
+    size = keys_file.stat().st_size
+
+    statistics.add_table(make_table([101, 102], float_id="1900002"))
+    statistics.flush()
+    # The second save appends the two new keys instead of rewriting the hundred before them
+    assert keys_file.stat().st_size - size < size / 10
+    assert len(path.read_bytes()) < size
+
+    reloaded = DatasetStatistics(str(path))
+    assert reloaded.float_counts == {"1900001": 100, "1900002": 2}
+    assert reloaded.add_table(make_table(range(1, 103))) == 2
+
+
+def test_key_log_tail_past_the_saved_state_is_ignored(tmp_path):
+    path = tmp_path / "stats.json"
+    statistics = DatasetStatistics(str(path))
+    statistics.add_table(make_table([1, 2]))
+    statistics.flush()
+    keys_file = tmp_path / json.loads(path.read_text())["keys_file"]
+    # A crash after appending keys but before the state was replaced
+    with open(keys_file, "ab") as f:
+        f.write(b'{"1900001": [99]}\n{"19000')
+
+    reloaded = DatasetStatistics(str(path))
+    assert reloaded.summary()["total_profiles"] == 2
+    assert reloaded.add_table(make_table([3])) == 1
+    reloaded.flush()
+    assert DatasetStatistics(str(path)).summary()["total_profiles"] == 3
+
+
+def test_version_2_state_is_migrated(tmp_path):
+    path = tmp_path / "stats.json"
+    reference = DatasetStatistics.rebuild([make_table([1, 2])])
+    state = {
+        "version": 2,
+        "profile_keys": {"1900001": ["1@2024-01-11 00:00:00", "2@2024-01-21 00:00:00"]},
+        "dates": reference.dates.to_dict(),
+        "latitude": reference.latitude.to_dict(),
+        "longitude": reference.longitude.to_dict(),
+        "parameters": {param: stats.to_dict() for param, stats in reference.parameters.items()}
+    }
+    path.write_text(json.dumps(state))
+
+    statistics = DatasetStatistics(str(path))
+    assert statistics.add_table(make_table([1, 2, 3])) == 1
+    statistics.flush()
+    assert json.loads(path.read_text())["version"] == 3
+    assert DatasetStatistics(str(path)).float_counts == {"1900001": 3}
@@ -0,0 +1,68 @@
+import fakeredis
+import numpy as np
+from app.services.embedding_cache import EmbeddingCache
+
+
+class RecordingEncoder:
+    """Encodes each text as a vector of its length and remembers what it was asked for"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+def test_only_uncached_texts_are_encoded():
+    cache = EmbeddingCache("model-a")
+    encoder = RecordingEncoder()
+
+    first = cache.encode(["temperature", "salinity", "temperature"], encoder)
+    second = cache.encode(["salinity", "oxygen"], encoder)
+    assert encoder.calls == [["temperature", "salinity"], ["oxygen"]]
+    np.testing.assert_array_equal(first[0], first[2])
+    np.testing.assert_array_equal(second[0], first[1])
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 3)
+
+
+def test_keys_depend_on_the_model():
+    assert EmbeddingCache("model-a").key("text") != EmbeddingCache("model-b").key("text")
+
+
+def test_memory_bound_evicts_least_recently_used():
+    # Each entry is two float32 values, so three fit
+    cache = EmbeddingCache("model-a", max_bytes=24)
+    encoder = RecordingEncoder()
+    cache.encode(["a", "bb", "ccc"], encoder)
+    cache.encode(["a"], encoder)
+    cache.encode(["dddd"], encoder)
+    cache.encode(["a", "bb"], encoder)
+    assert encoder.calls[-1] == ["bb"]
+    assert cache.get_stats()["evictions"] == 2
+
+
+def test_redis_tier_is_shared_between_processes():
+    redis = fakeredis.FakeRedis()
+    EmbeddingCache("model-a", redis_client=redis, redis_ttl=60).encode(["temperature"], RecordingEncoder())
+
+    encoder = RecordingEncoder()
+    other = EmbeddingCache("model-a", redis_client=redis)
+    np.testing.assert_array_equal(other.encode(["temperature"], encoder), [[11, 1]])
+    assert encoder.calls == []
+    assert other.get_stats()["redis_hits"] == 1
+    assert 0 < redis.ttl(other.key("temperature")) <= 60
+
+
+def test_redis_failures_fall_back_to_encoding():
+    class BrokenRedis:
+        def mget(self, keys):
+            raise ConnectionError("redis down")
+
+        def pipeline(self, transaction=False):
+            raise ConnectionError("redis down")
+
+    cache = EmbeddingCache("model-a", redis_client=BrokenRedis())
+    np.testing.assert_array_equal(cache.encode(["abc"], RecordingEncoder()), [[3, 1]])
+    assert cache.get_stats()["redis_errors"] == 2
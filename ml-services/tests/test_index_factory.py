@@ -0,0 +1,58 @@
+import faiss
+import numpy as np
+import pytest
+from app.services.index_factory import (
+    INDEX_TYPES, resolve_index_type, create_index, configure_search, min_training_size
+)
+
+DIMENSION = 32
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    points = np.random.default_rng(0).normal(size=(2000, DIMENSION)).astype(np.float32)
+    faiss.normalize_L2(points)
+    return points
+
+
+@pytest.mark.parametrize("setting, index_type", [
+    ("faiss", "flat"),
+    ("FAISS_IVF_FLAT", "ivf_flat"),
+    ("faiss-ivf-pq", "ivf_pq"),
+    ("hnsw", "hnsw"),
+    ("annoy", "flat"),
+])
+def test_settings_map_to_index_types(setting, index_type):
+    assert resolve_index_type(setting) == index_type
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_index_types_find_the_exact_neighbours(index_type, vectors):
+    index = create_index(index_type, DIMENSION, nlist=16, pq_m=8, hnsw_m=16, ef_construction=64)
+    assert index.metric_type == faiss.METRIC_INNER_PRODUCT
+    if not index.is_trained:
+        assert len(vectors) >= min_training_size(index_type, nlist=16)
+        index.train(vectors)
+    index.add(vectors)
+    configure_search(index, nprobe=8, ef_search=64)
+
+    exact = faiss.IndexFlatIP(DIMENSION)
+    exact.add(vectors)
+    queries = vectors[:100]
+    _, expected = exact.search(queries, 1)
+    _, found = index.search(queries, 10)
+    recall = np.mean([expected[row, 0] in found[row] for row in range(len(queries))])
+    assert recall >= 0.9
+
+
+def test_search_parameters_apply_only_where_supported():
+    ivf = create_index("ivf_flat", DIMENSION, nlist=16)
+    configure_search(ivf, nprobe=4, ef_search=64)
+    assert faiss.extract_index_ivf(ivf).nprobe == 4
+
+    hnsw = create_index("hnsw", DIMENSION, hnsw_m=16)
+    configure_search(hnsw, nprobe=4, ef_search=48)
+    assert faiss.downcast_index(hnsw).hnsw.efSearch == 48
+
+    # A flat index has neither parameter; configuring it is a no-op
+    configure_search(create_index("flat", DIMENSION), nprobe=4, ef_search=48)
@@ -0,0 +1,100 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import pytest
+from app.config.settings import settings
+from app.services import job_manager as job_module
+from app.services.job_manager import JobManager
+from app.services.profile_table import ProfileTable
+
+TOTAL = 7
+
+
+def make_table(start, stop):
+    cycles = np.arange(start, stop) + 1
+    index = pd.DataFrame({
+        "profile_id": cycles - 1,
+        "float_id": ["2902746"] * len(cycles),
+        "cycle_number": cycles,
+        "date": pd.to_datetime("2023-03-01") + pd.to_timedelta(cycles * 10, unit="D"),
+        "latitude": np.full(len(cycles), 12.0),
+        "longitude": np.full(len(cycles), 65.0),
+    })
+    pressure = np.tile([5.0, 100.0], (len(cycles), 1))
+    return ProfileTable(index=index, pressure=pressure, measurements={"TEMP": 28.0 - pressure / 50})
+
+
+@pytest.fixture
+def manager(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "profile_batch_size", 3)
+    monkeypatch.setattr(job_module, "_count_profiles", lambda file_path: TOTAL)
+    monkeypatch.setattr(job_module, "_parse_batch", lambda file_path, start, stop: make_table(start, stop))
+    manager = JobManager(max_workers=1)
+    # Threads stand in for worker processes, so the patched parsers are used
+    manager._executor = ThreadPoolExecutor(max_workers=2)
+    yield manager
+    manager.shutdown()
+
+
+def run_job(manager, tmp_path):
+    path = tmp_path / "upload.nc"
+    path.write_bytes(b"")
+
+    async def scenario():
+        job = manager.submit(str(path), filename="upload.nc")
+        await asyncio.gather(*manager._tasks.values())
+        return manager.get_job(job["job_id"])
+
+    job = asyncio.run(scenario())
+    assert not path.exists()
+    return job
+
+
+def test_progress_counts_every_batch(manager, tmp_path):
+    seen = []
+    manager.register_sink("rows_written", lambda table: seen.append(len(table)) or len(table) * 2)
+
+    job = run_job(manager, tmp_path)
+    assert job["status"] == "completed"
+    assert job["progress"] == 100
+    assert job["profiles_total"] == TOTAL
+    assert job["profiles_parsed"] == TOTAL
+    assert job["rows_written"] == 2 * TOTAL
+    assert seen == [3, 3, 1]
+    assert job["message"] == f"Successfully processed {TOTAL} profiles"
+
+
+def test_failing_sink_is_skipped_and_reported(manager, tmp_path):
+    stored = []
+
+    def failing(table):
+        raise RuntimeError("index unavailable")
+
+    manager.register_sink("vectors_indexed", failing)
+    manager.register_sink("rows_written", lambda table: stored.append(len(table)) or len(table))
+
+    job = run_job(manager, tmp_path)
+    assert job["status"] == "completed"
+    assert job["sink_errors"] == {"vectors_indexed": "index unavailable"}
+    assert job["vectors_indexed"] == 0
+    assert job["rows_written"] == TOTAL
+    assert "not stored by vectors_indexed" in job["message"]
+
+
+def test_parse_error_fails_the_job(manager, monkeypatch, tmp_path):
+    def parse(file_path, start, stop):
+        if start >= 3:
+            raise ValueError("corrupt profile")
+        return make_table(start, stop)
+
+    monkeypatch.setattr(job_module, "_parse_batch", parse)
+    job = run_job(manager, tmp_path)
+    assert job["status"] == "failed"
+    assert job["error"] == "corrupt profile"
+    assert job["profiles_parsed"] == 3
+
+
+def test_profiles_parsed_is_reserved(manager):
+    with pytest.raises(ValueError):
+        manager.register_sink("profiles_parsed", len)
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import httpx
+import pytest
+from app.services.llm_client import LLMClient, LLMError, OpenAIProvider
+
+MESSAGES = [{"role": "user", "content": "Where is float 2902746?"}]
+
+
+def completion(text="In the Arabian Sea", prompt_tokens=12, completion_tokens=5):
+    return {
+        "model": "test-model",
+        "choices": [{"message": {"content": text}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+    }
+
+
+def make_client(handler, **kwargs):
+    kwargs.setdefault("backoff_base", 0.01)
+    return LLMClient(OpenAIProvider("test-key", model="test-model"), transport=httpx.MockTransport(handler), **kwargs)
+
+
+def responses(*items):
+    """Handler answering with ``items`` in turn, recording each request body"""
+    calls = []
+
+    def handler(request):
+        calls.append(json.loads(request.content))
+        return items[min(len(calls), len(items)) - 1]
+    return handler, calls
+
+
+def test_complete_parses_text_and_accounts_tokens():
+    handler, calls = responses(httpx.Response(200, json=completion()))
+    client = make_client(handler)
+    result = asyncio.run(client.complete(MESSAGES, system="Be brief"))
+
+    assert result.text == "In the Arabian Sea"
+    assert (result.prompt_tokens, result.completion_tokens, result.attempts) == (12, 5, 1)
+    assert calls[0]["messages"][0] == {"role": "system", "content": "Be brief"}
+    stats = client.get_stats()
+    assert (stats["requests"], stats["failures"], stats["prompt_tokens"]) == (1, 0, 12)
+
+
+def test_retryable_status_is_retried():
+    handler, calls = responses(
+        httpx.Response(503, text="busy"),
+        httpx.Response(429, text="slow down", headers={"retry-after": "0.01"}),
+        httpx.Response(200, json=completion())
+    )
+    client = make_client(handler)
+    result = asyncio.run(client.complete(MESSAGES))
+
+    assert result.attempts == 3 and len(calls) == 3
+    assert client.get_stats()["retries"] == 2
+
+
+def test_client_error_is_not_retried():
+    handler, calls = responses(httpx.Response(401, text="bad key"))
+    client = make_client(handler)
+    with pytest.raises(LLMError) as error:
+        asyncio.run(client.complete(MESSAGES))
+
+    assert error.value.status_code == 401 and not error.value.retryable
+    assert len(calls) == 1 and client.get_stats()["failures"] == 1
+
+
+def test_invalid_json_body_is_an_llm_error():
+    handler, calls = responses(httpx.Response(200, text="<html>gateway</html>"))
+    client = make_client(handler, max_retries=1)
+    with pytest.raises(LLMError) as error:
+        asyncio.run(client.complete(MESSAGES))
+
+    assert error.value.retryable and "invalid JSON" in str(error.value)
+    assert len(calls) == 2
+    assert client.get_stats()["failures"] == 1
+
+
+def test_slow_request_is_hedged():
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            await asyncio.sleep(1)
+            return httpx.Response(200, json=completion("slow"))
+        return httpx.Response(200, json=completion("fast"))
+
+    client = make_client(handler, hedge_after=0.05)
+    result = asyncio.run(client.complete(MESSAGES))
+
+    assert result.text == "fast" and result.hedged
+    assert client.get_stats()["hedge_wins"] == 1
+
+
+def test_stream_yields_text_and_accounts_usage():
+    events = [{"choices": [{"delta": {"content": word}}]} for word in ("Warm", " surface", " water")]
+    events.append({"choices": [], "usage": {"prompt_tokens": 9, "completion_tokens": 3}})
+    body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+    handler, calls = responses(httpx.Response(200, text=body, headers={"content-type": "text/event-stream"}))
+    client = make_client(handler)
+
+    async def collect():
+        return [chunk async for chunk in client.stream(MESSAGES)]
+
+    assert asyncio.run(collect()) == ["Warm", " surface", " water"]
+    assert calls[0]["stream"] is True
+    assert client.get_stats()["completion_tokens"] == 3
+
+
+def test_pool_of_a_previous_event_loop_is_closed():
+    handler, _ = responses(httpx.Response(200, json=completion()))
+    client = make_client(handler)
+    asyncio.run(client.complete(MESSAGES))
+    first = client._client
+
+    asyncio.run(client.complete(MESSAGES))
+    assert client._client is not first
+    assert first.is_closed
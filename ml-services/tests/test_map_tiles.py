@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.services.map_tiles import MapTileService, MAX_ZOOM
+from app.services.profile_catalog import ProfileCatalog
+from app.services.profile_table import ProfileTable
+
+
+def make_table(float_id="2902746", lat=12.0, lon=65.0, n_prof=3):
+    index = pd.DataFrame({
+        "profile_id": np.arange(n_prof),
+        "float_id": [float_id] * n_prof,
+        "cycle_number": np.arange(1, n_prof + 1),
+        "date": pd.date_range("2023-03-01", periods=n_prof, freq="10D"),
+        "latitude": np.full(n_prof, lat),
+        "longitude": np.full(n_prof, lon),
+    })
+    pressure = np.tile([5.0, 100.0], (n_prof, 1))
+    return ProfileTable(index=index, pressure=pressure, measurements={"TEMP": 28.0 - pressure / 50})
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = ProfileCatalog(str(tmp_path / "catalog"))
+    catalog.add_table(make_table())
+    return catalog
+
+
+def test_tiles_are_cached_and_dropped_when_profiles_arrive(catalog):
+    tiles = MapTileService(catalog, grid_size=4, point_zoom=6, max_tiles=16)
+    assert tiles.get_tile(0, 0, 0)["profile_count"] == 3
+    assert tiles.get_tile(0, 0, 0)["profile_count"] == 3
+    assert tiles.get_stats()["hits"] == 1
+
+    catalog.add_table(make_table("5904321", lat=-30.0, lon=100.0))
+    assert tiles.get_stats()["tiles"] == 0
+    assert tiles.get_tile(0, 0, 0)["profile_count"] == 6
+
+
+def test_tile_built_during_ingest_is_not_cached(catalog):
+    class IngestingTiles(MapTileService):
+        def _build_tile(self, zoom, x, y, filters):
+            tile = super()._build_tile(zoom, x, y, filters)
+            catalog.add_table(make_table("5904321"))
+            return tile
+
+    tiles = IngestingTiles(catalog, grid_size=4, point_zoom=6, max_tiles=16)
+    assert tiles.get_tile(0, 0, 0)["profile_count"] == 3
+    assert tiles.get_stats()["tiles"] == 0
+
+
+@pytest.mark.parametrize("zoom", [-1, MAX_ZOOM + 1, 1000])
+def test_zoom_outside_supported_range_is_rejected(catalog, zoom):
+    tiles = MapTileService(catalog, grid_size=4, point_zoom=6, max_tiles=16)
+    with pytest.raises(ValueError):
+        tiles.get_tile(zoom, 0, 0)
+    with pytest.raises(ValueError):
+        tiles.get_features((-10.0, -10.0, 10.0, 10.0), zoom)
+
+
+def test_reingested_profiles_are_counted_once(catalog):
+    tiles = MapTileService(catalog, grid_size=4, point_zoom=1, max_tiles=16)
+    catalog.add_table(make_table())
+    tile = tiles.get_tile(1, 1, 0)
+    assert tile["profile_count"] == 3
+    assert [feature["properties"]["profile_count"] for feature in tile["features"]] == [3]
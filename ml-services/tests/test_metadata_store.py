@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+from app.services.metadata_store import (
+    MetadataStore, encode_documents, encode_table, encode_parameters, decode_parameters, merge_payload_offsets
+)
+from app.services.profile_table import ProfileTable
+
+
+def make_table(float_id="2902746", n_prof=3, first_cycle=1):
+    cycles = np.arange(first_cycle, first_cycle + n_prof)
+    index = pd.DataFrame({
+        "profile_id": cycles - 1,
+        "float_id": [float_id] * n_prof,
+        "cycle_number": cycles,
+        "date": pd.to_datetime("2023-03-01") + pd.to_timedelta(cycles * 10, unit="D"),
+        "latitude": np.full(n_prof, 12.0),
+        "longitude": [65.0] * (n_prof - 1) + [np.nan],
+    })
+    pressure = np.tile([5.0, 100.0], (n_prof, 1))
+    salinity = np.full(pressure.shape, 35.0)
+    salinity[0] = np.nan
+    return ProfileTable(index=index, pressure=pressure, measurements={"TEMP": 28.0 - pressure / 50, "PSAL": salinity})
+
+
+def segment(table):
+    parts = encode_documents(table.profiles)
+    return {**parts, "vectors": np.arange(len(table) * 2, dtype=np.float32).reshape(len(table), 2)}
+
+
+def test_parameter_bitmask_round_trips():
+    assert decode_parameters(encode_parameters(["PSAL", "TEMP", "UNKNOWN"])) == ["TEMP", "PSAL"]
+
+
+def test_documents_are_read_back_row_by_row():
+    store = MetadataStore()
+    first, second = make_table(), make_table(float_id="5904321", n_prof=2, first_cycle=7)
+    store.append(segment(first))
+    store.append(segment(second))
+    assert len(store) == 5
+
+    document = store.get(0)
+    assert document["float_id"] == "2902746"
+    assert document["cycle_number"] == 1
+    assert document["parameters"] == ["TEMP"]
+    assert document["date"] == "2023-03-11 00:00:00"
+    assert "summary" in document
+
+    last = store.get(4)
+    assert (last["float_id"], last["cycle_number"], last["longitude"]) == ("5904321", 8, None)
+    assert store.get_measurements(4) == second.profiles[1]["measurements"]
+    np.testing.assert_array_equal(store.take("vectors", [4, 0]), [[2, 3], [0, 1]])
+    assert store.columns["float_id"].tolist() == [b"2902746"] * 3 + [b"5904321"] * 2
+
+
+def test_table_records_match_document_records():
+    table = make_table()
+    from_table = encode_table(table)
+    from_documents = encode_documents(table.profiles)["metadata"]
+    for field in ("float_id", "profile_id", "cycle_number", "date", "parameters"):
+        np.testing.assert_array_equal(from_table[field], from_documents[field])
+
+
+def test_merged_segments_keep_their_payloads():
+    tables = [make_table(), make_table(float_id="5904321", n_prof=2, first_cycle=7)]
+    parts = [encode_documents(table.profiles) for table in tables]
+    merged = MetadataStore()
+    merged.append({
+        "metadata": np.concatenate([part["metadata"] for part in parts]),
+        "payload": np.concatenate([part["payload"] for part in parts]),
+        "payload_offsets": merge_payload_offsets([part["payload_offsets"] for part in parts]),
+    })
+    documents = [profile for table in tables for profile in table.profiles]
+    assert [merged.get_measurements(row) for row in range(len(documents))] == [doc["measurements"] for doc in documents]
+    # Segments without summaries produce documents without one
+    assert "summary" not in merged.get(0)
@@ -0,0 +1,111 @@
+import asyncio
+import io
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+from fastapi import UploadFile
+from app.config.settings import settings
+from app.services.netcdf_processor import NetCDFProcessor
+
+N_PROF, N_LEVELS = 5, 6
+
+
+def write_argo_file(path, n_prof=N_PROF, platform="2902746", format="NETCDF4"):
+    """A small multi-profile file laid out like the ARGO GDAC *_prof.nc files"""
+    pressure = np.tile(np.linspace(5, 1000, N_LEVELS), (n_prof, 1)).astype("f4")
+    temperature = (28 - pressure / 100).astype("f4")
+    temperature[:, -1] = 99999.0
+    temperature_qc = np.full(pressure.shape, b"1", dtype="S1")
+    temperature_qc[:, 2] = b"4"
+    xr.Dataset(
+        {
+            "PRES": (("N_PROF", "N_LEVELS"), pressure),
+            "TEMP": (("N_PROF", "N_LEVELS"), temperature),
+            "TEMP_QC": (("N_PROF", "N_LEVELS"), temperature_qc),
+            "PSAL": (("N_PROF", "N_LEVELS"), np.full(pressure.shape, 35.0, dtype="f4")),
+            "LATITUDE": (("N_PROF",), np.linspace(10, 12, n_prof)),
+            "LONGITUDE": (("N_PROF",), np.full(n_prof, -999.0)),
+            "JULD": (("N_PROF",), 26000 + 10.0 * np.arange(n_prof), {"units": "days since 1950-01-01 00:00:00"}),
+            "PLATFORM_NUMBER": (("N_PROF",), np.array([platform.ljust(8).encode()] * n_prof, dtype="S8")),
+            "CYCLE_NUMBER": (("N_PROF",), np.arange(1, n_prof + 1, dtype="i4")),
+        },
+        attrs={"platform_number": platform},
+    ).to_netcdf(path, format=format)
+    return str(path)
+
+
+@pytest.mark.parametrize("format", ["NETCDF4", "NETCDF3_64BIT"])
+def test_extracts_profiles_column_by_column(tmp_path, format):
+    path = write_argo_file(tmp_path / "2902746_prof.nc", format=format)
+    table = NetCDFProcessor().read_profile_range(path, 0, N_PROF)
+
+    assert len(table) == N_PROF
+    assert table.index["float_id"].tolist() == ["2902746"] * N_PROF
+    assert table.index["cycle_number"].tolist() == list(range(1, N_PROF + 1))
+    assert table.index["date"].iloc[0] == pd.Timestamp("1950-01-01") + pd.Timedelta(days=26000)
+    # Fill values are masked in coordinates and measurements alike
+    assert table.index["longitude"].isna().all()
+    temperature = table.measurements["TEMP"]
+    assert np.isnan(temperature[:, -1]).all()
+    # Levels flagged bad by QC are dropped, the flags themselves are kept
+    assert np.isnan(temperature[:, 2]).all()
+    assert (table.qc_flags["TEMP"][:, 2] == "4").all()
+    np.testing.assert_allclose(temperature[:, 0], 28 - 5 / 100, rtol=1e-6)
+    assert "DOXY" not in table.measurements
+    assert len(table.summaries) == N_PROF
+
+
+def test_profile_ranges_keep_file_profile_ids(tmp_path):
+    path = write_argo_file(tmp_path / "2902746_prof.nc")
+    table = NetCDFProcessor().read_profile_range(path, 2, 4)
+
+    assert table.index["profile_id"].tolist() == [2, 3]
+    assert table.index["cycle_number"].tolist() == [3, 4]
+    profile = table.profiles[0]
+    assert profile["float_id"] == "2902746"
+    assert profile["measurements"]["TEMP"]["qc_flags"] == ["1"] * (N_LEVELS - 2)
+    assert len(profile["measurements"]["PSAL"]["values"]) == N_LEVELS
+
+
+def upload(path):
+    return UploadFile(file=io.BytesIO(open(path, "rb").read()), filename="2902746_prof.nc")
+
+
+def test_batches_cover_the_file_in_order(tmp_path):
+    path = write_argo_file(tmp_path / "2902746_prof.nc", n_prof=7)
+    processor = NetCDFProcessor()
+
+    batches = list(processor.iter_profile_batches(path, batch_size=3))
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert [row for batch in batches for row in batch.index["profile_id"]] == list(range(7))
+    assert processor.count_profiles(path) == 7
+
+
+def test_upload_is_copied_in_chunks_and_size_limited(tmp_path, monkeypatch):
+    path = write_argo_file(tmp_path / "2902746_prof.nc")
+    processor = NetCDFProcessor()
+    monkeypatch.setattr(settings, "upload_chunk_size", 1024)
+
+    saved = asyncio.run(processor.save_upload(upload(path), directory=str(tmp_path / "uploads")))
+    assert open(saved, "rb").read() == open(path, "rb").read()
+
+    monkeypatch.setattr(settings, "max_file_size", 2048)
+    with pytest.raises(ValueError):
+        asyncio.run(processor.save_upload(upload(path), directory=str(tmp_path / "uploads")))
+    # Only the first, complete copy is left behind
+    assert os.listdir(tmp_path / "uploads") == [os.path.basename(saved)]
+
+
+def test_process_file_counts_profiles_without_decoding_them(tmp_path, monkeypatch):
+    path = write_argo_file(tmp_path / "2902746_prof.nc", n_prof=4)
+    monkeypatch.setattr(settings, "upload_path", str(tmp_path / "uploads"))
+    processor = NetCDFProcessor()
+    monkeypatch.setattr(processor, "extract_profile_table", None)
+
+    result = asyncio.run(processor.process_file(upload(path)))
+    assert result["success"]
+    assert result["profile_count"] == 4
+    assert len(result["trajectory"]["coordinates"]) == 4
+    assert os.listdir(tmp_path / "uploads") == []
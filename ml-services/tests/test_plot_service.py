@@ -0,0 +1,57 @@
+import asyncio
+import threading
+import pytest
+from app.services.plot_service import PlotService
+
+DATA = {"x": [0, 1, 2, 3], "y": [1.0, 2.0, 3.0, 4.0]}
+
+
+class SlowPlotService(PlotService):
+    """Renders only after ``release`` is set, counting renders"""
+
+    def __init__(self):
+        super().__init__(table_loader=None, gridder=None, max_entries=8)
+        self.release = threading.Event()
+        self.calls = 0
+
+    def _render(self, plot_type, data, options):
+        self.calls += 1
+        self.release.wait(5)
+        return {"type": plot_type, "points": {"input": len(data["x"])}}
+
+
+def test_cancelled_leader_does_not_hang_followers():
+    async def scenario():
+        service = SlowPlotService()
+        leader = asyncio.create_task(service.render("time_series", DATA))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(service.render("time_series", DATA))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        await asyncio.sleep(0.05)
+        service.release.set()
+        result = await asyncio.wait_for(follower, timeout=3)
+        assert result["type"] == "time_series"
+        assert leader.cancelled()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_requests_share_one_render():
+    async def scenario():
+        service = SlowPlotService()
+        tasks = [asyncio.create_task(service.render("time_series", DATA)) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        service.release.set()
+        results = await asyncio.gather(*tasks)
+        assert service.calls == 1
+        assert all(result["type"] == "time_series" for result in results)
+        assert (await service.render("time_series", DATA))["cached"] is True
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("options", [{"max_points": "many"}, {"level": None}, {"width": [1]}])
+def test_non_numeric_options_are_value_errors(options):
+    with pytest.raises(ValueError):
+        asyncio.run(SlowPlotService().render("time_series", DATA, options))
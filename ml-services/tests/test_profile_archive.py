@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+from app.services.profile_archive import ProfileArchive
+from app.services.profile_table import ProfileTable
+
+
+def make_table(n_prof=6, n_levels=4):
+    cycles = np.arange(1, n_prof + 1)
+    index = pd.DataFrame({
+        "profile_id": cycles - 1,
+        "float_id": ["2902746"] * n_prof,
+        "cycle_number": cycles,
+        "date": pd.to_datetime("2023-03-01") + pd.to_timedelta(cycles * 10, unit="D"),
+        "latitude": np.full(n_prof, 12.0),
+        "longitude": np.full(n_prof, 65.0),
+    })
+    pressure = np.tile(np.linspace(5, 1000, n_levels), (n_prof, 1))
+    return ProfileTable(index=index, pressure=pressure, measurements={"TEMP": 28.0 - pressure / 100})
+
+
+def test_rewrites_in_different_batches_are_read_once(tmp_path):
+    archive = ProfileArchive(str(tmp_path))
+    table = make_table()
+    archive.write_table(table)
+    archive.write_table(table.take(range(0, 3)))
+    archive.write_table(table.take(range(2, 6)))
+
+    assert len(archive.read()) == len(table.to_frame())
+    assert len(archive.read(columns=["TEMP"])) == len(table.to_frame())
+    rebuilt = archive.read_table()
+    assert len(rebuilt) == len(table)
+    np.testing.assert_allclose(rebuilt.measurements["TEMP"], table.measurements["TEMP"])
+
+
+def test_corrected_profile_replaces_every_level(tmp_path):
+    archive = ProfileArchive(str(tmp_path))
+    table = make_table()
+    archive.write_table(table)
+    corrected = make_table(n_levels=2).take([1])
+    corrected.measurements["TEMP"][:] = 15.0
+    archive.write_table(corrected)
+
+    frame = archive.read()
+    cycle = frame[frame["cycle_number"] == 2]
+    assert len(cycle) == 2
+    assert (cycle["TEMP"] == 15.0).all()
+    assert len(frame) == len(table.to_frame()) - 2
+    assert "write_seq" not in frame
+    assert len(archive.read_table()) == len(table)
+
+
+def test_later_write_wins_over_file_order(tmp_path):
+    table = make_table()
+    batches = {"first": table.take(range(0, 4)), "second": table.take(range(2, 6))}
+    # Between the two orders, file name order disagrees with write order at least once
+    for order in (["first", "second"], ["second", "first"]):
+        archive = ProfileArchive(str(tmp_path / "-".join(order)))
+        for temp, name in zip((20.0, 30.0), order):
+            batch = batches[name]
+            batch.measurements["TEMP"][:] = temp
+            archive.write_table(batch)
+        frame = archive.read(columns=["cycle_number", "TEMP"])
+        overlap = frame[frame["cycle_number"].isin([3, 4])]
+        assert len(overlap) == 2 * 4
+        assert (overlap["TEMP"] == 30.0).all()
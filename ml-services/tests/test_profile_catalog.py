@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.services.profile_catalog import ProfileCatalog
+from app.services.profile_table import ProfileTable
+
+
+def make_table(float_id, dates, lat=12.0, lon=65.0):
+    n_prof = len(dates)
+    index = pd.DataFrame({
+        "profile_id": np.arange(n_prof),
+        "float_id": [float_id] * n_prof,
+        "cycle_number": np.arange(1, n_prof + 1),
+        "date": pd.to_datetime(dates),
+        "latitude": lat + np.arange(n_prof),
+        "longitude": np.full(n_prof, lon),
+    })
+    pressure = np.tile([5.0, 100.0], (n_prof, 1))
+    return ProfileTable(index=index, pressure=pressure, measurements={"TEMP": 28.0 - pressure / 50})
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = ProfileCatalog(str(tmp_path / "catalog"))
+    catalog.add_table(make_table("2902746", ["2023-03-01", None, "2023-03-11"]))
+    catalog.add_table(make_table("5904321", ["2023-04-01"]))
+    catalog.add_table(make_table("6903001", [None]))
+    return catalog
+
+
+def test_undated_profiles_are_never_the_latest(catalog):
+    floats = {entry["float_id"]: entry for entry in catalog.find_floats()["floats"]}
+    entry = floats["2902746"]
+    assert entry["profile_count"] == 3
+    assert (entry["first_date"], entry["last_date"], entry["last_cycle"]) == ("2023-03-01 00:00:00", "2023-03-11 00:00:00", 3)
+    assert floats["6903001"]["first_date"] is None and floats["6903001"]["last_date"] is None
+
+
+def test_pages_follow_the_cursor(catalog):
+    page = catalog.find_floats(limit=2)
+    assert [entry["float_id"] for entry in page["floats"]] == ["2902746", "5904321"]
+    assert page["total"] == 3
+
+    page = catalog.find_floats(limit=2, cursor=page["next_cursor"])
+    assert [entry["float_id"] for entry in page["floats"]] == ["6903001"]
+    assert page["next_cursor"] is None
+
+
+@pytest.mark.parametrize("cursor", ["abc", "not a cursor!", "é"])
+def test_malformed_cursor_is_a_value_error(catalog, cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        catalog.find_floats(cursor=cursor)
+
+
+def test_reingesting_a_table_changes_no_counts(catalog, tmp_path):
+    table = make_table("2902746", ["2023-03-01", None, "2023-03-11"])
+    before = {entry["float_id"]: entry["profile_count"] for entry in catalog.find_floats()["floats"]}
+    catalog.add_table(table)
+    catalog.add_table(table)
+
+    assert len(catalog) == 5
+    assert {entry["float_id"]: entry["profile_count"] for entry in catalog.find_floats()["floats"]} == before
+    assert len(catalog.get_float_profiles("2902746")) == 3
+    # Superseded records stay on disk but are dropped when the catalog is loaded again
+    assert len(ProfileCatalog(str(tmp_path / "catalog"))) == 5
+
+
+def test_corrected_profile_replaces_the_earlier_record(catalog):
+    seen = []
+    catalog.add_listener(seen.append)
+    catalog.add_table(make_table("5904321", ["2023-04-01"], lat=-30.0))
+
+    profiles = catalog.get_float_profiles("5904321")
+    assert len(profiles) == 1 and profiles["latitude"][0] == -30.0
+    assert sorted(seen[0]["latitude"].tolist()) == [-30.0, 12.0]
+    assert catalog.find_floats(lat=-30.0, lon=65.0, radius_km=50)["total"] == 1
+    nearby = [entry["float_id"] for entry in catalog.find_floats(lat=12.0, lon=65.0, radius_km=50)["floats"]]
+    assert "5904321" not in nearby
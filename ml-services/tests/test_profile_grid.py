@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+from app.services.profile_grid import ProfileGridder, interpolate_to_levels
+from app.services.profile_table import ProfileTable
+
+
+def make_table(float_id, n_prof=4):
+    index = pd.DataFrame({
+        "profile_id": np.arange(n_prof),
+        "float_id": [float_id] * n_prof,
+        "cycle_number": np.arange(1, n_prof + 1),
+        "date": pd.date_range("2023-03-01", periods=n_prof, freq="10D"),
+        "latitude": np.full(n_prof, 12.0),
+        "longitude": np.full(n_prof, 65.0),
+    })
+    pressure = np.tile([5.0, 100.0, 500.0], (n_prof, 1))
+    return ProfileTable(index=index, pressure=pressure, measurements={"TEMP": 28.0 - pressure / 50})
+
+
+def test_interpolation_does_not_extrapolate():
+    pressure = np.array([[10.0, 20.0, 40.0]])
+    values = np.array([[1.0, 2.0, 4.0]])
+    result = interpolate_to_levels(pressure, values, np.array([5.0, 10.0, 30.0, 50.0]))
+    np.testing.assert_allclose(result, [[np.nan, 1.0, 3.0, np.nan]])
+
+
+def test_grid_loaded_during_ingest_is_not_cached():
+    gridder = None
+
+    def loader(float_id):
+        gridder.invalidate([float_id])
+        return make_table(float_id)
+
+    gridder = ProfileGridder(loader, max_floats=4)
+    assert len(gridder.query("2902746")["profiles"]["cycle_number"]) == 4
+    assert gridder.get_stats()["floats"] == 0
+
+    gridder.loader = make_table
+    gridder.query("2902746")
+    gridder.query("2902746")
+    assert gridder.get_stats()["hits"] == 1
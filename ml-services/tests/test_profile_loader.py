@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from app.services.profile_loader import ProfileLoader
+from app.services.profile_table import ProfileTable
+from app.services.spatial_index import SearchFilters
+
+
+def make_table(float_id="2902746", n_prof=4, n_levels=5):
+    cycles = np.arange(1, n_prof + 1)
+    index = pd.DataFrame({
+        "profile_id": cycles - 1,
+        "float_id": [float_id] * n_prof,
+        "cycle_number": cycles,
+        "date": pd.to_datetime("2023-03-01") + pd.to_timedelta(cycles * 10, unit="D"),
+        "latitude": 12.0 + cycles * 0.1,
+        "longitude": np.full(n_prof, 65.0),
+    })
+    pressure = np.tile(np.linspace(5, 1000, n_levels), (n_prof, 1))
+    temperature = 28.0 - pressure / 100 + cycles[:, None]
+    temperature[0, -1] = np.nan
+    return ProfileTable(index=index, pressure=pressure, measurements={"TEMP": temperature})
+
+
+def test_read_table_returns_stored_profiles_of_a_float():
+    loader = ProfileLoader(create_engine("sqlite://"))
+    table = make_table()
+    loader.load_table(table)
+    loader.load_table(make_table(float_id="5904321"))
+
+    stored = loader.read_table("2902746")
+    assert stored.index["cycle_number"].tolist() == [1, 2, 3, 4]
+    np.testing.assert_allclose(stored.pressure, table.pressure)
+    np.testing.assert_allclose(stored.measurements["TEMP"], table.measurements["TEMP"])
+
+    within = loader.read_table("2902746", SearchFilters(start_date="2023-03-25", end_date="2023-04-10"))
+    assert within.index["cycle_number"].tolist() == [3, 4]
+    assert len(loader.read_table("unknown")) == 0
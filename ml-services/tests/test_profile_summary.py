@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.services.netcdf_processor import SUMMARY_DTYPE
+from app.services.profile_summary import summarize, summarize_documents, summary_to_dict
+from app.services.profile_table import ProfileTable
+
+
+def make_table():
+    pressure = np.array([
+        [5.0, 10.0, 20.0, 50.0, 100.0, 500.0],
+        [500.0, 100.0, 50.0, 20.0, 10.0, 5.0],
+    ])
+    temperature = np.array([
+        [28.0, 28.0, 27.9, 27.0, 22.0, 10.0],
+        [10.0, 22.0, 27.0, 27.9, 28.0, 28.0],
+    ])
+    salinity = np.full(pressure.shape, np.nan)
+    salinity[0, :3] = [35.0, 35.1, 35.2]
+    index = pd.DataFrame({
+        "profile_id": [0, 1],
+        "float_id": ["2902746", "2902746"],
+        "cycle_number": [1, 2],
+        "date": pd.to_datetime(["2023-03-01", "2023-03-11"]),
+        "latitude": [12.0, 12.1],
+        "longitude": [65.0, 65.1],
+    })
+    measurements = {"TEMP": temperature, "PSAL": salinity}
+    return ProfileTable(index=index, pressure=pressure, measurements=measurements,
+                        summaries=summarize(pressure, measurements, SUMMARY_DTYPE))
+
+
+def test_summaries_do_not_depend_on_level_order():
+    summaries = make_table().summaries
+    for field in ("TEMP_surface", "TEMP_bottom", "TEMP_min", "TEMP_max", "mixed_layer_depth", "max_pressure"):
+        assert summaries[field][0] == summaries[field][1], field
+    first = summaries[0]
+    assert (first["TEMP_surface"], first["TEMP_bottom"]) == (28.0, 10.0)
+    # Temperature first departs from its 10 dbar value by more than 0.2 degrees at 50 dbar
+    assert first["mixed_layer_depth"] == 50.0
+    assert first["n_levels"] == 6
+
+
+def test_summary_dict_lists_only_measured_parameters():
+    first, second = (summary_to_dict(record) for record in make_table().summaries)
+    assert sorted(first["parameters"]) == ["PSAL", "TEMP"]
+    assert first["parameters"]["PSAL"] == pytest.approx({"surface": 35.0, "bottom": 35.2, "min": 35.0, "max": 35.2})
+    assert list(second["parameters"]) == ["TEMP"]
+
+
+def test_documents_without_summaries_are_summarised_like_tables():
+    table = make_table()
+    documents = [{key: value for key, value in profile.items() if key != "summary"} for profile in table.profiles]
+    recomputed = summarize_documents(documents, SUMMARY_DTYPE)
+    reused = summarize_documents(table.profiles, SUMMARY_DTYPE)
+    for records in (recomputed, reused):
+        assert [summary_to_dict(record) for record in records] == [summary_to_dict(record) for record in table.summaries]
@@ -0,0 +1,52 @@
+import asyncio
+import pytest
+from app.services.query_batcher import QueryBatcher
+
+
+def echo_batch(queries, limit):
+    return [[{"query": query, "rank": rank} for rank in range(limit)] for query in queries]
+
+
+def test_concurrent_queries_share_one_batch():
+    batcher = QueryBatcher(echo_batch, window_ms=20)
+
+    async def scenario():
+        return await asyncio.gather(batcher.submit("a", 1), batcher.submit("b", 3))
+
+    first, second = asyncio.run(scenario())
+    assert [r["query"] for r in first] == ["a"]
+    assert [r["rank"] for r in second] == [0, 1, 2]
+    assert batcher.get_stats()["batch_sizes"] == {"2": 1}
+    assert batcher.get_stats()["latency"]["count"] == 2
+    assert not batcher._batches
+
+
+def test_failed_batch_reaches_every_caller():
+    def failing_batch(queries, limit):
+        raise RuntimeError("index unavailable")
+
+    batcher = QueryBatcher(failing_batch, window_ms=5)
+
+    async def scenario():
+        return await asyncio.gather(batcher.submit("a", 1), batcher.submit("b", 1), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert not batcher._batches
+
+
+def test_short_batch_result_is_an_error():
+    batcher = QueryBatcher(lambda queries, limit: [], window_ms=5)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(batcher.submit("a", 1))
+
+
+def test_unbatched_searches_are_timed_separately():
+    batcher = QueryBatcher(echo_batch, window_ms=5)
+
+    result = asyncio.run(batcher.run(lambda query, limit: [query] * limit, "filtered", 2))
+    assert result == ["filtered", "filtered"]
+    stats = batcher.get_stats()
+    assert stats["unbatched_latency"]["count"] == 1
+    assert stats["latency"]["count"] == 0
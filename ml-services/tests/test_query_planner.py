@@ -0,0 +1,56 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine
+from app.services.query_planner import QueryPlanner
+
+NOW = datetime(2024, 6, 15)
+
+
+@pytest.fixture
+def planner():
+    return QueryPlanner(create_engine("sqlite://"))
+
+
+@pytest.mark.parametrize("question, min_pressure, max_pressure", [
+    ("temperature profiles up to 2000 m in the Arabian Sea", 0.0, 2000.0),
+    ("salinity down to 2000m", 0.0, 2000.0),
+    ("depth of 2000 meters salinity in the red sea", 1800.0, 2200.0),
+    ("oxygen at a depth of 1000 dbar", 900.0, 1100.0),
+    ("temperature between 100 and 500 dbar", 100.0, 500.0),
+    ("salinity below 1500 m", 1500.0, None),
+])
+def test_depths_are_pressure_bounds_not_years(planner, question, min_pressure, max_pressure):
+    plan = planner.plan(question, now=NOW)
+    assert (plan.min_pressure, plan.max_pressure) == pytest.approx((min_pressure, max_pressure))
+    assert plan.filters.start_date is None
+    assert plan.filters.end_date is None
+
+
+def test_unmatched_depth_is_not_a_year(planner):
+    plan = planner.plan("2000 m temperature in 2019", now=NOW)
+    assert (plan.filters.start_date, plan.filters.end_date) == ("2019-01-01", "2019-12-31")
+
+
+@pytest.mark.parametrize("question, start_date, end_date", [
+    ("salinity in 2000", "2000-01-01", "2000-12-31"),
+    ("temperature in march 2023", "2023-03-01", "2023-03-31"),
+    ("oxygen before 2010", None, "2009-12-31"),
+    ("salinity up to 2015", None, "2015-12-31"),
+    ("temperature last month", "2024-05-15", None),
+])
+def test_dates(planner, question, start_date, end_date):
+    plan = planner.plan(question, now=NOW)
+    assert (plan.filters.start_date, plan.filters.end_date) == (start_date, end_date)
+
+
+def test_region_and_parameters(planner):
+    plan = planner.plan("salinity in the Arabian Sea", now=NOW)
+    assert plan.region == "arabian sea"
+    assert plan.filters.parameters == ["PSAL"]
+    assert plan.is_selective
+
+
+def test_unconstrained_question_is_not_selective(planner):
+    plan = planner.plan("what is an argo float?", now=NOW)
+    assert not plan.is_selective
+    assert planner.execute(plan) is None
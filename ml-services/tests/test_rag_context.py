@@ -0,0 +1,55 @@
+import pytest
+
+# RAGService imports the vector database, which needs the embedding model package
+pytest.importorskip("sentence_transformers")
+
+from app.config.settings import settings
+from app.services.rag_service import RAGService
+
+
+def make_document(position):
+    return {
+        "float_id": f"29027{position:02d}",
+        "latitude": 12.0,
+        "longitude": 65.0,
+        "date": "2023-03-11 00:00:00",
+        "similarity_score": 0.9 - position / 100,
+        "summary": {
+            "n_levels": 120,
+            "min_pressure": 5.0,
+            "max_pressure": 2000.0,
+            "mixed_layer_depth": 45.0,
+            "parameters": {"TEMP": {"surface": 28.5, "bottom": 2.4, "min": 2.4, "max": 28.6}},
+        },
+        "measurements": {"TEMP": {"values": [28.5] * 120, "pressure": list(range(120))}},
+    }
+
+
+@pytest.fixture
+def rag():
+    # The context is formatted without touching the index
+    return RAGService(vector_db=object())
+
+
+def test_documents_are_described_by_their_summaries(rag):
+    context = rag._format_context([make_document(1)])
+    assert "Depth coverage: 5.0 to 2000.0 dbar (120 levels)" in context
+    assert "Mixed-layer depth: 45.0 dbar" in context
+    assert "TEMP: 28.50 (surface) to 2.40 (bottom)" in context
+    assert "values" not in context
+
+
+def test_context_stops_at_the_token_budget(rag, monkeypatch):
+    documents = [make_document(position) for position in range(1, 21)]
+    single = len(rag._format_context(documents[:1]))
+    monkeypatch.setattr(settings, "rag_context_token_budget", single // 4 * 3)
+
+    context = rag._format_context(documents)
+    assert len(context) // 4 <= settings.rag_context_token_budget + 20
+    assert "Float ID: 2902701" in context
+    assert "Float ID: 2902704" not in context
+    assert "less relevant documents omitted" in context
+
+
+def test_empty_retrieval_says_so(rag):
+    assert rag._format_context([]) == "No relevant data found in the database."
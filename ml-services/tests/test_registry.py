@@ -0,0 +1,62 @@
+import threading
+import numpy as np
+import pytest
+
+# The registry imports the embedding model package at module level
+pytest.importorskip("sentence_transformers")
+
+from app.config.settings import settings
+from app.services import registry as registry_module
+from app.services.registry import ServiceRegistry
+
+
+class CountingModel:
+    """Stand-in embedding model that records how often it is loaded"""
+
+    loads = 0
+
+    def __init__(self, name):
+        CountingModel.loads += 1
+        self.name = name
+
+    def encode(self, texts, normalize_embeddings=True):
+        return np.ones((len(texts), 384), dtype=np.float32) / np.sqrt(384)
+
+
+@pytest.fixture
+def registry(monkeypatch, tmp_path):
+    CountingModel.loads = 0
+    monkeypatch.setattr(registry_module, "SentenceTransformer", CountingModel)
+    monkeypatch.setattr(settings, "vector_store_path", str(tmp_path / "vectors"))
+    monkeypatch.setattr(settings, "llm_provider", "none")
+    monkeypatch.setattr(settings, "conversation_store", "memory")
+    monkeypatch.setattr(settings, "embedding_cache_redis", False)
+    return ServiceRegistry()
+
+
+def test_services_share_one_model_and_index(registry):
+    vector_db = registry.get_vector_db()
+    assert registry.get_rag_service().vector_db is vector_db
+    assert registry.get_chat_service().rag_service is registry.get_rag_service()
+    assert registry.get_embedding_model() is registry.get_embedding_model()
+    vector_db.encode(["first query"])
+    assert CountingModel.loads == 1
+
+
+def test_concurrent_first_use_loads_once(registry):
+    vector_dbs = []
+    threads = [threading.Thread(target=lambda: vector_dbs.append(registry.get_vector_db())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(vector_db) for vector_db in vector_dbs}) == 1
+
+
+def test_warm_up_reports_readiness(registry):
+    assert registry.readiness()["state"] == "pending"
+    registry.warm_up()
+    assert registry.ready
+    readiness = registry.readiness()
+    assert readiness["ml_models"] == "loaded"
+    assert readiness["vector_db"]["total_documents"] == 0
@@ -0,0 +1,53 @@
+import json
+import os
+import numpy as np
+from app.services.segment_store import SegmentStore
+
+
+def append_rows(store, start, stop):
+    rows = np.arange(start, stop)
+    return store.append({"vectors": rows.astype(np.float32)[:, None], "ids": [f"doc-{row}" for row in rows]}, len(rows))
+
+
+def test_segments_survive_reopening_and_are_memory_mapped(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    append_rows(store, 0, 3)
+    append_rows(store, 3, 5)
+    store.set_manifest_value("snapshot", {"file": "index.faiss", "rows": 3})
+
+    reopened = SegmentStore(str(tmp_path))
+    assert reopened.total_rows == 5
+    assert reopened.manifest["snapshot"] == {"file": "index.faiss", "rows": 3}
+    vectors = reopened.load_part(reopened.segments[1], "vectors")
+    assert isinstance(vectors, np.memmap)
+    np.testing.assert_array_equal(vectors[:, 0], [3, 4])
+    assert reopened.load_part(reopened.segments[1], "ids") == ["doc-3", "doc-4"]
+
+
+def test_compaction_merges_runs_in_order(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    for start in range(0, 10, 2):
+        append_rows(store, start, start + 2)
+    before = set(os.listdir(tmp_path))
+
+    # Segments of two rows are merged into runs of at most five
+    assert store.compact(target_rows=5) == 2
+    assert [segment["rows"] for segment in store.segments] == [4, 4, 2]
+    vectors = np.concatenate([store.load_part(segment, "vectors")[:, 0] for segment in store.segments])
+    np.testing.assert_array_equal(vectors, np.arange(10))
+    ids = [doc for segment in store.segments for doc in store.load_part(segment, "ids")]
+    assert ids == [f"doc-{row}" for row in range(10)]
+
+    # Files of merged segments are removed; the manifest on disk matches
+    files = set(os.listdir(tmp_path))
+    assert "seg-000000.vectors.npy" in before and "seg-000000.vectors.npy" not in files
+    with open(tmp_path / "manifest.json") as f:
+        assert json.load(f)["segments"] == store.segments
+    assert store.compact(target_rows=5) == 0
+
+
+def test_segments_with_different_layouts_are_not_merged(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    append_rows(store, 0, 2)
+    store.append({"vectors": np.zeros((2, 1), dtype=np.float32), "ids": np.array(["a", "b"])}, 2)
+    assert store.compact(target_rows=10) == 0
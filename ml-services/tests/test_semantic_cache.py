@@ -0,0 +1,64 @@
+import hashlib
+import numpy as np
+from app.services import semantic_cache as semantic_cache_module
+from app.services.semantic_cache import SemanticCache
+
+STOP_WORDS = {"show", "me", "the", "in", "of"}
+
+
+def encode(texts):
+    """Bag of content words, so rephrasings with filler words embed identically"""
+    vectors = np.zeros((len(texts), 64), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            if word not in STOP_WORDS:
+                vectors[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_rephrased_query_in_the_same_scope_hits():
+    cache = SemanticCache(encode, threshold=0.9)
+    cache.store("show salinity in the Arabian Sea", ("context", 5), {"response": "35 PSU"})
+
+    entry, _ = cache.lookup("salinity Arabian Sea", ("context", 5))
+    assert entry["result"] == {"response": "35 PSU"}
+    assert entry["similarity"] == 1.0
+    assert cache.lookup("salinity Arabian Sea", ("context", 10))[0] is None
+    assert cache.lookup("temperature Bay of Bengal", ("context", 5))[0] is None
+    assert cache.get_stats()["hit_rate"] == round(1 / 3, 4)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticCache(encode, max_entries=2)
+    cache.store("salinity", None, {"response": "a"})
+    cache.store("temperature", None, {"response": "b"})
+    cache.lookup("salinity", None)
+    cache.store("oxygen", None, {"response": "c"})
+
+    assert cache.lookup("temperature", None)[0] is None
+    assert cache.lookup("salinity", None)[0] is not None
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache_module.time, "monotonic", lambda: now[0])
+    cache = SemanticCache(encode, ttl=60)
+    cache.store("salinity", None, {"response": "a"})
+    now[0] += 61
+
+    assert cache.lookup("salinity", None)[0] is None
+    assert cache.get_stats()["expirations"] == 1
+
+
+def test_answers_computed_before_an_invalidation_are_not_stored():
+    cache = SemanticCache(encode)
+    _, vector = cache.lookup("salinity", None)
+    generation = cache.generation
+    # Documents are added while the answer is being generated
+    cache.invalidate(10)
+    cache.store("salinity", None, {"response": "stale"}, vector=vector, generation=generation)
+
+    assert cache.lookup("salinity", None)[0] is None
+    cache.store("salinity", None, {"response": "fresh"}, generation=cache.generation)
+    assert cache.lookup("salinity", None)[0]["result"] == {"response": "fresh"}
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from app.services.metadata_store import encode_parameters
+from app.services.spatial_index import SearchFilters, SpatioTemporalIndex
+
+
+def test_bbox_and_radius_together_are_rejected():
+    with pytest.raises(ValueError, match="not both"):
+        SearchFilters(bbox=(0, 60, 20, 80), center=(10, 70), radius_km=100)
+
+@pytest.mark.parametrize("filters", [
+    {"bbox": (0, 60, 20, 80), "center": (10, 70)},
+    {"center": (10, 70)},
+    {"radius_km": 100},
+])
+def test_incomplete_radius_is_rejected(filters):
+    with pytest.raises(ValueError):
+        SearchFilters(**filters)
+
+
+def test_unknown_parameters_are_rejected():
+    with pytest.raises(ValueError, match="Unknown parameters: OXYGEN"):
+        SearchFilters(parameters=["TEMP", "OXYGEN"])
+
+
+def test_candidates_require_every_parameter():
+    index = SpatioTemporalIndex()
+    index.update(
+        np.array([10.0, 10.5, 40.0]),
+        np.array([70.0, 70.5, 70.0]),
+        np.array(["2023-01-01", "2023-02-01", "2023-03-01"], dtype="datetime64[s]")
+    )
+    masks = np.array([encode_parameters(["TEMP"]), encode_parameters(["TEMP", "DOXY"]), encode_parameters(["TEMP", "DOXY"])], dtype=np.uint32)
+
+    filters = SearchFilters(center=(10.0, 70.0), radius_km=200, parameters=["DOXY"])
+    assert index.candidates(filters, masks, encode_parameters(filters.parameters)).tolist() == [1]
+    filters = SearchFilters(bbox=(0, 60, 50, 80), start_date="2023-01-15")
+    assert index.candidates(filters, masks).tolist() == [1, 2]
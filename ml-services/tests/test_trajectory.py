@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from app.services.trajectory import build_trajectory
+from app.utils.geo import simplify_track, encode_polyline, decode_polyline, zoom_tolerance
+
+
+def test_polyline_matches_the_reference_encoding():
+    lat, lon = [38.5, 40.7, 43.252], [-120.2, -120.95, -126.453]
+    encoded = encode_polyline(lat, lon)
+    assert encoded == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+    np.testing.assert_allclose(decode_polyline(encoded), np.column_stack([lat, lon]))
+
+
+def test_simplification_keeps_turns_and_endpoints():
+    # A straight leg with jitter below the tolerance, one sharp turn, then a second leg
+    lon = np.concatenate([np.linspace(60, 70, 50), np.full(50, 70.0)])
+    lat = np.concatenate([np.full(50, 10.0), np.linspace(10, 20, 50)])
+    lat[1:49] += np.random.default_rng(0).uniform(-0.01, 0.01, 48)
+
+    kept = simplify_track(lat, lon, tolerance=0.05)
+    assert kept.tolist() == [0, 49, 99]
+    assert len(simplify_track(lat, lon, tolerance=0.001)) > 3
+    assert simplify_track(lat[:2], lon[:2], tolerance=1).tolist() == [0, 1]
+
+
+def test_missing_positions_are_dropped_with_their_dates():
+    dates = np.array(["2023-01-01", "2023-01-11", "2023-01-21", "NaT"], dtype="datetime64[s]")
+    trajectory = build_trajectory([10.0, np.nan, 11.0, 12.0], [65.0, 66.0, 67.123456, 68.0], dates, float_id="2902746")
+
+    assert trajectory["coordinates"] == [[65.0, 10.0], [67.12346, 11.0], [68.0, 12.0]]
+    assert trajectory["dates"] == ["2023-01-01T00:00:00", "2023-01-21T00:00:00", None]
+    assert (trajectory["n_points"], trajectory["n_simplified"]) == (3, 3)
+
+
+def test_formats_encode_the_same_simplified_track():
+    lat, lon = np.linspace(0, 1, 20), np.linspace(60, 61, 20)
+    tolerance = zoom_tolerance(4)
+
+    geojson = build_trajectory(lat, lon, tolerance=tolerance, format="geojson", include_dates=False)
+    polyline = build_trajectory(lat, lon, tolerance=tolerance, format="polyline", include_dates=False)
+    coordinates = geojson["geojson"]["geometry"]["coordinates"]
+    assert coordinates == [[60.0, 0.0], [61.0, 1.0]]
+    np.testing.assert_allclose(decode_polyline(polyline["polyline"])[:, ::-1], coordinates)
+    assert "dates" not in polyline
+
+    with pytest.raises(ValueError):
+        build_trajectory(lat, lon, format="kml")
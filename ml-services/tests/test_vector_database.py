@@ -0,0 +1,64 @@
+import asyncio
+import hashlib
+import numpy as np
+import pytest
+
+# VectorDatabase imports the embedding model package at module level
+pytest.importorskip("sentence_transformers")
+
+from app.config.settings import settings
+from app.services.vector_database import VectorDatabase
+
+
+class HashingModel:
+    """Bag-of-words embeddings, deterministic and cheap"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def encode(self, texts, normalize_embeddings=True):
+        vectors = np.zeros((len(texts), 384), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % 384] += 1
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+def make_documents(float_ids):
+    return [
+        {
+            "doc_id": f"{float_id}_1",
+            "float_id": str(float_id),
+            "cycle_number": 1,
+            "date": "2023-03-11",
+            "latitude": 12.0,
+            "longitude": 65.0,
+            "parameters": ["TEMP", "PSAL"],
+        }
+        for float_id in float_ids
+    ]
+
+
+@pytest.fixture
+def open_database(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "vector_store_path", str(tmp_path / "vectors"))
+    monkeypatch.setattr(settings, "vector_db_type", "faiss")
+    return lambda: VectorDatabase(model_loader=HashingModel)
+
+
+def test_snapshot_reloads_and_keeps_accepting_documents(open_database):
+    database = open_database()
+    database.add_documents(make_documents(range(2902700, 2902710)))
+    database.compact()
+    assert database.store.manifest["snapshot"]["rows"] == 10
+
+    reloaded = open_database()
+    assert reloaded.active_index.ntotal == 10
+    # Vectors added after loading a snapshot go into the same index
+    reloaded.add_documents(make_documents([2902746]))
+    results = asyncio.run(reloaded.search("float 2902746", limit=1))
+    assert results[0]["float_id"] == "2902746"
+
+    # The segment written after the snapshot is added on top of it at the next start
+    assert open_database().active_index.ntotal == 11